@@ -0,0 +1,373 @@
+# benchmark.py
+import os
+import gc
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import platform
+import tempfile
+import tracemalloc
+from collections import OrderedDict
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from localization_checker import (
+    load_records, parse_keys, mark_target_keys, get_untranslated_keys, format_key_display
+)
+from fluent_match import FluentMatcher
+from progress_store import load_checklist, save_checklist, Checklist
+
+DELIMITER = '鎰'
+DEFAULT_SIZES = [10000, 100000, 1000000]
+DEFAULT_PATHS = 1200
+# Доли сообщений: есть в целевом файле и отмечены V в прогрессе (из оставшихся)
+TARGET_SHARE = 0.5
+MARKED_SHARE = 0.2
+# Размеры путей убывают по закону Ципфа: несколько огромных файлов и длинный хвост мелких
+ZIPF_EXPONENT = 1.1
+# Сколько непереведенных ключей отрисовывается в замере format_key_display
+RENDER_KEYS = 10000
+# Замедление относительно базового замера, которое считается регрессией:
+# во столько раз и не меньше чем на столько секунд (короткие стадии сильно шумят)
+REGRESSION_RATIO = 1.25
+REGRESSION_MIN_SECONDS = 0.02
+# Сколько раз повторять стадию (берется лучшее время)
+DEFAULT_REPEAT = 3
+
+# Самые большие пути - как datasets/names/*.ftl в настоящем дампе
+NAMES_PATHS = ['vox', 'first', 'last', 'moth', 'arachnid', 'diona', 'reptilian', 'skeleton']
+DIRECTORIES = ['administration', 'chemistry', 'clothing', 'commands', 'construction', 'entities',
+               'guidebook', 'interaction', 'machines', 'medical', 'objectives', 'reagents',
+               'research', 'store', 'ui', 'weapons']
+WORDS = ['station', 'crew', 'engine', 'power', 'shuttle', 'reagent', 'airlock', 'cargo', 'medical',
+         'security', 'the', 'a', 'of', 'is', 'to', 'with', 'cannot', 'you', 'your', 'this', 'has',
+         'been', 'open', 'closed', 'damaged', 'empty', 'full', 'hand', 'target', 'status']
+RU_WORDS = ['станция', 'экипаж', 'двигатель', 'энергия', 'шаттл', 'реагент', 'шлюз', 'груз',
+            'медицина', 'охрана', 'нельзя', 'вы', 'ваш', 'этот', 'был', 'открыт', 'закрыт',
+            'поврежден', 'пуст', 'полон', 'рука', 'цель', 'статус']
+VARIABLES = ['name', 'user', 'target', 'amount', 'item', 'count']
+
+# --- Генератор дампов ---
+
+def path_sizes(keys, paths, rng):
+    """Число строк каждого пути: распределение Ципфа, не меньше одной строки на путь"""
+    weights = [1 / (rank + 1) ** ZIPF_EXPONENT for rank in range(paths)]
+    total = sum(weights)
+    sizes = [max(1, int(keys * weight / total)) for weight in weights]
+    # Остаток (или излишек) округления достается самому большому пути
+    sizes[0] = max(1, sizes[0] + keys - sum(sizes))
+    # Крупные пути не идут в файле подряд
+    order = list(range(paths))
+    rng.shuffle(order)
+    return [(rank, sizes[rank]) for rank in order]
+
+def path_name(rank):
+    if rank < len(NAMES_PATHS):
+        return f"/Locale/en-US/datasets/names/{NAMES_PATHS[rank]}.ftl"
+    directory = DIRECTORIES[rank % len(DIRECTORIES)]
+    return f"/Locale/en-US/{directory}/generated-{rank}.ftl"
+
+def sentence(rng, words, count):
+    return ' '.join(rng.choice(words) for _ in range(count))
+
+def generate_message(rng, prefix, number, names):
+    """Строки одного сообщения .ftl: простое значение, с переменной, с атрибутом или селектор"""
+    message_id = f"{prefix}-{number}"
+    if names:
+        return [f"{message_id} = {rng.choice(WORDS).capitalize()}{number % 97}"]
+    kind = rng.random()
+    if kind < 0.6:
+        return [f"{message_id} = {sentence(rng, WORDS, rng.randint(2, 12))}"]
+    if kind < 0.8:
+        variable = rng.choice(VARIABLES)
+        return [f"{message_id} = {sentence(rng, WORDS, rng.randint(1, 6))} {{ ${variable} }} "
+                f"{sentence(rng, WORDS, rng.randint(1, 6))}"]
+    if kind < 0.9:
+        return [f"{message_id} = {sentence(rng, WORDS, rng.randint(2, 6))}",
+                f"    .desc = {sentence(rng, WORDS, rng.randint(4, 16))}"]
+    variable = rng.choice(VARIABLES)
+    return [f"{message_id} = {{ ${variable} ->",
+            f"    [one] {sentence(rng, WORDS, rng.randint(1, 4))}",
+            f"   *[other] {sentence(rng, WORDS, rng.randint(1, 4))}",
+            "}"]
+
+def translate_line(rng, line):
+    """Перевод строки: значение заменяется русскими словами, плейсхолдеры сохраняются"""
+    head, separator, value = line.partition(' = ')
+    if not separator:
+        head, value = '', line
+    words = [rng.choice(RU_WORDS) if part.isalpha() else part for part in value.split(' ')]
+    return f"{head}{separator}{' '.join(words)}"
+
+def generate_dump(directory, keys, paths=DEFAULT_PATHS, seed=0):
+    """Пишет original, target и progress в directory и возвращает их пути.
+
+    Строки пишутся по мере генерации, поэтому память не зависит от размера дампа
+    (кроме словаря прогресса).
+    """
+    rng = random.Random(seed)
+    names = {
+        'original': os.path.join(directory, f"original-{keys}.txt"),
+        'target': os.path.join(directory, f"target-{keys}.txt"),
+        'progress': os.path.join(directory, f"progress-{keys}.json"),
+    }
+    marked = {}
+    with open(names['original'], 'w', encoding='utf-8') as original, \
+            open(names['target'], 'w', encoding='utf-8') as target:
+        for rank, size in path_sizes(keys, paths, rng):
+            path = path_name(rank)
+            is_names = rank < len(NAMES_PATHS)
+            prefix = f"names-{NAMES_PATHS[rank]}" if is_names else f"gen-{rank}"
+            written = 0
+            number = 0
+            while written < size:
+                if not is_names and number % 25 == 0:
+                    lines = [f"## Section {number // 25}"]
+                else:
+                    lines = generate_message(rng, prefix, number, is_names)[:size - written]
+                number += 1
+                written += len(lines)
+                for line in lines:
+                    original.write(f"{path}{DELIMITER}{line}\n")
+
+                share = rng.random()
+                if share < TARGET_SHARE:
+                    # Половина переводов совпадает со строкой целиком, половина - только по id
+                    exact = rng.random() < 0.5
+                    for line in lines:
+                        target.write(f"{path}{DELIMITER}{line if exact else translate_line(rng, line)}\n")
+                elif share < TARGET_SHARE + (1 - TARGET_SHARE) * MARKED_SHARE:
+                    for line in lines:
+                        marked[f"{path}{DELIMITER}{line}"] = "V"
+
+    with open(names['progress'], 'w', encoding='utf-8') as f:
+        json.dump(marked, f, ensure_ascii=False, indent=2)
+    return names
+
+# --- Замеры ---
+
+def max_rss_mb():
+    """Пиковый объем памяти процесса (None, если узнать нельзя)"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # В Linux - килобайты, в macOS - байты
+    return peak / (1 << 20) if sys.platform == 'darwin' else peak / 1024
+
+def measure(stages, name, func, items=None, size_bytes=None, trace_memory=True, repeat=1):
+    """Замеряет одну стадию: лучшее из repeat времен без трассировки, затем пик памяти под tracemalloc.
+
+    Возвращает результат последнего замеренного по времени вызова.
+    """
+    seconds = None
+    for _ in range(max(1, repeat)):
+        result = None
+        gc.collect()
+        started = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - started
+        seconds = elapsed if seconds is None else min(seconds, elapsed)
+
+    peak_mb = None
+    if trace_memory:
+        gc.collect()
+        tracemalloc.start()
+        try:
+            func()
+            peak_mb = tracemalloc.get_traced_memory()[1] / (1 << 20)
+        finally:
+            tracemalloc.stop()
+
+    if callable(items):
+        items = items(result)
+    stage = {'seconds': round(seconds, 4), 'items': items,
+             'items_per_second': round(items / seconds) if items and seconds else None,
+             'mb_per_second': round(size_bytes / (1 << 20) / seconds, 2) if size_bytes and seconds else None,
+             'peak_mb': round(peak_mb, 2) if peak_mb is not None else None}
+    stages[name] = stage
+    return result
+
+def run_pipeline(files, keys, trace_memory=True, render_keys=RENDER_KEYS, repeat=DEFAULT_REPEAT):
+    """Прогоняет стадии проверки на сгенерированном дампе и возвращает результаты"""
+    stages = OrderedDict()
+
+    def stage(name, func, items=None, size_bytes=None):
+        return measure(stages, name, func, items, size_bytes, trace_memory, repeat)
+
+    original_size = os.path.getsize(files['original'])
+    target_size = os.path.getsize(files['target'])
+    started = time.perf_counter()
+
+    # Исходный файл: без кэша и из кэша индекса (кэш строится до замера)
+    table, _ = stage('parse_keys', lambda: parse_keys(files['original'], DELIMITER, False, False),
+                     lambda result: len(result[0]), original_size)
+    parse_keys(files['original'], DELIMITER, True, False)
+    table, _ = stage('parse_keys (кэш)', lambda: parse_keys(files['original'], DELIMITER, True, False),
+                     lambda result: len(result[0]), original_size)
+
+    target_records, _ = stage('load_records (target)',
+                              lambda: load_records(files['target'], DELIMITER, False, False),
+                              lambda result: len(result[0]), target_size)
+    target_flags = stage('mark_target_keys',
+                         lambda: mark_target_keys(table, target_records, matcher=FluentMatcher(table)),
+                         len(target_records))
+
+    progress_size = os.path.getsize(files['progress'])
+    checklist = stage('load_checklist', lambda: Checklist(table, load_checklist(files['progress'])),
+                      lambda result: len(result.to_dict()), progress_size)
+    entries = checklist.to_dict()
+
+    untranslated, _, _ = stage('get_untranslated_keys',
+                               lambda: get_untranslated_keys(table, target_flags, checklist), len(table))
+
+    save_path = files['progress'] + '.save'
+    stage('save_checklist', lambda: save_checklist(save_path, checklist.to_dict()), len(entries), progress_size)
+
+    page = untranslated[:render_keys]
+
+    def render():
+        for position, handle in enumerate(page, 1):
+            format_key_display(table.path_of(handle), table.keys[handle], checklist.get(handle, "X"), position)
+
+    stage('format_key_display', render, len(page))
+
+    return {
+        'keys': keys,
+        'table_keys': len(table),
+        'paths': len(table.paths),
+        'untranslated': len(untranslated),
+        'original_mb': round(original_size / (1 << 20), 2),
+        'total_seconds': round(time.perf_counter() - started, 3),
+        'max_rss_mb': round(max_rss_mb(), 1) if resource is not None else None,
+        'stages': stages,
+    }
+
+# --- Базовые замеры ---
+
+def load_baseline(file_path):
+    """Результаты прошлого запуска: размер дампа (строкой) -> результаты"""
+    with open(file_path, 'r', encoding='utf-8') as f:
+        return json.load(f).get('results', {})
+
+def save_baseline(file_path, results):
+    report = {
+        'created': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'results': results,
+    }
+    with open(file_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+def find_regressions(results, baseline, ratio=REGRESSION_RATIO, min_seconds=REGRESSION_MIN_SECONDS):
+    """Стадии, ставшие медленнее базового замера больше чем в ratio раз (и больше чем на min_seconds)"""
+    problems = []
+    for size, result in results.items():
+        previous = baseline.get(size)
+        if previous is None:
+            continue
+        for name, stage in result['stages'].items():
+            old = previous['stages'].get(name)
+            if (old and old['seconds'] and stage['seconds'] > old['seconds'] * ratio
+                    and stage['seconds'] - old['seconds'] > min_seconds):
+                problems.append(f"{size} ключей, {name}: {old['seconds']:.3f} с -> {stage['seconds']:.3f} с "
+                                f"(x{stage['seconds'] / old['seconds']:.2f})")
+    return problems
+
+def format_rate(value, unit):
+    return f"{value:,}{unit}".replace(',', ' ') if value is not None else '-'
+
+def print_result(result, baseline=None):
+    print(f"\n[i] Ключей: {result['keys']} (в таблице {result['table_keys']}), путей: {result['paths']}, "
+          f"исходный файл: {result['original_mb']} МБ, всего {result['total_seconds']} с"
+          + (f", пик памяти процесса: {result['max_rss_mb']} МБ" if result['max_rss_mb'] is not None else ""))
+    print(f"    {'Стадия':<24} {'Время, с':>10} {'Записей/с':>14} {'МБ/с':>8} {'Пик, МБ':>9} {'Было, с':>9}")
+    for name, stage in result['stages'].items():
+        old = baseline['stages'].get(name) if baseline else None
+        print(f"    {name:<24} {stage['seconds']:>10.4f} {format_rate(stage['items_per_second'], ''):>14} "
+              f"{format_rate(stage['mb_per_second'], ''):>8} "
+              f"{format_rate(stage['peak_mb'], ''):>9} {old['seconds'] if old else '-':>9}")
+
+def main():
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(description='Замеры скорости и памяти стадий проверки локализации '
+                                                 'на сгенерированных дампах')
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES,
+                        help='Размеры дампов в строках (по умолчанию 10000 100000 1000000)')
+    parser.add_argument('--paths', type=int, default=DEFAULT_PATHS, help='Число путей .ftl в дампе')
+    parser.add_argument('--seed', type=int, default=0, help='Зерно генератора (одинаковые дампы между запусками)')
+    parser.add_argument('--workdir', help='Папка для дампов (по умолчанию временная, удаляется после замеров); '
+                                          'уже сгенерированные там дампы используются повторно')
+    parser.add_argument('--generate-only', action='store_true',
+                        help='Только сгенерировать дампы в --workdir, без замеров')
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT,
+                        help='Сколько раз повторять каждую стадию (берется лучшее время)')
+    parser.add_argument('--no-memory', action='store_true',
+                        help='Не замерять пик памяти стадий (каждая стадия выполняется один раз)')
+    parser.add_argument('--render-keys', type=int, default=RENDER_KEYS,
+                        help='Сколько ключей отрисовывать в замере format_key_display')
+    parser.add_argument('--save', nargs='?', const=os.path.join(script_dir, 'benchmark_baseline.json'),
+                        metavar='ФАЙЛ', help='Сохранить результаты как базовые')
+    parser.add_argument('--compare', nargs='?', const=os.path.join(script_dir, 'benchmark_baseline.json'),
+                        metavar='ФАЙЛ', help='Сравнить с базовыми результатами; замедление больше '
+                                             f'чем в {REGRESSION_RATIO} раза - код выхода 1')
+    args = parser.parse_args()
+
+    if args.generate_only and not args.workdir:
+        parser.error('--generate-only требует --workdir')
+
+    baseline = {}
+    if args.compare:
+        try:
+            baseline = load_baseline(args.compare)
+        except (OSError, ValueError) as e:
+            print(f"[X] Ошибка чтения базовых результатов {args.compare}: {e}")
+            return 2
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix='locacheck-bench-')
+    os.makedirs(workdir, exist_ok=True)
+    results = {}
+    try:
+        for keys in args.sizes:
+            files = {
+                'original': os.path.join(workdir, f"original-{keys}.txt"),
+                'target': os.path.join(workdir, f"target-{keys}.txt"),
+                'progress': os.path.join(workdir, f"progress-{keys}.json"),
+            }
+            if not all(os.path.exists(path) for path in files.values()):
+                print(f"[~] Генерация дампа на {keys} строк...")
+                started = time.perf_counter()
+                files = generate_dump(workdir, keys, args.paths, args.seed)
+                print(f"[V] Дамп готов за {time.perf_counter() - started:.1f} с: {files['original']}")
+            if args.generate_only:
+                continue
+
+            print(f"[~] Замеры на {keys} строк...")
+            result = run_pipeline(files, keys, not args.no_memory, args.render_keys, args.repeat)
+            results[str(keys)] = result
+            print_result(result, baseline.get(str(keys)))
+    finally:
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.generate_only:
+        return 0
+    if args.save:
+        save_baseline(args.save, results)
+        print(f"\n[S] Результаты сохранены как базовые: {args.save}")
+
+    problems = find_regressions(results, baseline)
+    for problem in problems:
+        print(f"[!] Замедление: {problem}")
+    if args.compare and not problems:
+        print("\n[V] Замедлений относительно базовых результатов нет")
+    return 1 if problems else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
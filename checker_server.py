@@ -0,0 +1,388 @@
+# checker_server.py
+import json
+import time
+import signal
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit, parse_qs
+
+from message_check import count_issues
+from path_coverage import SORT_MODES
+from key_selection import parse_selection
+
+# Как часто писатель сбрасывает накопленные отметки в журнал, с
+FLUSH_INTERVAL = 0.5
+# Как часто проверяются автосохранение и изменения файлов, с
+TICK_INTERVAL = 1.0
+# Размер страницы по умолчанию и наибольший
+DEFAULT_LIMIT = 30
+MAX_LIMIT = 1000
+MAX_BODY = 1 << 20
+# Потоки для работы с сеансом (сам сеанс все равно занят одним запросом за раз)
+WORKER_THREADS = 4
+
+API_HELP = {
+    'GET /api/status': "счетчики, фильтр, файлы",
+    'GET /api/untranslated?offset=0&limit=30&filter=': "страница непереведенных ключей",
+    'GET /api/search?q=&offset=0&limit=30': "поиск (как команда K)",
+    'GET /api/coverage?by=path|directory&sort=r': "покрытие по путям или папкам",
+    'GET /api/key?handle=N | ?id=путь<разделитель>ключ': "один ключ с подсказками из памяти переводов",
+    'GET /api/issues': "ошибки плейсхолдеров и синтаксиса (как команда V)",
+    'POST /api/toggle {"handle": N} | {"id": "..."}': "переключить отметку",
+    'POST /api/mark {"select": "...", "filter": "", "status": "V"} | {"handles": [...]} | {"ids": [...]}':
+        "пакетная отметка (номера в select - по списку фильтра filter)",
+    'POST /api/save': "сохранить прогресс",
+    'POST /api/refresh': "перечитать файлы",
+}
+
+class ApiError(Exception):
+    """Ошибка запроса: отдается клиенту с кодом status"""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+           413: 'Payload Too Large', 500: 'Internal Server Error'}
+
+class CheckerServer:
+    """HTTP/JSON-сервер над одним сеансом проверки.
+
+    Соединения обслуживает цикл событий, а сами запросы к сеансу выполняются
+    в потоках под одной блокировкой, чтобы сохранение, перечитывание файлов и
+    запись журнала не останавливали остальных клиентов. Фильтр каждый клиент
+    передает в запросе, общий фильтр сеанса не меняется. Отметки сразу видны
+    всем клиентам, а в журнал их пачками пишет один писатель (flush_loop);
+    снимок сжимается по таймеру автосохранения.
+    """
+
+    def __init__(self, session, host='127.0.0.1', port=8765):
+        self.session = session
+        self.host = host
+        self.port = port
+        self.requests = 0
+        self.started = time.time()
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=WORKER_THREADS)
+        session.pending_journal = []
+
+    # --- Ответы ---
+
+    def key_entry(self, handle):
+        session = self.session
+        table = session.table
+        return {'handle': handle, 'id': table.key_id(handle), 'path': table.path_of(handle),
+                'key': table.keys[handle], 'status': session.key_status(handle)}
+
+    def page(self, handles, query):
+        offset = self.int_param(query, 'offset', 0)
+        limit = min(MAX_LIMIT, self.int_param(query, 'limit', DEFAULT_LIMIT))
+        return {'version': self.session.data_version, 'total': len(handles), 'offset': offset,
+                'keys': [self.key_entry(handle) for handle in handles[offset:offset + limit]]}
+
+    @staticmethod
+    def int_param(query, name, default):
+        values = query.get(name)
+        if not values:
+            return default
+        try:
+            return max(0, int(values[0]))
+        except ValueError:
+            raise ApiError(400, f"Параметр {name} должен быть числом")
+
+    def resolve_handle(self, handle=None, key_id=None):
+        """Номер ключа по номеру или строке путь<разделитель>ключ"""
+        table = self.session.table
+        if key_id is not None:
+            handle = table.find_id(str(key_id))
+        elif handle is not None:
+            try:
+                handle = int(handle)
+            except (TypeError, ValueError):
+                raise ApiError(400, "handle должен быть числом")
+            if not 0 <= handle < len(table):
+                handle = None
+        else:
+            raise ApiError(400, "Нужен handle или id ключа")
+        if handle is None:
+            raise ApiError(404, "Ключ не найден")
+        return handle
+
+    def filter_view(self, text):
+        """Список для фильтра из запроса; None - текущий фильтр сеанса.
+
+        Фильтр сеанса не переключается, поэтому клиенты не мешают друг другу;
+        списки уже запрошенных фильтров хранятся в сеансе.
+        """
+        session = self.session
+        try:
+            return session.filter_view(session.resolve_filter(text) if text is not None
+                                       else session.key_filter.expression)
+        except ValueError as e:
+            raise ApiError(400, str(e))
+
+    def view_label(self, view):
+        """Имя пресета фильтра или само выражение"""
+        expression = view.key_filter.expression
+        return next((name for name, preset in self.session.presets if preset.strip() == expression),
+                    expression)
+
+    # --- Обработчики ---
+
+    def get_status(self, query, body):
+        session = self.session
+        total = session.translated_count + session.untranslated_count
+        return {
+            'version': session.data_version,
+            'original': session.original,
+            'target': session.target,
+            'progress': session.progress,
+            'filter': session.filter_label(),
+            'keys': len(session.table),
+            'translated': session.translated_count,
+            'untranslated': session.untranslated_count,
+            'percent': round(session.translated_count / total * 100, 2) if total else 100.0,
+            'stale': len(session.stale_keys()),
+            'pending_journal': len(session.pending_journal or ()),
+            'requests': self.requests,
+            'uptime_seconds': round(time.time() - self.started, 1),
+        }
+
+    def get_untranslated(self, query, body):
+        view = self.filter_view((query.get('filter') or [None])[0])
+        return dict(self.page(view.untranslated, query), filter=self.view_label(view))
+
+    def get_search(self, query, body):
+        text = (query.get('q') or [''])[0]
+        if not text.strip():
+            raise ApiError(400, "Пустой запрос")
+        try:
+            handles = self.session.search(text)
+        except ValueError as e:
+            raise ApiError(400, str(e))
+        return dict(self.page(handles, query), query=text)
+
+    def get_coverage(self, query, body):
+        by_directory = (query.get('by') or ['path'])[0] == 'directory'
+        sort_mode = (query.get('sort') or ['r'])[0]
+        if sort_mode not in SORT_MODES:
+            raise ApiError(400, f"Сортировка: {', '.join(SORT_MODES)}")
+        return {'rows': self.session.coverage_rows(by_directory, sort_mode)}
+
+    def get_key(self, query, body):
+        handle = self.resolve_handle((query.get('handle') or [None])[0], (query.get('id') or [None])[0])
+        suggestions = [{'similarity': round(score, 3), 'translation': target, 'source': source}
+                       for score, target, source in self.session.suggestions(handle)]
+        return dict(self.key_entry(handle), suggestions=suggestions)
+
+    def get_issues(self, query, body):
+        issues = self.session.validate_messages()
+        return {'counts': count_issues(issues),
+                'issues': [{name: issue[name] for name in ('path', 'id', 'kind', 'detail', 'handle', 'side')}
+                           for issue in issues]}
+
+    def post_toggle(self, query, body):
+        handle = self.resolve_handle(body.get('handle'), body.get('id'))
+        self.session.toggle(handle)
+        return self.key_entry(handle)
+
+    def post_mark(self, query, body):
+        session = self.session
+        status = body.get('status', 'V')
+        if status not in ('V', 'X'):
+            raise ApiError(400, "status - V или X")
+        if 'select' in body:
+            text = str(body['select'])
+            view = self.filter_view(None if body.get('filter') is None else str(body['filter']))
+            try:
+                if 'filter' not in body and any(kind == 'range' for kind, _ in parse_selection(text)):
+                    # Номера зависят от списка, который видит клиент
+                    raise ApiError(400, "Для номеров в select укажите filter - список, "
+                                        "по которому они считаются (как в /api/untranslated)")
+                handles = session.select(text, view=view)
+            except ValueError as e:
+                raise ApiError(400, str(e))
+        elif 'ids' in body:
+            handles = [self.resolve_handle(key_id=key_id) for key_id in body['ids']]
+        elif 'handles' in body:
+            handles = [self.resolve_handle(handle) for handle in body['handles']]
+        else:
+            raise ApiError(400, "Нужен select, ids или handles")
+        return {'selected': len(handles), 'changed': session.mark_many(handles, status)}
+
+    def post_save(self, query, body):
+        self.session.flush_journal()
+        return {'saved': self.session.save()}
+
+    def post_refresh(self, query, body):
+        self.session.flush_journal()
+        changed_paths = self.session.refresh()
+        return {'changed_sections': len(changed_paths), 'version': self.session.data_version}
+
+    def get_help(self, query, body):
+        return {'api': API_HELP}
+
+    ROUTES = {
+        ('GET', '/'): get_help,
+        ('GET', '/api'): get_help,
+        ('GET', '/api/status'): get_status,
+        ('GET', '/api/untranslated'): get_untranslated,
+        ('GET', '/api/search'): get_search,
+        ('GET', '/api/coverage'): get_coverage,
+        ('GET', '/api/key'): get_key,
+        ('GET', '/api/issues'): get_issues,
+        ('POST', '/api/toggle'): post_toggle,
+        ('POST', '/api/mark'): post_mark,
+        ('POST', '/api/save'): post_save,
+        ('POST', '/api/refresh'): post_refresh,
+    }
+
+    def dispatch(self, method, target, body):
+        """Выполняет запрос, возвращает (код, объект ответа)"""
+        url = urlsplit(target)
+        handler = self.ROUTES.get((method, url.path.rstrip('/') or '/'))
+        if handler is None:
+            if any(path == url.path.rstrip('/') for _, path in self.ROUTES):
+                raise ApiError(405, f"Метод {method} не поддерживается")
+            raise ApiError(404, f"Неизвестный адрес: {url.path}")
+        if method == 'POST':
+            try:
+                body = json.loads(body.decode('utf-8')) if body else {}
+            except ValueError:
+                raise ApiError(400, "Тело запроса - не JSON")
+            if not isinstance(body, dict):
+                raise ApiError(400, "Тело запроса должно быть объектом JSON")
+        return 200, handler(self, parse_qs(url.query), body)
+
+    # --- HTTP ---
+
+    async def handle_client(self, reader, writer):
+        """Обслуживает одно соединение (с keep-alive - несколько запросов подряд)"""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                parts = request_line.decode('latin-1').split()
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                keep_alive = headers.get('connection', '').lower() != 'close'
+                try:
+                    if len(parts) != 3:
+                        raise ApiError(400, "Неверная строка запроса")
+                    length = int(headers.get('content-length') or 0)
+                    if length > MAX_BODY:
+                        keep_alive = False
+                        raise ApiError(413, "Слишком большое тело запроса")
+                    body = await reader.readexactly(length) if length else b''
+                    self.requests += 1
+                    status, payload = await self.call(self.dispatch, parts[0].upper(), parts[1], body)
+                except ApiError as e:
+                    status, payload = e.status, {'error': str(e)}
+                except ValueError:
+                    status, payload = 400, {'error': "Неверный заголовок Content-Length"}
+                except Exception as e:
+                    status, payload = 500, {'error': f"{type(e).__name__}: {e}"}
+
+                data = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+                writer.write((f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+                              "Content-Type: application/json; charset=utf-8\r\n"
+                              f"Content-Length: {len(data)}\r\n"
+                              f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n").encode('latin-1')
+                             + data)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    # --- Фоновые задачи ---
+
+    def locked(self, func, args):
+        with self.lock:
+            return func(*args)
+
+    async def call(self, func, *args):
+        """Выполняет func в потоке под блокировкой сеанса, не останавливая цикл событий"""
+        return await asyncio.get_event_loop().run_in_executor(self.executor, self.locked, func, args)
+
+    async def flush_loop(self):
+        """Единственный писатель журнала: сбрасывает накопленные отметки пачками"""
+        while True:
+            await asyncio.sleep(FLUSH_INTERVAL)
+            await self.call(self.session.flush_journal)
+
+    def tick(self):
+        """Автосохранение и подхват изменений файлов (как таймер полноэкранного режима)"""
+        session = self.session
+        if session.autosave_due():
+            session.flush_journal()
+            if session.autosave():
+                print("[A] Автосохранение прогресса")
+        if session.watcher is not None:
+            watched = session.poll_watch()
+            if watched:
+                changed_paths, merged = watched
+                print(f"[W] Файлы изменились: обновлено секций {len(changed_paths)}, "
+                      f"подхвачено отметок {merged}")
+        elif session.files_changed():
+            session.flush_journal()
+            changed_paths = session.refresh()
+            print(f"[W] Файлы изменились, обновлено секций: {len(changed_paths)}")
+
+    async def tick_loop(self):
+        while True:
+            await asyncio.sleep(TICK_INTERVAL)
+            await self.call(self.tick)
+
+    def run(self):
+        """Запускает сервер до Ctrl+C; возвращает результат сохранения при выходе"""
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        server = loop.run_until_complete(asyncio.start_server(self.handle_client, self.host, self.port))
+        tasks = [loop.create_task(self.flush_loop()), loop.create_task(self.tick_loop())]
+        try:
+            # Остановка по kill тоже сохраняет прогресс
+            loop.add_signal_handler(signal.SIGTERM, loop.stop)
+        except (NotImplementedError, AttributeError):
+            pass  # Windows
+        print(f"[V] Сервер запущен: http://{self.host}:{self.port}/api (Ctrl+C - остановить)")
+        try:
+            loop.run_forever()
+        except KeyboardInterrupt:
+            print("\n[i] Остановка сервера...")
+        finally:
+            for task in tasks:
+                task.cancel()
+            server.close()
+            loop.run_until_complete(server.wait_closed())
+            loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+            # Запросы, уже начатые в потоках, доделываются до сохранения
+            self.executor.shutdown(wait=True)
+            loop.close()
+        with self.lock:
+            self.session.flush_journal()
+            return self.session.save()
+
+def parse_address(text):
+    """Разбирает [ХОСТ:]ПОРТ; по умолчанию сервер слушает только локальный адрес"""
+    host, _, port = text.rpartition(':')
+    try:
+        port = int(port)
+    except ValueError:
+        raise ValueError(f"Неверный порт: {text}")
+    return host or '127.0.0.1', port
+
+def run_server(session, address):
+    """Запускает HTTP/JSON-сервер над загруженным сеансом"""
+    host, port = parse_address(address)
+    return CheckerServer(session, host, port).run()
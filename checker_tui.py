@@ -0,0 +1,650 @@
+# checker_tui.py
+import curses
+import locale
+from bisect import bisect_left
+
+from locale_index import clamp_offset, find_path_position
+from path_coverage import SORT_MODES, format_coverage_row, format_coverage_header
+from message_check import count_issues, format_issue
+from profiling import metrics, timed, format_metrics
+
+# Период проверки таймеров (автосохранение и изменение файлов), мс
+TICK_MS = 1000
+# Строк на один ключ: номер/статус/путь и текст ключа
+ROWS_PER_KEY = 2
+# Строки заголовка сверху и подвала снизу
+HEADER_ROWS = 3
+FOOTER_ROWS = 2
+
+HELP_LINE = ("↑↓ выбор  Пробел отметить  PgUp/PgDn страница  : номер  / путь  ? поиск  "
+             "m/u отметить/снять пачкой  w подсказки  t покрытие  c изменения  v проверка сообщений  i замеры  f пресет  e выражение фильтра  "
+             "r обновить  s сохранить  q выход")
+STATS_HELP_LINE = "↑↓ PgUp/PgDn прокрутка  o сортировка  d файлы/папки  t/q назад"
+CHANGES_HELP_LINE = "↑↓ PgUp/PgDn выбор  Пробел перевод актуален  a подтвердить все  c/q назад"
+ISSUES_HELP_LINE = "↑↓ PgUp/PgDn выбор  Enter показать ключ  v/q назад"
+METRICS_HELP_LINE = "↑↓ PgUp/PgDn прокрутка  i/q назад"
+
+def run_tui(session):
+    """Запускает полноэкранный режим, возвращает результат сохранения при выходе"""
+    locale.setlocale(locale.LC_ALL, '')
+    return curses.wrapper(lambda stdscr: CheckerScreen(stdscr, session).run())
+
+class CheckerScreen:
+    """Полноэкранный просмотр непереведенных ключей.
+
+    Экран перерисовывается только в измененных строках; автосохранение и
+    проверка изменений файлов выполняются по таймеру, а не по нажатию клавиш.
+    """
+
+    def __init__(self, stdscr, session):
+        self.stdscr = stdscr
+        self.session = session
+        self.cursor = 0        # позиция выделенного ключа в списке
+        self.top = 0           # позиция первого видимого ключа
+        self.message = ''
+        self.full_redraw = True
+        self.dirty_slots = set()
+        self.stats = None      # состояние экрана покрытия, если он открыт
+        self.changes = None    # состояние экрана изменившихся ключей, если он открыт
+        self.issues = None     # состояние экрана проверки сообщений, если он открыт
+        self.metrics = None    # состояние экрана замеров (--profile), если он открыт
+        self.search = None     # результаты поиска вместо списка непереведенных ключей
+
+    def run(self):
+        """Главный цикл: обработка клавиш и таймеров"""
+        curses.curs_set(0)
+        self.init_colors()
+        self.stdscr.timeout(TICK_MS)
+
+        while True:
+            self.draw()
+            try:
+                ch = self.stdscr.get_wch()
+            except curses.error:
+                # Истек таймаут ожидания клавиши
+                ch = -1
+            if ch == -1:
+                self.tick()
+                continue
+            if self.handle_key(ch) is False:
+                break
+
+        return self.session.save()
+
+    def init_colors(self):
+        """Настраивает цветовые пары"""
+        self.colors = {}
+        if not curses.has_colors():
+            return
+        curses.start_color()
+        try:
+            curses.use_default_colors()
+            background = -1
+        except curses.error:
+            background = curses.COLOR_BLACK
+        for pair, (name, color) in enumerate((('V', curses.COLOR_GREEN), ('X', curses.COLOR_RED),
+                                              ('path', curses.COLOR_CYAN),
+                                              ('title', curses.COLOR_YELLOW)), 1):
+            curses.init_pair(pair, color, background)
+            self.colors[name] = curses.color_pair(pair)
+
+    def color(self, name):
+        return self.colors.get(name, 0)
+
+    def rows(self):
+        """Ключи основного экрана: результаты поиска или непереведенные ключи"""
+        search = self.search
+        if search is None:
+            return self.session.untranslated
+        if search['version'] != self.session.data_version:
+            # Файлы или таблица ключей изменились - повторяем поиск
+            search['rows'] = self.session.search(search['query'])
+            search['version'] = self.session.data_version
+        return search['rows']
+
+    # --- Геометрия ---
+
+    def visible_count(self):
+        """Сколько ключей помещается на экране"""
+        height, _ = self.stdscr.getmaxyx()
+        return max(1, (height - HEADER_ROWS - FOOTER_ROWS) // ROWS_PER_KEY)
+
+    def clamp(self):
+        """Держит курсор внутри списка, а окно - вокруг курсора"""
+        total = len(self.rows())
+        self.cursor = clamp_offset(self.cursor, total)
+        visible = self.visible_count()
+        top = self.top
+        if self.cursor < top:
+            top = self.cursor
+        elif self.cursor >= top + visible:
+            top = self.cursor - visible + 1
+        top = clamp_offset(top, total)
+        if top != self.top:
+            self.top = top
+            self.full_redraw = True
+
+    # --- Отрисовка ---
+
+    def put(self, y, x, text, attr=0):
+        """Выводит строку, обрезая ее по ширине экрана"""
+        height, width = self.stdscr.getmaxyx()
+        if y >= height or x >= width:
+            return
+        try:
+            self.stdscr.addnstr(y, x, text, width - x - 1, attr)
+        except curses.error:
+            pass
+
+    def clear_line(self, y):
+        try:
+            self.stdscr.move(y, 0)
+            self.stdscr.clrtoeol()
+        except curses.error:
+            pass
+
+    @timed('tui_draw')
+    def draw(self):
+        """Перерисовывает только то, что изменилось"""
+        if self.stats is not None:
+            self.draw_stats()
+            return
+        if self.changes is not None:
+            self.draw_changes()
+            return
+        if self.issues is not None:
+            self.draw_issues()
+            return
+        if self.metrics is not None:
+            self.draw_metrics()
+            return
+        self.clamp()
+        if self.full_redraw:
+            self.stdscr.erase()
+            self.draw_header()
+            self.dirty_slots = set(range(self.visible_count()))
+            self.full_redraw = False
+
+        for slot in sorted(self.dirty_slots):
+            self.draw_slot(slot)
+        self.dirty_slots.clear()
+
+        self.draw_suggestion()
+        self.draw_footer()
+        self.stdscr.noutrefresh()
+        curses.doupdate()
+
+    def draw_suggestion(self):
+        """Лучшая подсказка из памяти переводов для выделенного ключа (строка под заголовком)"""
+        self.clear_line(1)
+        rows = self.rows()
+        if not self.session.show_suggestions or not rows:
+            return
+        suggestions = self.session.suggestions(rows[self.cursor])
+        if suggestions:
+            score, target, _ = suggestions[0]
+            more = f" (+{len(suggestions) - 1})" if len(suggestions) > 1 else ""
+            self.put(1, 0, f"≈ {score * 100:.0f}%{more}: {target}", self.color('title'))
+
+    def draw_header(self):
+        session = self.session
+        title = (f"ПРОВЕРКА ЛОКАЛИЗАЦИИ | Фильтр: {session.filter_label()} | "
+                 f"Разделитель: '{session.delimiter}'")
+        if self.search is not None:
+            title = (f"ПОИСК: {self.search['query']} | Найдено: {len(self.rows())} | "
+                     f"? и пустой запрос - вернуться к списку")
+        self.put(0, 0, title, self.color('title') | curses.A_BOLD)
+        _, width = self.stdscr.getmaxyx()
+        self.put(2, 0, "─" * width)
+
+    def draw_slot(self, slot):
+        """Рисует один ключ на его месте в окне"""
+        session = self.session
+        y = HEADER_ROWS + slot * ROWS_PER_KEY
+        for row in range(ROWS_PER_KEY):
+            self.clear_line(y + row)
+
+        position = self.top + slot
+        if position >= len(self.rows()):
+            return
+
+        handle = self.rows()[position]
+        status = session.key_status(handle)
+        selected = curses.A_REVERSE if position == self.cursor else 0
+        self.put(y, 0, f"{position + 1:6d}. [{status}] ", self.color(status) | selected)
+        self.put(y, 13, session.table.path_of(handle), self.color('path') | selected)
+        self.put(y + 1, 8, session.table.keys[handle], self.color(status))
+
+    def draw_footer(self):
+        session = self.session
+        height, _ = self.stdscr.getmaxyx()
+        total = session.translated_count + session.untranslated_count
+        percent = session.translated_count / total * 100 if total else 100.0
+        status = (f"Прогресс: {percent:.1f}% ({session.translated_count}/{total})  "
+                  f"Осталось: {session.untranslated_count}  "
+                  f"Ключ {min(self.cursor + 1, len(self.rows()))} из {len(self.rows())}")
+        if self.message:
+            status += f"  | {self.message}"
+        self.clear_line(height - 2)
+        self.put(height - 2, 0, status, curses.A_BOLD)
+        self.clear_line(height - 1)
+        self.put(height - 1, 0, HELP_LINE)
+
+    def open_stats(self):
+        """Открывает таблицу покрытия по путям"""
+        self.stats = {'by_directory': False, 'sort': 'r', 'top': 0}
+        self.load_stats_rows()
+
+    def load_stats_rows(self):
+        stats = self.stats
+        stats['rows'] = self.session.coverage_rows(stats['by_directory'], stats['sort'])
+        stats['top'] = 0
+        self.full_redraw = True
+
+    def draw_stats(self):
+        """Рисует таблицу покрытия (только при изменениях)"""
+        if not self.full_redraw:
+            return
+        stats = self.stats
+        height, width = self.stdscr.getmaxyx()
+        self.stdscr.erase()
+        kind = "папкам" if stats['by_directory'] else "путям"
+        title = (f"ПОКРЫТИЕ ПО {kind.upper()} | Фильтр: {self.session.filter_label()} | "
+                 f"Сортировка: {SORT_MODES[stats['sort']][0]}")
+        self.put(0, 0, title, self.color('title') | curses.A_BOLD)
+        self.put(1, 0, format_coverage_header(width - 1), curses.A_BOLD)
+        self.put(2, 0, "─" * width)
+        visible = height - HEADER_ROWS - FOOTER_ROWS
+        rows = stats['rows'][stats['top']:stats['top'] + visible]
+        for y, row in enumerate(rows, HEADER_ROWS):
+            color = self.color('V') if row['untranslated'] == 0 else 0
+            self.put(y, 0, format_coverage_row(row, width - 1), color)
+        self.put(height - 2, 0, f"Строки {stats['top'] + 1}-{stats['top'] + len(rows)} из {len(stats['rows'])}",
+                 curses.A_BOLD)
+        self.put(height - 1, 0, STATS_HELP_LINE)
+        self.full_redraw = False
+        self.stdscr.noutrefresh()
+        curses.doupdate()
+
+    def handle_stats_key(self, key, char):
+        """Клавиши экрана покрытия"""
+        stats = self.stats
+        height, _ = self.stdscr.getmaxyx()
+        visible = max(1, height - HEADER_ROWS - FOOTER_ROWS)
+        last_top = max(0, len(stats['rows']) - visible)
+        if char in ('t', 'q') or key == 27:
+            self.stats = None
+        elif char == 'o':
+            modes = list(SORT_MODES)
+            stats['sort'] = modes[(modes.index(stats['sort']) + 1) % len(modes)]
+            self.load_stats_rows()
+        elif char == 'd':
+            stats['by_directory'] = not stats['by_directory']
+            self.load_stats_rows()
+        elif key == curses.KEY_UP or char == 'k':
+            stats['top'] = max(0, stats['top'] - 1)
+        elif key == curses.KEY_DOWN or char == 'j':
+            stats['top'] = min(last_top, stats['top'] + 1)
+        elif key == curses.KEY_PPAGE:
+            stats['top'] = max(0, stats['top'] - visible)
+        elif key == curses.KEY_NPAGE:
+            stats['top'] = min(last_top, stats['top'] + visible)
+        self.full_redraw = True
+
+    def open_changes(self):
+        """Открывает очередь ключей, исходный текст которых изменился"""
+        self.changes = {'rows': self.session.stale_keys(), 'cursor': 0, 'top': 0}
+        self.full_redraw = True
+
+    def draw_changes(self):
+        """Рисует очередь изменившихся ключей (только при изменениях)"""
+        if not self.full_redraw:
+            return
+        session = self.session
+        changes = self.changes
+        height, width = self.stdscr.getmaxyx()
+        self.stdscr.erase()
+        title = (f"ИЗМЕНИЛСЯ ИСХОДНЫЙ ТЕКСТ: {len(changes['rows'])} | Новых ключей: {len(session.new_keys())} | "
+                 f"Удалено сообщений: {session.removed_sources} | "
+                 f"Отметок удаленных ключей: {len(session.orphaned_marks())}")
+        self.put(0, 0, title, self.color('title') | curses.A_BOLD)
+        self.put(2, 0, "─" * width)
+
+        visible = self.visible_count()
+        rows = changes['rows']
+        for slot, position in enumerate(range(changes['top'], min(len(rows), changes['top'] + visible))):
+            y = HEADER_ROWS + slot * ROWS_PER_KEY
+            handle = rows[position]
+            selected = curses.A_REVERSE if position == changes['cursor'] else 0
+            self.put(y, 0, f"{position + 1:6d}. [!] ", self.color('title') | selected)
+            self.put(y, 13, session.table.path_of(handle), self.color('path') | selected)
+            self.put(y + 1, 8, session.table.keys[handle])
+
+        status = "Очередь пуста" if not rows else f"Ключ {changes['cursor'] + 1} из {len(rows)}"
+        if self.message:
+            status += f"  | {self.message}"
+        self.put(height - 2, 0, status, curses.A_BOLD)
+        self.put(height - 1, 0, CHANGES_HELP_LINE)
+        self.full_redraw = False
+        self.stdscr.noutrefresh()
+        curses.doupdate()
+
+    def handle_changes_key(self, key, char):
+        """Клавиши экрана изменившихся ключей"""
+        changes = self.changes
+        rows = changes['rows']
+        visible = self.visible_count()
+        if char in ('c', 'q') or key == 27:
+            self.changes = None
+        elif char == 'a':
+            self.message = f"Подтверждено сообщений: {self.session.accept_changes()}"
+            changes['rows'] = []
+        elif char in (' ', '\n', '\r') or key in (curses.KEY_ENTER, 10, 13):
+            if rows:
+                self.session.accept_changes([rows[changes['cursor']]])
+                changes['rows'] = self.session.stale_keys()
+        elif key == curses.KEY_UP or char == 'k':
+            changes['cursor'] -= 1
+        elif key == curses.KEY_DOWN or char == 'j':
+            changes['cursor'] += 1
+        elif key == curses.KEY_PPAGE:
+            changes['cursor'] -= visible
+        elif key == curses.KEY_NPAGE:
+            changes['cursor'] += visible
+
+        total = len(changes['rows'])
+        changes['cursor'] = clamp_offset(changes['cursor'], total)
+        if changes['cursor'] < changes['top']:
+            changes['top'] = changes['cursor']
+        elif changes['cursor'] >= changes['top'] + visible:
+            changes['top'] = changes['cursor'] - visible + 1
+        self.full_redraw = True
+
+    def open_issues(self):
+        """Открывает список ошибок плейсхолдеров и синтаксиса сообщений"""
+        self.issues = {'rows': self.session.validate_messages(), 'cursor': 0, 'top': 0}
+        self.full_redraw = True
+
+    def draw_issues(self):
+        """Рисует список ошибок проверки сообщений (только при изменениях)"""
+        if not self.full_redraw:
+            return
+        issues = self.issues
+        rows = issues['rows']
+        height, width = self.stdscr.getmaxyx()
+        self.stdscr.erase()
+        counts = ", ".join(f"{kind}: {count}" for kind, count in count_issues(rows).items() if count)
+        title = f"ПРОВЕРКА СООБЩЕНИЙ: {len(rows)}" + (f" | {counts}" if counts else "")
+        self.put(0, 0, title, self.color('title') | curses.A_BOLD)
+        self.put(2, 0, "─" * width)
+
+        visible = max(1, height - HEADER_ROWS - FOOTER_ROWS)
+        for y, position in enumerate(range(issues['top'], min(len(rows), issues['top'] + visible)), HEADER_ROWS):
+            selected = curses.A_REVERSE if position == issues['cursor'] else 0
+            self.put(y, 0, f"{position + 1:6d}. {format_issue(rows[position])}", self.color('X') | selected)
+
+        status = "Ошибок не найдено" if not rows else f"Ошибка {issues['cursor'] + 1} из {len(rows)}"
+        if self.message:
+            status += f"  | {self.message}"
+        self.put(height - 2, 0, status, curses.A_BOLD)
+        self.put(height - 1, 0, ISSUES_HELP_LINE)
+        self.full_redraw = False
+        self.stdscr.noutrefresh()
+        curses.doupdate()
+
+    def handle_issues_key(self, key, char):
+        """Клавиши экрана проверки сообщений"""
+        issues = self.issues
+        rows = issues['rows']
+        height, _ = self.stdscr.getmaxyx()
+        visible = max(1, height - HEADER_ROWS - FOOTER_ROWS)
+        if char in ('v', 'q') or key == 27:
+            self.issues = None
+        elif char in (' ', '\n', '\r') or key in (curses.KEY_ENTER, 10, 13):
+            issue = rows[issues['cursor']] if rows else None
+            if issue is not None and issue['handle'] is not None:
+                # Ключ с ошибкой обычно уже переведен - показываем его как результат поиска по id
+                query = issue['id'].split('.')[0]
+                found = self.session.search(query)
+                position = bisect_left(found, issue['handle'])
+                if position < len(found) and found[position] == issue['handle']:
+                    self.search = {'query': query, 'rows': found, 'version': self.session.data_version}
+                    self.issues = None
+                    self.cursor = self.top = position
+            if self.issues is not None:
+                self.message = "Ключ не найден в исходном файле"
+        elif key == curses.KEY_UP or char == 'k':
+            issues['cursor'] -= 1
+        elif key == curses.KEY_DOWN or char == 'j':
+            issues['cursor'] += 1
+        elif key == curses.KEY_PPAGE:
+            issues['cursor'] -= visible
+        elif key == curses.KEY_NPAGE:
+            issues['cursor'] += visible
+
+        issues['cursor'] = clamp_offset(issues['cursor'], len(rows))
+        if issues['cursor'] < issues['top']:
+            issues['top'] = issues['cursor']
+        elif issues['cursor'] >= issues['top'] + visible:
+            issues['top'] = issues['cursor'] - visible + 1
+        self.full_redraw = True
+
+    def draw_metrics(self):
+        """Рисует таблицу замеров стадий и счетчиков (только при изменениях)"""
+        if not self.full_redraw:
+            return
+        height, width = self.stdscr.getmaxyx()
+        self.stdscr.erase()
+        self.put(0, 0, "ЗАМЕРЫ СТАДИЙ И СЧЕТЧИКИ (--profile)", self.color('title') | curses.A_BOLD)
+        lines = format_metrics(width - 1)
+        self.put(1, 0, lines[0], curses.A_BOLD)
+        self.put(2, 0, "─" * width)
+        visible = max(1, height - HEADER_ROWS - FOOTER_ROWS)
+        body = lines[1:]
+        self.metrics['top'] = clamp_offset(self.metrics['top'], len(body))
+        top = self.metrics['top']
+        for y, line in enumerate(body[top:top + visible], HEADER_ROWS):
+            self.put(y, 0, line)
+        self.put(height - 2, 0, f"Строки {top + 1}-{min(len(body), top + visible)} из {len(body)}", curses.A_BOLD)
+        self.put(height - 1, 0, METRICS_HELP_LINE)
+        self.full_redraw = False
+        self.stdscr.noutrefresh()
+        curses.doupdate()
+
+    def handle_metrics_key(self, key, char):
+        """Клавиши экрана замеров"""
+        height, _ = self.stdscr.getmaxyx()
+        visible = max(1, height - HEADER_ROWS - FOOTER_ROWS)
+        if char in ('i', 'q') or key == 27:
+            self.metrics = None
+        elif key == curses.KEY_UP or char == 'k':
+            self.metrics['top'] = max(0, self.metrics['top'] - 1)
+        elif key == curses.KEY_DOWN or char == 'j':
+            self.metrics['top'] += 1
+        elif key == curses.KEY_PPAGE:
+            self.metrics['top'] = max(0, self.metrics['top'] - visible)
+        elif key == curses.KEY_NPAGE:
+            self.metrics['top'] += visible
+        self.full_redraw = True
+
+    def mark_cursor_move(self, old_cursor):
+        """Отмечает для перерисовки только строки старого и нового курсора"""
+        self.clamp()
+        for position in (old_cursor, self.cursor):
+            slot = position - self.top
+            if 0 <= slot < self.visible_count():
+                self.dirty_slots.add(slot)
+
+    # --- Ввод ---
+
+    def prompt(self, text):
+        """Запрашивает строку в нижней строке экрана"""
+        height, _ = self.stdscr.getmaxyx()
+        self.clear_line(height - 1)
+        self.put(height - 1, 0, text)
+        curses.echo()
+        curses.curs_set(1)
+        self.stdscr.timeout(-1)
+        try:
+            raw = self.stdscr.getstr(height - 1, min(len(text), 60), 200)
+            return raw.decode(locale.getpreferredencoding() or 'utf-8', 'replace').strip()
+        except curses.error:
+            return ''
+        finally:
+            curses.noecho()
+            curses.curs_set(0)
+            self.stdscr.timeout(TICK_MS)
+
+    def handle_key(self, ch):
+        """Обрабатывает одну клавишу. Возвращает False для выхода"""
+        session = self.session
+        self.message = ''
+        old_cursor = self.cursor
+        key = ch if isinstance(ch, int) else ord(ch) if len(ch) == 1 else -1
+        char = ch.lower() if isinstance(ch, str) else ''
+
+        if self.stats is not None:
+            self.handle_stats_key(key, char)
+            return True
+        if self.changes is not None:
+            self.handle_changes_key(key, char)
+            return True
+        if self.issues is not None:
+            self.handle_issues_key(key, char)
+            return True
+        if self.metrics is not None:
+            self.handle_metrics_key(key, char)
+            return True
+
+        if key in (curses.KEY_UP,) or char == 'k':
+            self.cursor -= 1
+            self.mark_cursor_move(old_cursor)
+        elif key in (curses.KEY_DOWN,) or char == 'j':
+            self.cursor += 1
+            self.mark_cursor_move(old_cursor)
+        elif key == curses.KEY_NPAGE or char == 'n':
+            self.cursor += self.visible_count()
+            self.top += self.visible_count()
+            self.full_redraw = True
+        elif key == curses.KEY_PPAGE or char == 'p':
+            self.cursor -= self.visible_count()
+            self.top = max(0, self.top - self.visible_count())
+            self.full_redraw = True
+        elif key == curses.KEY_HOME:
+            self.cursor = 0
+            self.mark_cursor_move(old_cursor)
+        elif key == curses.KEY_END:
+            self.cursor = len(self.rows()) - 1
+            self.mark_cursor_move(old_cursor)
+        elif char in (' ', '\n', '\r') or key in (curses.KEY_ENTER, 10, 13):
+            if self.rows():
+                handle = self.rows()[self.cursor]
+                new_status = session.toggle(handle)
+                self.message = "Отмечен как переведённый" if new_status == "V" else "Отметка снята"
+                self.dirty_slots.add(self.cursor - self.top)
+                if self.cursor + 1 < len(self.rows()):
+                    self.cursor += 1
+                    self.mark_cursor_move(old_cursor)
+        elif char == ':':
+            answer = self.prompt(f"Номер ключа (1-{len(self.rows())}): ")
+            if answer.isdigit() and 1 <= int(answer) <= len(self.rows()):
+                self.cursor = int(answer) - 1
+                self.top = self.cursor
+                self.full_redraw = True
+            elif answer:
+                self.message = f"Ключ с номером {answer} не найден"
+        elif char == '/':
+            query = self.prompt("Путь или его часть: ")
+            position = find_path_position(session.table, self.rows(), query) if query else None
+            if position is not None:
+                self.cursor = self.top = position
+                self.full_redraw = True
+            elif query:
+                self.message = "Непереведенных ключей в таком пути нет"
+        elif char == 'w':
+            session.show_suggestions = not session.show_suggestions
+            self.message = "Подсказки включены" if session.show_suggestions else "Подсказки выключены"
+        elif char == '?':
+            query = self.prompt("Поиск (текст, re:выражение, ~текст с опечатками): ")
+            if not query:
+                self.search = None
+            else:
+                try:
+                    rows = session.search(query)
+                    if rows:
+                        self.search = {'query': query, 'rows': rows, 'version': session.data_version}
+                    else:
+                        self.message = "Ничего не найдено"
+                except ValueError as e:
+                    self.message = str(e)
+            self.cursor = self.top = 0
+            self.full_redraw = True
+        elif char in ('m', 'u'):
+            status = "V" if char == 'm' else "X"
+            expression = self.prompt("Выбор (1-30, path:, prefix:, re:): ")
+            try:
+                handles = session.select(expression, self.rows()) if expression else []
+                changed = session.mark_many(handles, status)
+                self.message = f"Изменено ключей: {changed}"
+            except ValueError as e:
+                self.message = str(e)
+            self.full_redraw = True
+        elif char == 't':
+            self.open_stats()
+        elif char == 'c':
+            self.open_changes()
+        elif char == 'v':
+            self.open_issues()
+        elif char == 'i':
+            if metrics.enabled:
+                self.metrics = {'top': 0}
+                self.full_redraw = True
+            else:
+                self.message = "Замеры выключены (запустите с --profile)"
+        elif char == 'f':
+            session.next_preset()
+            self.cursor = self.top = 0
+            self.full_redraw = True
+        elif char == 'e':
+            expression = self.prompt("Фильтр (слово, path:, key:, status:, len>N, and/or/not): ")
+            try:
+                session.set_filter(session.resolve_filter(expression))
+                self.cursor = self.top = 0
+            except ValueError as e:
+                self.message = str(e)
+            self.full_redraw = True
+        elif char == 'r':
+            changed_paths = session.refresh()
+            self.message = f"Изменено секций: {len(changed_paths)}"
+            self.full_redraw = True
+        elif char == 's':
+            self.message = "Прогресс сохранён" if session.save() else "Не удалось сохранить прогресс"
+        elif char == 'q':
+            return False
+        elif key == curses.KEY_RESIZE:
+            self.full_redraw = True
+        return True
+
+    def tick(self):
+        """Таймер: автосохранение и подхват изменений файлов"""
+        session = self.session
+        if session.autosave_due() and session.autosave():
+            self.message = "Автосохранение прогресса"
+        if session.watcher is not None:
+            watched = session.poll_watch()
+            if not watched:
+                return
+            changed_paths, merged = watched
+            self.message = f"Файлы изменились: обновлено секций {len(changed_paths)}, подхвачено отметок {merged}"
+        elif session.files_changed():
+            changed_paths = session.refresh()
+            self.message = f"Файлы изменились, обновлено секций: {len(changed_paths)}"
+        else:
+            return
+        if self.stats is not None:
+            self.load_stats_rows()
+        if self.changes is not None:
+            self.open_changes()
+        if self.issues is not None:
+            self.open_issues()
+        self.full_redraw = True
@@ -0,0 +1,58 @@
+# convert_progress.py
+import os
+import sys
+import argparse
+
+from progress_db import ProgressDatabase, is_compact_path, DEFAULT_DELIMITER, COMPACT_EXTENSIONS
+from progress_store import load_checklist, save_checklist, get_journal_path
+
+def file_size(file_path):
+    """Размер файла прогресса вместе с журналом"""
+    return sum(os.path.getsize(path) for path in (file_path, get_journal_path(file_path))
+               if os.path.exists(path))
+
+def format_size(size):
+    return f"{size / 1024:,.1f} КБ".replace(',', ' ')
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Перевод файла прогресса между JSON и компактным форматом SQLite без потерь. '
+                    f'Формат определяется по расширению: {", ".join(COMPACT_EXTENSIONS)} - компактный, '
+                    'остальные - JSON')
+    parser.add_argument('source', help='Исходный файл прогресса (журнал изменений учитывается)')
+    parser.add_argument('destination', help='Новый файл прогресса')
+    parser.add_argument('--delimiter', default=DEFAULT_DELIMITER,
+                        help='Разделитель пути и строки в key_id (для компактного файла: '
+                             'пути хранятся один раз)')
+    args = parser.parse_args()
+
+    if is_compact_path(args.source) == is_compact_path(args.destination):
+        parser.error('файлы должны быть в разных форматах (JSON и SQLite)')
+    if not os.path.exists(args.source):
+        print(f"[X] Файл не найден: {args.source}")
+        return 1
+    if os.path.exists(args.destination):
+        print(f"[X] Файл уже существует: {args.destination} (удалите его или укажите другое имя)")
+        return 1
+
+    print(f"[*] Чтение {args.source}...")
+    checklist = load_checklist(args.source)
+    if is_compact_path(args.destination):
+        # Разделитель записывается в новый файл один раз
+        ProgressDatabase(args.destination, args.delimiter).close()
+    if not save_checklist(args.destination, dict(checklist)):
+        return 1
+    if is_compact_path(args.destination):
+        with ProgressDatabase(args.destination) as db:
+            db.vacuum()
+
+    # Проверка без потерь: файл перечитывается и сравнивается с исходными отметками
+    if load_checklist(args.destination) != checklist:
+        print(f"[X] Записанный файл не совпадает с исходным: {args.destination}")
+        return 1
+    print(f"[V] Записано отметок: {len(checklist)}, проверка чтением пройдена")
+    print(f"[i] Размер: {format_size(file_size(args.source))} -> {format_size(file_size(args.destination))}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,81 @@
+# file_watch.py
+import os
+import threading
+
+def file_stamp(file_path):
+    """Размер и время изменения файла (None, если файла нет)"""
+    try:
+        stat = os.stat(file_path)
+        return stat.st_size, stat.st_mtime_ns
+    except OSError:
+        return None
+
+class FileWatcher:
+    """Фоновый опрос времени изменения файлов.
+
+    Поток раз в interval секунд сравнивает размер и время изменения файлов
+    с прошлым опросом и копит изменившиеся пути; забирает их главный поток
+    через changes(), поэтому состояние сеанса меняется только в нем.
+    Собственные записи сеанса отмечаются через own_write и изменением не считаются.
+    """
+
+    def __init__(self, paths, interval=2.0):
+        self.paths = list(paths)
+        self.interval = interval
+        self.stamps = {path: file_stamp(path) for path in self.paths}
+        self.changed = {}  # путь -> (состояние до изменения, после)
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def start(self):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.run, daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def run(self):
+        while not self.stop_event.wait(self.interval):
+            self.poll()
+
+    def poll(self):
+        """Один опрос файлов, возвращает True, если что-то изменилось"""
+        found = False
+        with self.lock:
+            for path in self.paths:
+                stamp = file_stamp(path)
+                old = self.stamps[path]
+                if stamp != old:
+                    self.stamps[path] = stamp
+                    first, _ = self.changed.get(path, (old, None))
+                    self.changed[path] = (first, stamp)
+                    found = True
+        return found
+
+    def own_write(self, path, before, after):
+        """Отмечает запись самого сеанса: файл сменил состояние before на after.
+
+        Если с прошлого опроса файл никто больше не трогал, изменение не попадет в changes().
+        """
+        with self.lock:
+            if path not in self.stamps:
+                return
+            if self.changed.get(path) == (before, after):
+                # Опрос успел заметить нашу запись - забываем ее
+                del self.changed[path]
+            elif self.stamps[path] == before:
+                self.stamps[path] = after
+                if path in self.changed:
+                    # Чужое изменение до нашей записи остается замеченным
+                    self.changed[path] = (self.changed[path][0], after)
+
+    def changes(self):
+        """Забирает накопленные изменившиеся пути"""
+        with self.lock:
+            changed, self.changed = set(self.changed), {}
+        return changed
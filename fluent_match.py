@@ -0,0 +1,125 @@
+# fluent_match.py
+import re
+
+# Папка языка в пути: /Locale/en-US/... и /Locale/ru-RU/... считаются одним путем
+LOCALE_SEGMENT_RE = re.compile(r'(?<=/Locale/)[^/]+(?=/)')
+# Начало сообщения или терма (с нулевым отступом): id = значение
+ENTRY_RE = re.compile(r'^(-?[A-Za-z][A-Za-z0-9_-]*)[ \t]*=')
+# Атрибут сообщения (с отступом): .attr = значение
+ATTRIBUTE_RE = re.compile(r'^[ \t]+\.([A-Za-z][A-Za-z0-9_-]*)[ \t]*=')
+
+def normalize_path(path):
+    """Заменяет папку языка в пути на '*'"""
+    return LOCALE_SEGMENT_RE.sub('*', path, count=1)
+
+class FileState:
+    """Текущее сообщение и атрибут при проходе по строкам одного файла .ftl"""
+    __slots__ = ('message', 'attribute')
+
+    def __init__(self):
+        self.message = None
+        self.attribute = None
+
+def line_identity(state, norm_path, key):
+    """Возвращает идентичность строки .ftl с учетом предыдущих строк файла.
+
+    - id = значение           -> (путь, id, None)
+    - .attr = значение        -> (путь, id, attr)
+    - продолжение с отступом  -> идентичность сообщения или атрибута, к которому оно относится
+    - комментарий             -> (путь, '#', текст): комментарии сравниваются только по тексту
+    Текст значения в идентичность не входит, поэтому правка перевода ее не меняет.
+    """
+    stripped = key.strip()
+    if stripped.startswith('#'):
+        # Комментарий с нулевым отступом завершает сообщение
+        if not key[:1].isspace():
+            state.message = state.attribute = None
+        return (norm_path, '#', stripped)
+
+    m = ENTRY_RE.match(key)
+    if m:
+        state.message = m.group(1)
+        state.attribute = None
+        return (norm_path, state.message, None)
+
+    if state.message is not None and key[:1].isspace():
+        m = ATTRIBUTE_RE.match(key)
+        if m:
+            state.attribute = m.group(1)
+        return (norm_path, state.message, state.attribute)
+
+    # Строка вне сообщения: сравнивается по тексту
+    state.message = state.attribute = None
+    return (norm_path, None, stripped)
+
+def message_value(key):
+    """Значение строки вида id = значение или .attr = значение; None для остальных строк"""
+    m = ENTRY_RE.match(key) or ATTRIBUTE_RE.match(key)
+    if not m:
+        return None
+    value = key[m.end():].strip()
+    return value or None
+
+def build_identity_index(records, norm_paths=None):
+    """Хэш-индекс идентичностей строк целевого файла.
+
+    Если указан norm_paths, учитываются только пути из этого множества
+    (пути уже приведены normalize_path).
+    """
+    index = set()
+    states = {}
+    normalized = {}
+    for path, key in records:
+        norm_path = normalized.get(path)
+        if norm_path is None:
+            norm_path = normalized[path] = normalize_path(path)
+        if norm_paths is not None and norm_path not in norm_paths:
+            continue
+        state = states.get(path)
+        if state is None:
+            state = states[path] = FileState()
+        index.add(line_identity(state, norm_path, key))
+    return index
+
+class FluentMatcher:
+    """Сопоставление ключей исходного файла с целевым по идентичности сообщений.
+
+    Идентичность каждого ключа таблицы вычисляется один раз при создании.
+    """
+    __slots__ = ('table', 'norm_paths', 'identities')
+
+    def __init__(self, table):
+        self.table = table
+        self.norm_paths = [normalize_path(path) for path in table.paths]
+        states = [FileState() for _ in table.paths]
+        self.identities = []
+        key_paths = table.key_paths
+        for handle, key in enumerate(table.keys):
+            path_id = key_paths[handle]
+            self.identities.append(line_identity(states[path_id], self.norm_paths[path_id], key))
+
+    def original_paths(self, paths):
+        """Пути исходного файла, соответствующие путям (любого языка) из paths"""
+        wanted = {normalize_path(path) for path in paths}
+        return {self.table.paths[path_id] for path_id, norm_path in enumerate(self.norm_paths)
+                if norm_path in wanted}
+
+    def mark(self, records, flags, paths=None):
+        """Отмечает во flags ключи, сообщения которых есть в целевых записях.
+
+        Если указаны paths, обновляются только ключи этих путей.
+        """
+        norm_paths = None
+        path_ids = range(len(self.table.paths))
+        if paths is not None:
+            norm_paths = {normalize_path(path) for path in paths}
+            path_ids = [path_id for path_id, norm_path in enumerate(self.norm_paths)
+                        if norm_path in norm_paths]
+
+        index = build_identity_index(records, norm_paths)
+        identities = self.identities
+        for path_id in path_ids:
+            for handle in self.table.path_handles[path_id]:
+                if identities[handle] in index:
+                    flags[handle] = 1
+        return flags
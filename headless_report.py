@@ -0,0 +1,170 @@
+# headless_report.py
+import csv
+import json
+
+from key_filter import FilterContext
+from path_coverage import PathCoverage, coverage_entry
+
+REPORT_FORMATS = ('json', 'jsonl', 'csv')
+
+# Коды выхода для CI
+EXIT_OK = 0
+EXIT_REGRESSION = 1
+EXIT_ERROR = 2
+
+def iter_key_states(session):
+    """Один проход по ключам: выдает (номер ключа, переведен ли) для ключей под фильтром"""
+    table = session.table
+    key_filter = session.key_filter
+    path_states = key_filter.path_states(table)
+    key_paths = table.key_paths
+    target_flags = session.target_flags
+    checklist = session.checklist
+    ctx = FilterContext(table, target_flags, checklist)
+
+    for handle in range(len(table)):
+        state = path_states[key_paths[handle]]
+        if state is False or (state is None and not key_filter.matches(ctx, handle)):
+            continue
+        yield handle, bool(target_flags[handle]) or checklist.get(handle) == "V"
+
+class ReportWriter:
+    """Потоковая запись отчета: ключи пишутся по мере прохода, итоги - в конце"""
+
+    def __init__(self, stream, fmt):
+        self.stream = stream
+        self.fmt = fmt
+        self.first = True
+        if fmt == 'csv':
+            self.csv = csv.writer(stream)
+            self.csv.writerow(['record', 'path', 'key', 'translated', 'untranslated', 'total', 'percent'])
+        elif fmt == 'json':
+            stream.write('{"untranslated": [')
+
+    def key(self, path, key):
+        if self.fmt == 'csv':
+            self.csv.writerow(['key', path, key, '', '', '', ''])
+        elif self.fmt == 'jsonl':
+            self.stream.write(json.dumps({'type': 'key', 'path': path, 'key': key},
+                                         ensure_ascii=False) + '\n')
+        else:
+            separator = '\n  ' if self.first else ',\n  '
+            self.stream.write(separator + json.dumps({'path': path, 'key': key}, ensure_ascii=False))
+            self.first = False
+
+    def finish(self, paths, directories, summary, changes):
+        if self.fmt == 'csv':
+            for record in ('stale', 'new'):
+                for entry in changes[record]:
+                    self.csv.writerow([record, entry['path'], entry['key'], '', '', '', ''])
+            for key_id in changes['orphaned']:
+                self.csv.writerow(['orphaned', '', key_id, '', '', '', ''])
+            for issue in changes.get('issues', ()):
+                description = f"{issue['id']}: {issue['kind']} {issue['detail']}".rstrip()
+                self.csv.writerow(['issue', issue['path'], description, '', '', '', ''])
+            for record, entries in (('path', paths), ('directory', directories)):
+                for entry in entries:
+                    self.csv.writerow([record, entry['path'], '', entry['translated'],
+                                       entry['untranslated'], entry['total'], entry['percent']])
+            self.csv.writerow(['summary', '', '', summary['translated'], summary['untranslated'],
+                               summary['total'], summary['percent']])
+        elif self.fmt == 'jsonl':
+            for record in ('stale', 'new'):
+                for entry in changes[record]:
+                    self.stream.write(json.dumps(dict(entry, type=record), ensure_ascii=False) + '\n')
+            for key_id in changes['orphaned']:
+                self.stream.write(json.dumps({'type': 'orphaned', 'id': key_id}, ensure_ascii=False) + '\n')
+            for issue in changes.get('issues', ()):
+                self.stream.write(json.dumps(dict(issue, type='issue'), ensure_ascii=False) + '\n')
+            for record, entries in (('path', paths), ('directory', directories)):
+                for entry in entries:
+                    self.stream.write(json.dumps(dict(entry, type=record), ensure_ascii=False) + '\n')
+            self.stream.write(json.dumps(dict(summary, type='summary'), ensure_ascii=False) + '\n')
+        else:
+            self.stream.write('\n]')
+            for record in ('stale', 'new', 'orphaned', 'issues'):
+                if record in changes:
+                    self.stream.write(f', "{record}": ')
+                    json.dump(changes[record], self.stream, ensure_ascii=False)
+            self.stream.write(', "paths": ')
+            json.dump(paths, self.stream, ensure_ascii=False)
+            self.stream.write(', "directories": ')
+            json.dump(directories, self.stream, ensure_ascii=False)
+            self.stream.write(', "summary": ')
+            json.dump(summary, self.stream, ensure_ascii=False)
+            self.stream.write('}\n')
+
+def write_report(session, fmt, stream, validate=False):
+    """Пишет отчет за один проход по ключам и возвращает (покрытие по путям, итоги).
+
+    validate - добавить в отчет ошибки плейсхолдеров и синтаксиса сообщений.
+    """
+    table = session.table
+    writer = ReportWriter(stream, fmt)
+    coverage = PathCoverage(len(table.paths))
+
+    for handle, translated in iter_key_states(session):
+        path_id = table.key_paths[handle]
+        coverage.add(path_id, translated)
+        if not translated:
+            writer.key(table.paths[path_id], table.keys[handle])
+
+    paths = coverage.path_rows(table)
+    translated_total = sum(entry['translated'] for entry in paths)
+    untranslated_total = sum(entry['untranslated'] for entry in paths)
+    summary = coverage_entry(None, translated_total, untranslated_total)
+    del summary['path']
+    summary['paths'] = len(paths)
+
+    # Очередь изменившихся с прошлого сохранения ключей
+    changes = {
+        'stale': [{'path': table.path_of(handle), 'key': table.keys[handle]}
+                  for handle in session.stale_keys()],
+        'new': [{'path': table.path_of(handle), 'key': table.keys[handle]}
+                for handle in session.new_keys()],
+        'orphaned': session.orphaned_marks(),
+    }
+    summary['stale'] = len(changes['stale'])
+    summary['new'] = len(changes['new'])
+    summary['orphaned'] = len(changes['orphaned'])
+    summary['removed'] = session.removed_sources
+    if validate:
+        changes['issues'] = [{'path': issue['path'], 'id': issue['id'], 'kind': issue['kind'],
+                              'detail': issue['detail'], 'side': issue['side']}
+                             for issue in session.validate_messages()]
+        summary['issues'] = len(changes['issues'])
+
+    writer.finish(paths, coverage.directory_rows(table), summary, changes)
+    return paths, summary
+
+def load_baseline(file_path):
+    """Загружает итоги прошлого отчета в формате json"""
+    with open(file_path, 'r', encoding='utf-8') as f:
+        report = json.load(f)
+    baseline_paths = {entry['path']: entry for entry in report.get('paths', [])}
+    return baseline_paths, report.get('summary', {})
+
+def find_regressions(paths, summary, baseline=None, max_untranslated=None, fail_on_stale=False,
+                     fail_on_issues=False):
+    """Возвращает список сообщений о регрессиях (пустой - все в порядке)"""
+    problems = []
+    if fail_on_stale and summary['stale']:
+        problems.append(f"Изменился исходный текст переведенных ключей: {summary['stale']}")
+    if fail_on_issues and summary.get('issues'):
+        problems.append(f"Ошибки в сообщениях (плейсхолдеры, скобки, повторы id): {summary['issues']}")
+    if max_untranslated is not None and summary['untranslated'] > max_untranslated:
+        problems.append(f"Непереведенных ключей: {summary['untranslated']} "
+                        f"(допустимо не больше {max_untranslated})")
+
+    if baseline is not None:
+        baseline_paths, baseline_summary = baseline
+        if summary['untranslated'] > baseline_summary.get('untranslated', summary['untranslated']):
+            problems.append(f"Непереведенных ключей стало больше: "
+                            f"{baseline_summary['untranslated']} -> {summary['untranslated']}")
+        for entry in paths:
+            previous = baseline_paths.get(entry['path'])
+            previous_untranslated = previous['untranslated'] if previous else 0
+            if entry['untranslated'] > previous_untranslated:
+                problems.append(f"{entry['path']}: непереведенных ключей "
+                                f"{previous_untranslated} -> {entry['untranslated']}")
+    return problems
@@ -0,0 +1,347 @@
+# key_filter.py
+import os
+import re
+import json
+import fnmatch
+
+FILTER_HELP = ("Условия: слово (часть пути), path:<шаблон пути>, key:<регулярное выражение>, "
+               "status:V|X|target|translated|untranslated (X - отметка X или ее отсутствие), "
+               "len>N, len<N, len>=N, len<=N, len=N, minlen:N, maxlen:N; "
+               "объединяются через and, or, not и скобки. Пустое выражение - без фильтра")
+
+# Встроенные пресеты (совпадают со старыми режимами 0, 1, 2)
+BUILTIN_PRESETS = [
+    ("БЕЗ ФИЛЬТРА", ""),
+    ("ТОЛЬКО DATASETS", "datasets"),
+    ("СКРЫТЬ DATASETS", "not datasets"),
+]
+
+_TOKEN_RE = re.compile(r'\s*(?:(\()|(\))|"((?:[^"\\]|\\.)*)"|([^\s()"]+(?:"(?:[^"\\]|\\.)*")?))')
+_LENGTH_RE = re.compile(r'^len(>=|<=|>|<|=)(\d+)$')
+_LENGTH_OPS = {
+    '>': lambda a, b: a > b,
+    '<': lambda a, b: a < b,
+    '>=': lambda a, b: a >= b,
+    '<=': lambda a, b: a <= b,
+    '=': lambda a, b: a == b,
+}
+
+# --- Узлы выражения ---
+# path_state(path) возвращает True/False, если результат зависит только от пути,
+# и None, если для ответа нужен сам ключ; match(ctx, handle) - полная проверка ключа.
+
+class _PathNode:
+    __slots__ = ('test',)
+
+    def __init__(self, pattern):
+        if any(ch in pattern for ch in '*?['):
+            self.test = lambda path: fnmatch.fnmatchcase(path, pattern)
+        else:
+            self.test = lambda path: pattern in path
+
+    def path_state(self, path):
+        return self.test(path)
+
+    def match(self, ctx, handle):
+        return self.test(ctx.table.path_of(handle))
+
+class _KeyRegexNode:
+    __slots__ = ('regex',)
+
+    def __init__(self, regex):
+        self.regex = regex
+
+    def path_state(self, path):
+        return None
+
+    def match(self, ctx, handle):
+        return self.regex.search(ctx.table.keys[handle]) is not None
+
+class _LengthNode:
+    __slots__ = ('op', 'limit')
+
+    def __init__(self, op, limit):
+        self.op = _LENGTH_OPS[op]
+        self.limit = limit
+
+    def path_state(self, path):
+        return None
+
+    def match(self, ctx, handle):
+        return self.op(len(ctx.table.keys[handle]), self.limit)
+
+class _StatusNode:
+    __slots__ = ('status',)
+
+    def __init__(self, status):
+        self.status = status
+
+    def path_state(self, path):
+        return None
+
+    def match(self, ctx, handle):
+        in_target = bool(ctx.target_flags[handle])
+        marked = ctx.checklist.get(handle)
+        if self.status == 'target':
+            return in_target
+        if self.status == 'translated':
+            return in_target or marked == "V"
+        if self.status == 'untranslated':
+            return not in_target and marked != "V"
+        # Ключ без отметки на экране показывается как X
+        return (marked or "X") == self.status
+
+class _NotNode:
+    __slots__ = ('node',)
+
+    def __init__(self, node):
+        self.node = node
+
+    def path_state(self, path):
+        state = self.node.path_state(path)
+        return None if state is None else not state
+
+    def match(self, ctx, handle):
+        return not self.node.match(ctx, handle)
+
+class _AndNode:
+    __slots__ = ('nodes',)
+
+    def __init__(self, nodes):
+        self.nodes = nodes
+
+    def path_state(self, path):
+        result = True
+        for node in self.nodes:
+            state = node.path_state(path)
+            if state is False:
+                return False
+            if state is None:
+                result = None
+        return result
+
+    def match(self, ctx, handle):
+        return all(node.match(ctx, handle) for node in self.nodes)
+
+class _OrNode:
+    __slots__ = ('nodes',)
+
+    def __init__(self, nodes):
+        self.nodes = nodes
+
+    def path_state(self, path):
+        result = False
+        for node in self.nodes:
+            state = node.path_state(path)
+            if state is True:
+                return True
+            if state is None:
+                result = None
+        return result
+
+    def match(self, ctx, handle):
+        return any(node.match(ctx, handle) for node in self.nodes)
+
+class _TrueNode:
+    __slots__ = ()
+
+    def path_state(self, path):
+        return True
+
+    def match(self, ctx, handle):
+        return True
+
+# --- Разбор выражения ---
+
+def _tokenize(text):
+    tokens = []
+    pos = 0
+    text = text.strip()
+    while pos < len(text):
+        m = _TOKEN_RE.match(text, pos)
+        if not m or m.end() == pos:
+            raise ValueError(f"Не удалось разобрать фильтр с позиции {pos + 1}")
+        pos = m.end()
+        if m.group(1):
+            tokens.append('(')
+        elif m.group(2):
+            tokens.append(')')
+        elif m.group(3) is not None:
+            tokens.append(('word', m.group(3).replace('\\"', '"')))
+        else:
+            word = m.group(4)
+            # Значение в кавычках после префикса: key:"a b"
+            if word.endswith('"') and ':"' in word:
+                name, _, value = word.partition(':')
+                word = f"{name}:{value[1:-1]}"
+            tokens.append(('word', word) if word.lower() not in ('and', 'or', 'not') else word.lower())
+        while pos < len(text) and text[pos].isspace():
+            pos += 1
+    return tokens
+
+def _parse_atom(word):
+    name, sep, value = word.partition(':')
+    if sep and name in ('path', 'key', 'status', 'minlen', 'maxlen'):
+        if not value:
+            raise ValueError(f"Пустое значение в '{word}'")
+        if name == 'path':
+            return _PathNode(value)
+        if name == 'key':
+            try:
+                return _KeyRegexNode(re.compile(value))
+            except re.error as e:
+                raise ValueError(f"Неверное регулярное выражение '{value}': {e}")
+        if name == 'status':
+            status = value if value in ('V', 'X') else value.lower()
+            if status not in ('V', 'X', 'target', 'translated', 'untranslated'):
+                raise ValueError(f"Неизвестный статус '{value}'")
+            return _StatusNode(status)
+        if not value.isdigit():
+            raise ValueError(f"Ожидалось число в '{word}'")
+        return _LengthNode('>=' if name == 'minlen' else '<=', int(value))
+
+    m = _LENGTH_RE.match(word)
+    if m:
+        return _LengthNode(m.group(1), int(m.group(2)))
+    return _PathNode(word)
+
+class _Parser:
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.pos = 0
+        # Есть ли условие на отметку (status:V, X, translated, untranslated)
+        self.uses_status = False
+
+    def peek(self):
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else None
+
+    def take(self):
+        token = self.peek()
+        self.pos += 1
+        return token
+
+    def parse(self):
+        node = self.parse_or()
+        if self.peek() is not None:
+            raise ValueError("Лишняя закрывающая скобка или условие в фильтре")
+        return node
+
+    def parse_or(self):
+        nodes = [self.parse_and()]
+        while self.peek() == 'or':
+            self.take()
+            nodes.append(self.parse_and())
+        return nodes[0] if len(nodes) == 1 else _OrNode(nodes)
+
+    def parse_and(self):
+        nodes = [self.parse_not()]
+        while self.peek() not in (None, 'or', ')'):
+            if self.peek() == 'and':
+                self.take()
+            nodes.append(self.parse_not())
+        return nodes[0] if len(nodes) == 1 else _AndNode(nodes)
+
+    def parse_not(self):
+        if self.peek() == 'not':
+            self.take()
+            return _NotNode(self.parse_not())
+        return self.parse_primary()
+
+    def parse_primary(self):
+        token = self.take()
+        if token == '(':
+            node = self.parse_or()
+            if self.take() != ')':
+                raise ValueError("Не хватает закрывающей скобки в фильтре")
+            return node
+        if isinstance(token, tuple):
+            node = _parse_atom(token[1])
+            if isinstance(node, _StatusNode) and node.status != 'target':
+                self.uses_status = True
+            return node
+        raise ValueError("Ожидалось условие фильтра")
+
+class FilterContext:
+    """Данные, по которым проверяются условия на уровне ключа"""
+    __slots__ = ('table', 'target_flags', 'checklist')
+
+    def __init__(self, table, target_flags, checklist):
+        self.table = table
+        self.target_flags = target_flags
+        self.checklist = checklist
+
+class KeyFilter:
+    """Скомпилированное выражение фильтра.
+
+    Условия на путь вычисляются один раз на путь (path_states), условия на
+    ключ - только для путей, где одного пути для ответа недостаточно.
+    depends_on_status - результат зависит от отметок, то есть ключ может
+    войти в фильтр или выйти из него при каждой отметке.
+    """
+    __slots__ = ('expression', 'root', 'depends_on_status')
+
+    def __init__(self, expression=''):
+        self.expression = expression.strip()
+        tokens = _tokenize(self.expression)
+        parser = _Parser(tokens)
+        self.root = parser.parse() if tokens else _TrueNode()
+        self.depends_on_status = parser.uses_status
+
+    def path_states(self, table):
+        """Для каждого пути таблицы: True/False или None (нужна проверка ключей)"""
+        return [self.root.path_state(path) for path in table.paths]
+
+    def matches(self, ctx, handle, path_states=None):
+        """Проверяет один ключ"""
+        if path_states is not None:
+            state = path_states[ctx.table.key_paths[handle]]
+            if state is not None:
+                return state
+        return self.root.match(ctx, handle)
+
+    def path_keys(self, ctx, path_id, state):
+        """Ключи одного пути, проходящие фильтр (state - результат path_states для пути)"""
+        if state is None:
+            match = self.root.match
+            return [handle for handle in ctx.table.path_handles[path_id] if match(ctx, handle)]
+        return ctx.table.path_handles[path_id] if state else ()
+
+def compile_filter(expression):
+    """Компилирует выражение фильтра; при ошибке выбрасывает ValueError"""
+    return KeyFilter(expression)
+
+def resolve_filter(presets, text):
+    """Номер или имя пресета превращает в выражение, остальное считает выражением"""
+    text = text.strip()
+    if text.isdigit() and int(text) < len(presets):
+        return presets[int(text)][1]
+    for name, expression in presets:
+        if name.lower() == text.lower():
+            return expression
+    return text
+
+def load_presets(file_path):
+    """Загружает пресеты фильтров: встроенные плюс сохраненные пользователем"""
+    presets = list(BUILTIN_PRESETS)
+    if file_path and os.path.exists(file_path):
+        try:
+            with open(file_path, 'r', encoding='utf-8') as f:
+                for entry in json.load(f):
+                    presets.append((entry['name'], entry['expression']))
+        except Exception as e:
+            print(f"[!] Ошибка загрузки пресетов фильтров: {e}")
+    return presets
+
+def save_presets(file_path, presets):
+    """Сохраняет пользовательские пресеты (встроенные не записываются)"""
+    custom = [{'name': name, 'expression': expression}
+              for name, expression in presets[len(BUILTIN_PRESETS):]]
+    try:
+        tmp_path = f"{file_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(custom, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, file_path)
+        return True
+    except Exception as e:
+        print(f"[!] Ошибка сохранения пресетов фильтров: {e}")
+        return False
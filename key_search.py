@@ -0,0 +1,220 @@
+# key_search.py
+import re
+from array import array
+
+SEARCH_HELP = ("Текст - подстрока в ключе (id и значение) или пути, re:<регулярное выражение>, "
+               "~текст - нечеткий поиск с опечатками. Пустой ввод - вернуться к списку")
+
+# Длина n-граммы индекса; более короткие запросы ищутся перебором
+NGRAM = 3
+
+def trigrams(text):
+    """Множество триграмм строки (строка уже в нижнем регистре)"""
+    return {text[i:i + NGRAM] for i in range(len(text) - NGRAM + 1)}
+
+def allowed_typos(query):
+    """Сколько опечаток допускает нечеткий поиск для запроса такой длины"""
+    if len(query) <= NGRAM:
+        # В очень коротком запросе опечатка делает подходящим почти любой ключ
+        return 0
+    return 1 if len(query) <= 8 else 2
+
+def fuzzy_distance(pattern, text, limit):
+    """Наименьшее число правок, за которое pattern становится подстрокой text.
+
+    Битовый алгоритм Майерса: один столбец динамики хранится в двух целых.
+    Возвращает None, если правок нужно больше limit.
+    """
+    m = len(pattern)
+    peq = {}
+    for i, ch in enumerate(pattern):
+        peq[ch] = peq.get(ch, 0) | (1 << i)
+    mask = (1 << m) - 1
+    high = 1 << (m - 1)
+    pv, mv, score = mask, 0, m
+    best = m
+    for ch in text:
+        eq = peq.get(ch, 0)
+        xv = eq | mv
+        xh = ((((eq & pv) + pv) & mask) ^ pv) | eq
+        ph = (mv | ~(xh | pv)) & mask
+        mh = pv & xh
+        if ph & high:
+            score += 1
+        elif mh & high:
+            score -= 1
+        # Начало совпадения в text свободное: в нижний бит ничего не вдвигается
+        ph = (ph << 1) & mask
+        mh = (mh << 1) & mask
+        pv = (mh | ~(xv | ph)) & mask
+        mv = ph & xv
+        if score < best:
+            best = score
+            if best == 0:
+                break
+    return best if best <= limit else None
+
+def split_pieces(query, limit):
+    """Делит запрос на limit + 1 кусков: при limit правках хотя бы один кусок цел"""
+    count = limit + 1
+    size = len(query) // count
+    pieces = []
+    for i in range(count):
+        start = i * size
+        end = len(query) if i == count - 1 else start + size
+        pieces.append((start, query[start:end]))
+    return pieces
+
+class _SectionIndex:
+    """Триграммы ключей одного пути: триграмма -> номера ключей внутри пути"""
+    __slots__ = ('lower', 'postings')
+
+    def __init__(self, keys):
+        self.lower = [key.lower() for key in keys]
+        self.postings = {}
+        for offset, text in enumerate(self.lower):
+            for gram in trigrams(text):
+                posting = self.postings.get(gram)
+                if posting is None:
+                    posting = self.postings[gram] = array('I')
+                posting.append(offset)
+
+class SearchIndex:
+    """Индекс триграмм для поиска по ключам и путям.
+
+    Индекс хранится по путям: при изменении исходного файла заново
+    индексируются только изменившиеся секции (см. update).
+    """
+    __slots__ = ('table', 'sections')
+
+    def __init__(self, table):
+        self.table = None
+        self.sections = {}
+        self.update(table)
+
+    def update(self, table, changed_paths=None):
+        """Перестраивает индекс под новую таблицу ключей.
+
+        changed_paths - пути, секции которых изменились; остальные берутся как есть.
+        None - построить все заново.
+        """
+        sections = {}
+        for path_id, path in enumerate(table.paths):
+            section = self.sections.get(path)
+            if section is None or changed_paths is None or path in changed_paths:
+                section = _SectionIndex([table.keys[handle] for handle in table.path_handles[path_id]])
+            sections[path] = section
+        self.table = table
+        self.sections = sections
+
+    def search(self, text):
+        """Возвращает номера подходящих ключей в порядке файла.
+
+        При неверном регулярном выражении выбрасывает ValueError.
+        """
+        text = text.strip()
+        if text.startswith('re:'):
+            return self.search_regex(text[3:])
+        if text.startswith('~'):
+            return self.search_fuzzy(text[1:].strip().lower())
+        return self.search_substring(text.lower())
+
+    def _handles(self, matches):
+        """Собирает номера ключей из пар (номер пути, номера внутри пути)"""
+        result = []
+        path_handles = self.table.path_handles
+        for path_id, offsets in matches:
+            handles = path_handles[path_id]
+            result.extend(handles[offset] for offset in offsets)
+        result.sort()
+        return result
+
+    def _sections(self):
+        for path_id, path in enumerate(self.table.paths):
+            yield path_id, path, self.sections[path]
+
+    def search_substring(self, query):
+        if not query:
+            return []
+        grams = trigrams(query)
+        matches = []
+        for path_id, path, section in self._sections():
+            if query in path.lower():
+                matches.append((path_id, range(len(section.lower))))
+                continue
+            if grams:
+                # Кандидаты - пересечение списков триграмм, начиная с самого короткого
+                postings = [section.postings.get(gram) for gram in grams]
+                if not all(postings):
+                    continue
+                postings.sort(key=len)
+                candidates = set(postings[0])
+                for posting in postings[1:]:
+                    candidates.intersection_update(posting)
+                    if not candidates:
+                        break
+            else:
+                candidates = range(len(section.lower))
+            lower = section.lower
+            matches.append((path_id, [offset for offset in candidates if query in lower[offset]]))
+        return self._handles(matches)
+
+    def search_regex(self, pattern):
+        try:
+            regex = re.compile(pattern, re.IGNORECASE)
+        except re.error as e:
+            raise ValueError(f"Неверное регулярное выражение '{pattern}': {e}")
+        matches = []
+        for path_id, path, section in self._sections():
+            if regex.search(path):
+                matches.append((path_id, range(len(section.lower))))
+            else:
+                keys = self.table.keys
+                handles = self.table.path_handles[path_id]
+                matches.append((path_id, [offset for offset, handle in enumerate(handles)
+                                          if regex.search(keys[handle])]))
+        return self._handles(matches)
+
+    def _piece_candidates(self, section, piece):
+        """Номера ключей пути, где может встретиться кусок запроса"""
+        grams = trigrams(piece)
+        if not grams:
+            return range(len(section.lower))
+        postings = [section.postings.get(gram) for gram in grams]
+        if not all(postings):
+            return ()
+        postings.sort(key=len)
+        candidates = set(postings[0])
+        for posting in postings[1:]:
+            candidates.intersection_update(posting)
+        return candidates
+
+    def search_fuzzy(self, query):
+        """Ключи, в которых есть query с точностью до нескольких опечаток.
+
+        Кандидаты ищутся по индексу для кусков запроса, один из которых должен
+        найтись точно; расстояние считается только в окне вокруг этого куска.
+        """
+        limit = allowed_typos(query)
+        if not limit:
+            return self.search_substring(query)
+        pieces = split_pieces(query, limit)
+        length = len(query)
+        matches = []
+        for path_id, path, section in self._sections():
+            lower = section.lower
+            found = set()
+            for start, piece in pieces:
+                for offset in self._piece_candidates(section, piece):
+                    if offset in found:
+                        continue
+                    text = lower[offset]
+                    pos = text.find(piece)
+                    while pos >= 0:
+                        window = text[max(0, pos - start - limit):pos - start + length + limit]
+                        if fuzzy_distance(query, window, limit) is not None:
+                            found.add(offset)
+                            break
+                        pos = text.find(piece, pos + 1)
+            matches.append((path_id, found))
+        return self._handles(matches)
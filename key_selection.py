@@ -0,0 +1,101 @@
+# key_selection.py
+import re
+from bisect import bisect_left
+
+SELECTION_HELP = ("Элементы через пробел: 5, 1-30, 3,7,9-12 (номера в списке), "
+                  "path:<путь .ftl>, prefix:<начало пути>, re:<регулярное выражение по ключу>")
+
+class PrefixIndex:
+    """Отсортированный список путей для поиска по префиксу бинарным поиском"""
+    __slots__ = ('paths', 'path_ids')
+
+    def __init__(self, table):
+        order = sorted(range(len(table.paths)), key=table.paths.__getitem__)
+        self.paths = [table.paths[path_id] for path_id in order]
+        self.path_ids = order
+
+    def find(self, prefix):
+        """Возвращает номера путей, начинающихся с prefix"""
+        result = []
+        for pos in range(bisect_left(self.paths, prefix), len(self.paths)):
+            if not self.paths[pos].startswith(prefix):
+                break
+            result.append(self.path_ids[pos])
+        return result
+
+def parse_selection(text):
+    """Разбирает выражение выбора ключей.
+
+    Возвращает список (вид, значение), где вид - 'range', 'path', 'prefix' или 're'.
+    При ошибке выбрасывает ValueError.
+    """
+    terms = []
+    for token in text.split():
+        kind, sep, value = token.partition(':')
+        if sep and kind in ('path', 'prefix', 're'):
+            if not value:
+                raise ValueError(f"Пустое значение в '{token}'")
+            if kind == 're':
+                try:
+                    value = re.compile(value)
+                except re.error as e:
+                    raise ValueError(f"Неверное регулярное выражение '{value}': {e}")
+            terms.append((kind, value))
+            continue
+
+        for part in token.split(','):
+            if not part:
+                continue
+            first, dash, last = part.partition('-')
+            if not first.isdigit() or (dash and not last.isdigit()):
+                raise ValueError(f"Не удалось разобрать '{part}'")
+            start = int(first)
+            end = int(last) if dash else start
+            if start < 1 or end < start:
+                raise ValueError(f"Неверный диапазон '{part}'")
+            terms.append(('range', (start, end)))
+    return terms
+
+def select_handles(table, terms, untranslated=None, prefix_index=None, allowed=None):
+    """Возвращает отсортированный список номеров ключей, выбранных выражением.
+
+    Номера из диапазонов отсчитываются в списке untranslated (с 1);
+    allowed - необязательный список флагов по номерам путей (текущий фильтр).
+    """
+    selected = set()
+    path_ids = set()
+    regexes = []
+
+    for kind, value in terms:
+        if kind == 'range':
+            start, end = value
+            total = len(untranslated) if untranslated is not None else 0
+            if end > total:
+                raise ValueError(f"Номер {end} вне списка (всего ключей: {total})")
+            selected.update(untranslated[start - 1:end])
+        elif kind == 'path':
+            path_id = table.path_ids.get(value)
+            if path_id is not None:
+                path_ids.add(path_id)
+        elif kind == 'prefix':
+            if prefix_index is None:
+                prefix_index = PrefixIndex(table)
+            path_ids.update(prefix_index.find(value))
+        elif kind == 're':
+            regexes.append(value)
+
+    for path_id in path_ids:
+        if allowed is None or allowed[path_id]:
+            selected.update(table.path_handles[path_id])
+
+    if regexes:
+        keys = table.keys
+        key_paths = table.key_paths
+        for handle in range(len(table)):
+            if allowed is not None and not allowed[key_paths[handle]]:
+                continue
+            key = keys[handle]
+            if any(regex.search(key) for regex in regexes):
+                selected.add(handle)
+
+    return sorted(selected)
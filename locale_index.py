@@ -0,0 +1,487 @@
+# locale_index.py
+import os
+import re
+import sys
+import mmap
+import struct
+import hashlib
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict
+
+from profiling import metrics, timed
+from key_filter import KeyFilter, FilterContext
+
+# Папка с бинарным кэшем индекса ключей (создается рядом с файлом локализации)
+CACHE_DIR_NAME = '.locacheck_cache'
+# Версия формата кэша: при изменении формата старые кэши игнорируются
+CACHE_VERSION = 2
+# Формат файла кэша: сигнатура с версией, заголовок, затем массивы чисел и строки UTF-8.
+# Кэш читается без pickle, поэтому подмененный файл не может выполнить код
+CACHE_MAGIC = b'LCIDX%d\n' % CACHE_VERSION
+# Заголовок: размер и время изменения файла, хэш содержимого (16 байт),
+# длина разделителя, число путей и число записей
+CACHE_HEADER = struct.Struct('<Qq16sIII')
+# Размер куска файла при потоковом чтении
+STREAM_CHUNK_SIZE = 1 << 20
+
+def should_skip_line(line):
+    """Определяет, нужно ли пропускать строку (комментарии)"""
+    return not line.strip() or line.startswith('#')
+
+def get_cache_path(file_path, delimiter):
+    """Возвращает путь к файлу кэша для пары (файл, разделитель)"""
+    directory = os.path.join(os.path.dirname(os.path.abspath(file_path)), CACHE_DIR_NAME)
+    name = f"{os.path.basename(file_path)}.{delimiter.encode('utf-8').hex()}.idx"
+    return os.path.join(directory, name)
+
+def hash_buffer(buffer):
+    """Считает контрольную сумму содержимого файла"""
+    return hashlib.blake2b(buffer, digest_size=16).hexdigest()
+
+def compile_line_pattern(delimiter):
+    """Регулярное выражение для строк буфера, содержащих разделитель"""
+    return re.compile(rb'^.*?' + re.escape(delimiter.encode('utf-8')) + rb'.*$', re.M)
+
+def iter_buffer_records(buffer, delimiter, pattern=None):
+    """Выдает записи (путь, ключ) из буфера по одной"""
+    # Регулярное выражение находит в буфере только строки с разделителем,
+    # поэтому остальные строки не декодируются и не разбиваются
+    if pattern is None:
+        pattern = compile_line_pattern(delimiter)
+    for match in pattern.finditer(buffer):
+        line = match.group().decode('utf-8').strip()
+
+        if should_skip_line(line):
+            continue
+
+        if delimiter not in line:
+            continue
+
+        path, key = line.split(delimiter, 1)
+        # Один и тот же путь повторяется для тысяч строк - храним его один раз
+        yield sys.intern(path), key
+
+def scan_records(buffer, delimiter):
+    """Сканирует буфер целиком и возвращает список записей (путь, ключ)"""
+    return list(iter_buffer_records(buffer, delimiter))
+
+def iter_file_records(file_path, delimiter, chunk_size=STREAM_CHUNK_SIZE):
+    """Потоково читает файл кусками по chunk_size байт и выдает записи (путь, ключ).
+
+    В памяти одновременно находится только один кусок файла, поэтому
+    размер файла не ограничен доступной памятью.
+    """
+    pattern = compile_line_pattern(delimiter)
+    tail = b''
+    with open(file_path, 'rb') as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            metrics.count('bytes_streamed', len(chunk))
+            chunk = tail + chunk
+            # Последняя строка куска может быть неполной - переносим ее в следующий
+            end = chunk.rfind(b'\n') + 1
+            tail = chunk[end:]
+            yield from iter_buffer_records(chunk[:end], delimiter, pattern)
+    if tail:
+        yield from iter_buffer_records(tail, delimiter, pattern)
+
+def compute_section_digests(records):
+    """Считает контрольную сумму каждой секции (пути .ftl) за один проход"""
+    hashers = OrderedDict()
+    for path, key in records:
+        hasher = hashers.get(path)
+        if hasher is None:
+            hasher = hashers[path] = hashlib.blake2b(digest_size=8)
+        hasher.update(key.encode('utf-8'))
+        hasher.update(b'\n')
+    return OrderedDict((path, hasher.hexdigest()) for path, hasher in hashers.items())
+
+def _read_exact(f, size):
+    data = f.read(size)
+    if len(data) != size:
+        raise ValueError("кэш обрезан")
+    return data
+
+def _read_array(f, typecode, count):
+    values = array(typecode)
+    values.frombytes(_read_exact(f, values.itemsize * count))
+    return values
+
+def _read_strings(f, count):
+    """Читает count строк: длина блока и строки UTF-8 через перевод строки"""
+    size, = struct.unpack('<Q', _read_exact(f, 8))
+    strings = _read_exact(f, size).decode('utf-8').split('\n') if count else []
+    if len(strings) != count:
+        raise ValueError("кэш поврежден")
+    return strings
+
+def _write_strings(f, strings):
+    """Записывает строки одним блоком UTF-8 (строки файла локализации не содержат переводов строки)"""
+    blob = '\n'.join(strings).encode('utf-8')
+    f.write(struct.pack('<Q', len(blob)))
+    f.write(blob)
+
+def _read_header(f):
+    """Заголовок кэша и (число путей, число записей); None для чужого формата"""
+    if f.read(len(CACHE_MAGIC)) != CACHE_MAGIC:
+        return None
+    size, mtime_ns, digest, delimiter_size, path_count, record_count = \
+        CACHE_HEADER.unpack(_read_exact(f, CACHE_HEADER.size))
+    header = {
+        'version': CACHE_VERSION,
+        'delimiter': _read_exact(f, delimiter_size).decode('utf-8'),
+        'size': size,
+        'mtime_ns': mtime_ns,
+        'digest': digest.hex(),
+    }
+    return header, path_count, record_count
+
+def read_cache_header(cache_path):
+    """Читает только заголовок кэша (без записей)"""
+    try:
+        with open(cache_path, 'rb') as f:
+            result = _read_header(f)
+        if result is not None:
+            return result[0]
+    except Exception:
+        pass
+    return None
+
+def _read_sections(f):
+    """Пути и контрольные суммы секций кэша (файл - сразу после заголовка)"""
+    _, path_count, record_count = _read_header(f)
+    paths = [sys.intern(path) for path in _read_strings(f, path_count)]
+    digests = _read_exact(f, 8 * path_count)
+    sections = OrderedDict((path, digests[8 * i:8 * i + 8].hex()) for i, path in enumerate(paths))
+    return paths, sections, record_count
+
+def read_cache_sections(cache_path):
+    """Читает из кэша только контрольные суммы секций, без записей"""
+    try:
+        with open(cache_path, 'rb') as f:
+            return _read_sections(f)[1]
+    except Exception:
+        return None
+
+def read_cache_records(cache_path, wanted=None):
+    """Читает записи и контрольные суммы секций из кэша, пропуская заголовок.
+
+    С wanted (проверка пути) декодируются только ключи подходящих путей.
+    """
+    try:
+        with open(cache_path, 'rb') as f:
+            paths, sections, record_count = _read_sections(f)
+            record_paths = _read_array(f, 'I', record_count)
+            if wanted is None:
+                keys = _read_strings(f, record_count)
+                return list(zip([paths[path_id] for path_id in record_paths], keys)), sections
+            size, = struct.unpack('<Q', _read_exact(f, 8))
+            parts = _read_exact(f, size).split(b'\n') if record_count else []
+        if len(parts) != record_count:
+            raise ValueError("кэш поврежден")
+        wanted_ids = {path_id for path_id, path in enumerate(paths) if wanted(path)}
+        records = [(paths[path_id], part.decode('utf-8'))
+                   for path_id, part in zip(record_paths, parts) if path_id in wanted_ids]
+        return records, sections
+    except Exception:
+        return None
+
+def write_cache(cache_path, header, records, sections):
+    """Записывает кэш во временный файл и атомарно подменяет старый.
+
+    Пути секций пишутся один раз, запись хранит номер пути и текст ключа.
+    """
+    try:
+        path_ids = {path: path_id for path_id, path in enumerate(sections)}
+        record_paths = array('I', (path_ids[path] for path, _ in records))
+        delimiter = header['delimiter'].encode('utf-8')
+
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(CACHE_MAGIC)
+            f.write(CACHE_HEADER.pack(header['size'], header['mtime_ns'], bytes.fromhex(header['digest']),
+                                      len(delimiter), len(sections), len(records)))
+            f.write(delimiter)
+            _write_strings(f, sections)
+            f.write(b''.join(bytes.fromhex(digest) for digest in sections.values()))
+            record_paths.tofile(f)
+            _write_strings(f, [key for _, key in records])
+        os.replace(tmp_path, cache_path)
+        return True
+    except Exception:
+        # Кэш - только ускорение, ошибки записи не должны мешать работе
+        return False
+
+def _cache_header(file_path, delimiter, stat, use_cache):
+    """Заголовок кэша файла, если кэш подходит по разделителю и размеру файла"""
+    header = read_cache_header(get_cache_path(file_path, delimiter)) if use_cache else None
+    if header and (header.get('delimiter') != delimiter or header.get('size') != stat.st_size):
+        return None
+    return header
+
+def load_section_digests(file_path, delimiter, use_cache=True):
+    """Контрольные суммы секций файла; при свежем кэше записи не читаются"""
+    stat = os.stat(file_path)
+    header = _cache_header(file_path, delimiter, stat, use_cache)
+    if header and header.get('mtime_ns') == stat.st_mtime_ns:
+        sections = read_cache_sections(get_cache_path(file_path, delimiter))
+        if sections is not None:
+            metrics.count('index_cache_hits')
+            return sections
+    return load_key_index(file_path, delimiter, use_cache)[1]
+
+def load_section_records(file_path, delimiter, wanted, use_cache=True):
+    """Записи (путь, ключ) только тех путей, для которых wanted(путь) истинно.
+
+    При свежем кэше остальные ключи даже не декодируются.
+    """
+    stat = os.stat(file_path)
+    header = _cache_header(file_path, delimiter, stat, use_cache)
+    if header and header.get('mtime_ns') == stat.st_mtime_ns:
+        cached = read_cache_records(get_cache_path(file_path, delimiter), wanted)
+        if cached is not None:
+            metrics.count('index_cache_hits')
+            return cached[0]
+    records, _ = load_key_index(file_path, delimiter, use_cache)
+    return [(path, key) for path, key in records if wanted(path)]
+
+@timed('load_key_index')
+def load_key_index(file_path, delimiter, use_cache=True):
+    """Загружает записи (путь, ключ) и контрольные суммы секций, используя кэш индекса"""
+    stat = os.stat(file_path)
+    cache_path = get_cache_path(file_path, delimiter)
+    header = _cache_header(file_path, delimiter, stat, use_cache)
+
+    # Быстрый путь: размер и время изменения совпадают
+    if header and header.get('mtime_ns') == stat.st_mtime_ns:
+        cached = read_cache_records(cache_path)
+        if cached is not None:
+            metrics.count('index_cache_hits')
+            return cached
+
+    if stat.st_size == 0:
+        return [], OrderedDict()
+
+    with open(file_path, 'rb') as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            digest = hash_buffer(mm)
+
+            # Файл мог быть просто "тронут" - сверяем содержимое по хэшу
+            if header and header.get('digest') == digest:
+                cached = read_cache_records(cache_path)
+                if cached is not None:
+                    metrics.count('index_cache_hits')
+                    header['mtime_ns'] = stat.st_mtime_ns
+                    write_cache(cache_path, header, *cached)
+                    return cached
+
+            records = scan_records(mm, delimiter)
+            metrics.count('bytes_read', stat.st_size)
+            metrics.count('lines_read', len(records))
+
+    sections = compute_section_digests(records)
+
+    if use_cache:
+        header = {
+            'version': CACHE_VERSION,
+            'delimiter': delimiter,
+            'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns,
+            'digest': digest,
+        }
+        write_cache(cache_path, header, records, sections)
+
+    return records, sections
+
+def load_key_records(file_path, delimiter, use_cache=True):
+    """Загружает записи (путь, ключ) из файла локализации, используя кэш индекса"""
+    records, _ = load_key_index(file_path, delimiter, use_cache)
+    return records
+
+class KeyTable:
+    """Компактная таблица ключей.
+
+    Пути хранятся один раз и адресуются номером, ключи адресуются целым
+    номером (handle) в порядке первого появления в файле.
+    """
+    __slots__ = ('delimiter', 'paths', 'path_ids', 'path_handles', 'key_paths', 'keys', '_lookup')
+
+    def __init__(self, delimiter, records=()):
+        self.delimiter = delimiter
+        self.paths = []           # path_id -> путь
+        self.path_ids = {}        # путь -> path_id
+        self.path_handles = []    # path_id -> номера ключей секции
+        self.key_paths = array('I')  # номер ключа -> path_id
+        self.keys = []            # номер ключа -> текст ключа
+        self._lookup = []         # path_id -> {текст ключа: номер ключа}
+        self.extend(records)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def add(self, path, key):
+        """Добавляет ключ (повторы игнорируются) и возвращает его номер"""
+        path_id = self.path_ids.get(path)
+        if path_id is None:
+            path_id = self.path_ids[path] = len(self.paths)
+            self.paths.append(sys.intern(path))
+            self.path_handles.append(array('I'))
+            self._lookup.append({})
+
+        lookup = self._lookup[path_id]
+        handle = lookup.get(key)
+        if handle is None:
+            handle = lookup[key] = len(self.keys)
+            self.keys.append(key)
+            self.key_paths.append(path_id)
+            self.path_handles[path_id].append(handle)
+        return handle
+
+    def extend(self, records):
+        """Добавляет записи (путь, ключ)"""
+        for path, key in records:
+            self.add(path, key)
+
+    def find(self, path, key):
+        """Возвращает номер ключа или None"""
+        path_id = self.path_ids.get(path)
+        if path_id is None:
+            return None
+        return self._lookup[path_id].get(key)
+
+    def find_id(self, key_id):
+        """Возвращает номер ключа по строке вида путь<разделитель>ключ или None"""
+        if self.delimiter not in key_id:
+            return None
+        path, key = key_id.split(self.delimiter, 1)
+        return self.find(path, key)
+
+    def path_of(self, handle):
+        """Возвращает путь ключа"""
+        return self.paths[self.key_paths[handle]]
+
+    def key_id(self, handle):
+        """Собирает строковый идентификатор ключа (как в файле прогресса)"""
+        return f"{self.path_of(handle)}{self.delimiter}{self.keys[handle]}"
+
+def load_records(file_path, delimiter, use_cache=True, verbose=True):
+    """Чтение записей (путь, ключ) и контрольных сумм секций из файла локализации"""
+    if not os.path.exists(file_path):
+        if verbose:
+            print(f"[X] Файл не найден: {file_path}")
+        return [], OrderedDict()
+
+    try:
+        records, sections = load_key_index(file_path, delimiter, use_cache)
+        if verbose:
+            print(f"[V] Загружено строк с ключами: {len(records)}")
+        return records, sections
+    except Exception as e:
+        if verbose:
+            print(f"[X] Ошибка чтения файла {file_path}: {e}")
+        return [], OrderedDict()
+
+@timed('parse_keys')
+def parse_keys(file_path, delimiter, use_cache=True, verbose=True):
+    """Парсинг файла локализации в таблицу ключей.
+
+    Возвращает (таблица ключей, контрольные суммы секций).
+    """
+    records, sections = load_records(file_path, delimiter, use_cache, verbose)
+    table = KeyTable(delimiter, records)
+    metrics.count('keys_parsed', len(table))
+    if verbose:
+        print(f"[V] Загружено ключей: {len(table)}")
+    return table, sections
+
+@timed('mark_target_keys')
+def mark_target_keys(table, records, flags=None, paths=None, matcher=None):
+    """Отмечает ключи таблицы, которые есть в целевой локализации.
+
+    Без matcher ключ ищется по точному совпадению строки; с FluentMatcher -
+    еще и по идентичности сообщения (id и атрибут), без учета текста значения
+    и папки языка. Если указаны paths, обновляются только ключи этих путей.
+    """
+    if flags is None:
+        flags = bytearray(len(table))
+    find = table.find
+    for path, key in records:
+        if paths is not None and path not in paths:
+            continue
+        handle = find(path, key)
+        if handle is not None:
+            flags[handle] = 1
+    if matcher is not None:
+        matcher.mark(records, flags, paths)
+    return flags
+
+@timed('get_untranslated_keys')
+def get_untranslated_keys(table, target_flags, checklist, key_filter=None, coverage=None,
+                          path_states=None):
+    """Возвращает только непереведенные ключи.
+
+    Список - массив номеров ключей по возрастанию (в порядке появления в файле),
+    поэтому любая страница доступна срезом без копирования всего списка.
+    Если передан coverage (PathCoverage), в том же проходе считается покрытие по путям.
+    """
+    untranslated = array('I')
+    translated_count = 0
+    untranslated_count = 0
+
+    if key_filter is None:
+        key_filter = KeyFilter()
+    # Условия на путь считаются один раз на путь; пути, не прошедшие фильтр, не просматриваются
+    if path_states is None:
+        path_states = key_filter.path_states(table)
+    ctx = FilterContext(table, target_flags, checklist)
+    last_handle = -1
+    in_order = True
+
+    for path_id, state in enumerate(path_states):
+        if state is False:
+            continue
+        for handle in key_filter.path_keys(ctx, path_id, state):
+            # Проверяем наличие ключа в целевой локализации и отметки в чеклисте
+            if target_flags[handle] or checklist.get(handle) == "V":
+                translated_count += 1
+                if coverage is not None:
+                    coverage.add(path_id, True)
+            else:
+                untranslated_count += 1
+                untranslated.append(handle)
+                in_order = in_order and handle > last_handle
+                last_handle = handle
+                if coverage is not None:
+                    coverage.add(path_id, False)
+
+    # Путь может встречаться в файле несколькими кусками
+    if not in_order:
+        untranslated = array('I', sorted(untranslated))
+    return untranslated, translated_count, untranslated_count
+
+def clamp_offset(offset, total):
+    """Ограничивает начало страницы допустимым диапазоном"""
+    if total == 0:
+        return 0
+    return max(0, min(offset, total - 1))
+
+def find_path_position(table, untranslated, query):
+    """Возвращает позицию первого непереведенного ключа в пути, содержащем query"""
+    query = query.lower()
+    for path_id, path in enumerate(table.paths):
+        if query not in path.lower():
+            continue
+        # Номера ключей пути возрастают - ищем первый из них в списке бинарным поиском
+        for handle in table.path_handles[path_id]:
+            pos = bisect_left(untranslated, handle)
+            if pos == len(untranslated):
+                break
+            if table.key_paths[untranslated[pos]] == path_id:
+                return pos
+            if untranslated[pos] > table.path_handles[path_id][-1]:
+                break
+    return None
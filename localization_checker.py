@@ -1,111 +1,842 @@
 import os
 import sys
-import json
 import argparse
+import atexit
 from collections import OrderedDict
 import textwrap
 import time
+from array import array
+from bisect import bisect_left, insort
+
+from locale_index import (
+    KeyTable, load_records, parse_keys, mark_target_keys, get_untranslated_keys,
+    clamp_offset, find_path_position
+)
+from progress_store import (
+    load_checklist, save_checklist, append_journal_batch, start_compaction,
+    diff_entries, merge_entries, get_journal_path, get_rotated_journal_path, Checklist
+)
+from file_watch import FileWatcher
+from fluent_match import FluentMatcher, message_value
+from source_hashes import (
+    get_sources_path, compute_source_hashes, load_sources, write_sources, diff_sources
+)
+from key_search import SearchIndex, SEARCH_HELP
+from translation_memory import build_memory
+from message_check import MessageChecker, ISSUE_KINDS, count_issues, format_issue
+from profiling import metrics, timed, format_metrics
+from key_selection import PrefixIndex, parse_selection, select_handles, SELECTION_HELP
+from key_filter import (
+    KeyFilter, FilterContext, compile_filter, resolve_filter, load_presets, save_presets,
+    BUILTIN_PRESETS, FILTER_HELP
+)
+from path_coverage import (
+    PathCoverage, SORT_MODES, sort_rows, format_coverage_row, format_coverage_header
+)
 
 def get_script_directory():
     """Возвращает путь к папке, где находится скрипт"""
     return os.path.dirname(os.path.abspath(sys.argv[0]))
 
-def load_checklist(file_path):
-    """Загружает прогресс из файла"""
-    if not os.path.exists(file_path):
-        return {}
-    try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    except Exception as e:
-        print(f"[!] Ошибка загрузки файла прогресса: {e}")
-        return {}
+def find_changed_sections(old_original, new_original, old_target, new_target):
+    """Возвращает пути, секции которых изменились с прошлой загрузки"""
+    changed = set()
+    for old, new in ((old_original, new_original), (old_target, new_target)):
+        for path in old.keys() | new.keys():
+            if old.get(path) != new.get(path):
+                changed.add(path)
+    return changed
+
+def count_section(handles, target_flags, checklist):
+    """Считает переведенные и непереведенные ключи одной секции"""
+    translated = sum(1 for handle in handles
+                     if target_flags[handle] or checklist.get(handle) == "V")
+    return translated, len(handles) - translated
+
+@timed('patch_untranslated_keys')
+def patch_untranslated_keys(untranslated, table, target_flags, target_records, checklist,
+                            key_filter, path_states, changed_paths, coverage=None, matcher=None):
+    """Пересчитывает только изменившиеся секции целевого файла.
+
+    Обновляет target_flags на месте и возвращает
+    (untranslated, изменение translated_count, изменение untranslated_count).
+    """
+    translated_delta = 0
+    untranslated_delta = 0
+    ctx = FilterContext(table, target_flags, checklist)
+
+    changed_ids = [table.path_ids[path] for path in changed_paths if path in table.path_ids]
+    visible_ids = [path_id for path_id in changed_ids if path_states[path_id] is not False]
+
+    # Убираем вклад старой версии секций
+    for path_id in visible_ids:
+        handles = key_filter.path_keys(ctx, path_id, path_states[path_id])
+        translated, remaining = count_section(handles, target_flags, checklist)
+        translated_delta -= translated
+        untranslated_delta -= remaining
+        for handle in table.path_handles[path_id]:
+            pos = bisect_left(untranslated, handle)
+            if pos < len(untranslated) and untranslated[pos] == handle:
+                del untranslated[pos]
+
+    for path_id in changed_ids:
+        for handle in table.path_handles[path_id]:
+            target_flags[handle] = 0
+    mark_target_keys(table, target_records, target_flags, changed_paths, matcher)
+
+    # Добавляем вклад новой версии секций
+    for path_id in visible_ids:
+        handles = key_filter.path_keys(ctx, path_id, path_states[path_id])
+        translated, remaining = count_section(handles, target_flags, checklist)
+        translated_delta += translated
+        untranslated_delta += remaining
+        if coverage is not None:
+            coverage.set(path_id, translated, remaining)
+        for handle in handles:
+            if target_flags[handle]:
+                continue
+            if checklist.get(handle) != "V":
+                insort(untranslated, handle)
+
+    return untranslated, translated_delta, untranslated_delta
+
+# Сколько списков для других фильтров держать в памяти
+MAX_CACHED_VIEWS = 8
+
+class FilterView:
+    """Список непереведенных ключей и счетчики, построенные для одного фильтра"""
+    __slots__ = ('key_filter', 'path_states', 'untranslated', 'coverage',
+                 'translated_count', 'untranslated_count', 'version', 'log_position')
+
+    def __init__(self, session):
+        self.key_filter = session.key_filter
+        self.path_states = session.path_states
+        self.untranslated = session.untranslated
+        self.coverage = session.coverage
+        self.translated_count = session.translated_count
+        self.untranslated_count = session.untranslated_count
+        self.version = session.data_version
+        self.log_position = len(session.mark_log)
+
+class CheckerSession:
+    """Состояние сеанса проверки: таблица ключей, отметки и непереведенные ключи.
+
+    Используется и построчным меню, и полноэкранным режимом.
+    """
+
+    def __init__(self, original, target, progress, delimiter, use_cache=True,
+                 autosave_minutes=5, verbose=True, presets_file=None, fluent=True):
+        self.original = original
+        self.target = target
+        self.progress = progress
+        self.delimiter = delimiter
+        self.use_cache = use_cache
+        self.autosave_interval = autosave_minutes * 60  # в секундах
+        self.verbose = verbose
+
+        # Фильтр: скомпилированное выражение и пресеты
+        self.presets_file = presets_file
+        self.presets = load_presets(presets_file)
+        self.preset_index = 0
+        self.key_filter = KeyFilter()
+        self.path_states = []
+
+        self.table = KeyTable(delimiter)
+        # Сопоставление по сообщениям Fluent (None - только точное совпадение строк)
+        self.fluent = fluent
+        self.matcher = None
+        self.checklist = None
+        # Прогресс, каким он был на диске при последнем чтении или сохранении:
+        # отличия от него на диске - правки других процессов
+        self.disk_entries = None
+        # Отметки, ждущие пакетной записи в журнал (None - писать каждую сразу)
+        self.pending_journal = None
+        self.watcher = None
+        self.target_flags = bytearray()
+        self.original_sections = OrderedDict()
+        self.target_sections = OrderedDict()
+        self.file_stamps = {}
+
+        self.prefix_index = None
+        self.search_index = None
+
+        # Память переводов: строится при первой подсказке, подсказки кэшируются по ключам
+        self.identities = []
+        self.memory = None
+        self.suggestion_cache = {}
+        self.show_suggestions = False
+
+        # Проверка сообщений: подписи кэшируются между проверками, результат - до изменения файлов
+        self.message_checker = MessageChecker()
+        self.issues = None
+
+        self.untranslated = array('I')
+        self.coverage = PathCoverage()
+        self.translated_count = 0
+        self.untranslated_count = 0
+        self.last_save_time = time.time()
+
+        # Хэши исходных текстов: текущие, с прошлого сохранения и их расхождения
+        self.key_hashes = array('Q')
+        self.source_contents = {}
+        self.sources = None
+        self.stale_idents = set()
+        self.stale_handles = None  # ключи с изменившимся текстом (кэш для stale_keys)
+        self.new_idents = set()
+        self.removed_sources = 0
+
+        # Списки для других фильтров и отметки, сделанные после их построения
+        self.views = OrderedDict()
+        self.mark_log = []
+        self.data_version = 0
+
+    @timed('session.load')
+    def load(self, checklist_entries=None, build_list=True):
+        """Полностью загружает файлы локализации и строит список ключей.
+
+        build_list=False пропускает построение списка непереведенных ключей
+        (для отчетов, которые проходят по ключам сами).
+        """
+        if checklist_entries is None:
+            if self.checklist is not None:
+                checklist_entries = self.checklist.to_dict()
+            else:
+                checklist_entries = load_checklist(self.progress)
+        if self.disk_entries is None:
+            self.disk_entries = dict(checklist_entries)
+
+        self.file_stamps = self.read_file_stamps()
+        self.table, self.original_sections = parse_keys(
+            self.original, self.delimiter, self.use_cache, self.verbose)
+        target_records, self.target_sections = load_records(
+            self.target, self.delimiter, self.use_cache, self.verbose)
+        self.index_table(target_records)
+        with metrics.stage('build_checklist'):
+            self.checklist = Checklist(self.table, checklist_entries)
+        self.prefix_index = None
+        self.search_index = None
+        self.invalidate_views()
+        if build_list:
+            self.rebuild()
+
+    @timed('index_table')
+    def index_table(self, target_records):
+        """Сопоставляет новую таблицу ключей с целевым файлом и снимком исходных текстов"""
+        with metrics.stage('fluent_identities'):
+            matcher = FluentMatcher(self.table)
+        self.matcher = matcher if self.fluent else None
+        self.identities = matcher.identities
+        self.target_flags = mark_target_keys(self.table, target_records, matcher=self.matcher)
+        self.reset_memory()
+        self.issues = None
+
+        # Сравнение хэшей текста сообщений с прошлым сохранением
+        with metrics.stage('compute_source_hashes'):
+            self.key_hashes, self.source_contents = compute_source_hashes(self.table, matcher.identities)
+        if self.sources is None:
+            self.sources = load_sources(get_sources_path(self.progress))
+        self.stale_idents, self.new_idents, self.removed_sources = diff_sources(
+            self.key_hashes, self.source_contents, self.sources)
+        self.stale_handles = None
+
+    def rebuild(self):
+        """Пересчитывает список непереведенных ключей и покрытие с текущим фильтром"""
+        self.coverage = PathCoverage(len(self.table.paths))
+        self.path_states = self.key_filter.path_states(self.table)
+        self.untranslated, self.translated_count, self.untranslated_count = get_untranslated_keys(
+            self.table,
+            self.target_flags,
+            self.checklist,
+            self.key_filter,
+            self.coverage,
+            self.path_states
+        )
+
+    @timed('session.refresh')
+    def refresh(self):
+        """Перечитывает файлы и пересчитывает только изменившиеся секции.
+
+        Возвращает множество изменившихся путей.
+        """
+        self.file_stamps = self.read_file_stamps()
+        # Неизмененные файлы берутся из кэша индекса
+        original_records, original_sections = load_records(
+            self.original, self.delimiter, self.use_cache, self.verbose)
+        target_records, target_sections = load_records(
+            self.target, self.delimiter, self.use_cache, self.verbose)
+
+        changed_paths = find_changed_sections(
+            self.original_sections, original_sections,
+            self.target_sections, target_sections
+        )
+
+        if original_sections != self.original_sections:
+            # Исходный файл изменился - номера ключей меняются, строим таблицу заново
+            checklist_entries = self.checklist.to_dict()
+            self.table = KeyTable(self.delimiter, original_records)
+            self.index_table(target_records)
+            self.checklist = Checklist(self.table, checklist_entries)
+            self.prefix_index = None
+            if self.search_index is not None:
+                # Заново индексируются только изменившиеся секции исходного файла
+                self.search_index.update(self.table, {
+                    path for path, digest in original_sections.items()
+                    if self.original_sections.get(path) != digest
+                })
+            self.invalidate_views()
+            self.rebuild()
+        elif changed_paths:
+            # Пересчитываем только секции, которые изменились с прошлой загрузки;
+            # путь целевого файла в другой папке языка относится к своему пути исходного
+            patch_paths = self.matcher.original_paths(changed_paths) if self.matcher else changed_paths
+            self.untranslated, translated_delta, untranslated_delta = patch_untranslated_keys(
+                self.untranslated,
+                self.table,
+                self.target_flags,
+                target_records,
+                self.checklist,
+                self.key_filter,
+                self.path_states,
+                patch_paths,
+                self.coverage,
+                self.matcher
+            )
+            self.translated_count += translated_delta
+            self.untranslated_count += untranslated_delta
+            self.invalidate_views()
+
+        if changed_paths:
+            self.reset_memory()
+            self.issues = None
+        self.original_sections, self.target_sections = original_sections, target_sections
+        return changed_paths
+
+    # --- Фильтры ---
+
+    def filter_label(self):
+        """Название текущего фильтра: имя пресета или само выражение"""
+        if self.preset_index is not None:
+            return self.presets[self.preset_index][0]
+        return self.key_filter.expression
+
+    def filter_context(self):
+        return FilterContext(self.table, self.target_flags, self.checklist)
+
+    def resolve_filter(self, text):
+        """Номер или имя пресета превращает в выражение, остальное считает выражением"""
+        return resolve_filter(self.presets, text)
+
+    def set_filter(self, expression):
+        """Меняет фильтр. Выражение компилируется один раз; список для фильтра,
+        который уже включался, берется из памяти без прохода по всем ключам.
+
+        При ошибке в выражении выбрасывает ValueError (текущий фильтр не меняется).
+        """
+        key_filter = compile_filter(expression)
+        self.preset_index = next((index for index, (_, preset) in enumerate(self.presets)
+                                  if preset.strip() == key_filter.expression), None)
+        if key_filter.expression == self.key_filter.expression:
+            return
+        if self.checklist is None:
+            # Файлы еще не загружены - список построится при загрузке
+            self.key_filter = key_filter
+            return
 
-def save_checklist(file_path, checklist):
-    """Сохраняет прогресс в файл"""
-    try:
-        with open(file_path, 'w', encoding='utf-8') as f:
-            json.dump(checklist, f, ensure_ascii=False, indent=2)
-        return True
-    except Exception as e:
-        print(f"[!] Ошибка сохранения файла прогресса: {e}")
+        # Список фильтра по отметкам устаревает с каждой отметкой - его не храним
+        if not self.key_filter.depends_on_status:
+            self.views[self.key_filter.expression] = FilterView(self)
+        self.key_filter = key_filter
+        view = self.views.pop(key_filter.expression, None)
+        if view is not None and view.version == self.data_version:
+            self.restore_view(view)
+        else:
+            self.rebuild()
+        while len(self.views) > MAX_CACHED_VIEWS:
+            self.views.popitem(last=False)
+        self.trim_mark_log()
+
+    def build_view(self, key_filter):
+        """Строит список и счетчики для фильтра, не меняя текущий фильтр сеанса"""
+        view = FilterView(self)
+        view.key_filter = key_filter
+        view.coverage = PathCoverage(len(self.table.paths))
+        view.path_states = key_filter.path_states(self.table)
+        view.untranslated, view.translated_count, view.untranslated_count = get_untranslated_keys(
+            self.table, self.target_flags, self.checklist, key_filter, view.coverage, view.path_states)
+        return view
+
+    def filter_view(self, expression):
+        """Список для фильтра без переключения фильтра сеанса (для клиентов сервера).
+
+        Для текущего фильтра возвращает списки самого сеанса, для других - список
+        из памяти с отметками, сделанными с его построения. При ошибке в выражении
+        выбрасывает ValueError.
+        """
+        key_filter = compile_filter(expression)
+        if key_filter.expression == self.key_filter.expression:
+            return FilterView(self)
+        view = self.views.get(key_filter.expression)
+        if view is not None and view.version == self.data_version:
+            self.views.move_to_end(key_filter.expression)
+            self.update_view(view)
+        else:
+            view = self.build_view(key_filter)
+            # Список фильтра по отметкам устаревает с каждой отметкой - его не храним
+            if not key_filter.depends_on_status:
+                self.views[key_filter.expression] = view
+                while len(self.views) > MAX_CACHED_VIEWS:
+                    self.views.popitem(last=False)
+        self.trim_mark_log()
+        return view
+
+    def set_preset(self, index):
+        """Включает пресет по номеру"""
+        self.set_filter(self.presets[index][1])
+
+    def next_preset(self):
+        """Включает следующий пресет по кругу"""
+        index = 0 if self.preset_index is None else (self.preset_index + 1) % len(self.presets)
+        self.set_preset(index)
+
+    def save_preset(self, name):
+        """Сохраняет текущий фильтр как пресет (с тем же именем - заменяет)"""
+        entry = (name, self.key_filter.expression)
+        for index, (preset_name, _) in enumerate(self.presets):
+            if preset_name.lower() == name.lower():
+                if index < len(BUILTIN_PRESETS):
+                    raise ValueError(f"Встроенный пресет '{preset_name}' нельзя изменить")
+                self.presets[index] = entry
+                break
+        else:
+            self.presets.append(entry)
+        self.preset_index = self.presets.index(entry)
+        return save_presets(self.presets_file, self.presets) if self.presets_file else True
+
+    def restore_view(self, view):
+        """Возвращает сохраненный список и применяет к нему отметки, сделанные с тех пор.
+
+        Списки хранятся только для фильтров, не зависящих от отметок, поэтому
+        принадлежность ключа к фильтру за это время не менялась.
+        """
+        self.update_view(view)
+        self.path_states = view.path_states
+        self.untranslated = view.untranslated
+        self.coverage = view.coverage
+        self.translated_count = view.translated_count
+        self.untranslated_count = view.untranslated_count
+
+    def update_view(self, view):
+        """Применяет к сохраненному списку отметки, сделанные после его построения"""
+        ctx = self.filter_context()
+        for handle, old_status, new_status in self.mark_log[view.log_position:]:
+            if (old_status == "V") == (new_status == "V") or self.target_flags[handle]:
+                continue
+            if view.key_filter.matches(ctx, handle, view.path_states):
+                self.count_mark(handle, old_status, new_status, True, True, view)
+        view.log_position = len(self.mark_log)
+
+    def invalidate_views(self):
+        """Сохраненные списки устарели (изменились файлы или таблица ключей)"""
+        self.data_version += 1
+        self.views.clear()
+        self.mark_log = []
+
+    def trim_mark_log(self):
+        """Удаляет из журнала отметок записи, которые уже учтены всеми списками"""
+        if not self.views:
+            self.mark_log = []
+            return
+        start = min(view.log_position for view in self.views.values())
+        if start:
+            del self.mark_log[:start]
+            for view in self.views.values():
+                view.log_position -= start
+
+    def log_mark(self, handle, old_status, new_status):
+        """Запоминает отметку для списков других фильтров"""
+        if self.views:
+            self.mark_log.append((handle, old_status, new_status))
+
+    # --- Отметки ---
+
+    def mark_key(self, handle, status, ctx):
+        """Ставит ключу отметку (None - снимает) и обновляет счетчики, покрытие и список.
+
+        Фильтр проверяется до смены отметки, а если он зависит от отметок
+        (status:V, translated и т. п.) - еще и после. Возвращает прежний статус.
+        """
+        old_code = self.checklist.get(handle)
+        if old_code == status:
+            return old_code or "X"
+        was_visible = self.key_filter.matches(ctx, handle, self.path_states)
+        if status is None:
+            self.checklist.clear(handle)
+        else:
+            self.checklist.set(handle, status)
+        old_status, new_status = old_code or "X", status or "X"
+        self.log_mark(handle, old_status, new_status)
+        visible = was_visible
+        if self.key_filter.depends_on_status:
+            visible = self.key_filter.matches(ctx, handle, self.path_states)
+        self.count_mark(handle, old_status, new_status, was_visible, visible)
+        return old_status
+
+    def count_mark(self, handle, old_status, new_status, was_visible, visible, view=None):
+        """Переносит ключ в счетчиках, покрытии и списке после смены отметки.
+
+        was_visible и visible - проходил ли ключ фильтр до и после смены;
+        view - список другого фильтра (FilterView), по умолчанию текущий.
+        """
+        if view is None:
+            view = self
+        path_id = self.table.key_paths[handle]
+        in_target = self.target_flags[handle]
+        if was_visible:
+            translated = in_target or old_status == "V"
+            view.coverage.remove(path_id, translated)
+            if translated:
+                view.translated_count -= 1
+            else:
+                view.untranslated_count -= 1
+        if visible:
+            translated = in_target or new_status == "V"
+            view.coverage.add(path_id, translated)
+            if translated:
+                view.translated_count += 1
+            else:
+                view.untranslated_count += 1
+                # Ключ, отмеченный раньше, снова попадает в список
+                pos = bisect_left(view.untranslated, handle)
+                if pos == len(view.untranslated) or view.untranslated[pos] != handle:
+                    view.untranslated.insert(pos, handle)
+
+    # --- Изменившиеся исходные тексты ---
+
+    def is_translated(self, handle):
+        return bool(self.target_flags[handle]) or self.checklist.get(handle) == "V"
+
+    def stale_keys(self):
+        """Очередь на проверку: переведенные ключи, текст которых изменился с прошлого сохранения.
+
+        Ключи с изменившимся текстом находятся проходом по таблице один раз и кэшируются
+        до accept_changes, refresh или save; перевод проверяется при каждом вызове,
+        поэтому отметки кэш не сбрасывают.
+        """
+        if not self.stale_idents:
+            return []
+        if self.stale_handles is None:
+            stale = self.stale_idents
+            self.stale_handles = array('I', (handle for handle, ident in enumerate(self.key_hashes)
+                                             if ident in stale))
+        return [handle for handle in self.stale_handles if self.is_translated(handle)]
+
+    def new_keys(self):
+        """Ключи сообщений, которых не было при прошлом сохранении"""
+        if not self.new_idents:
+            return []
+        added = self.new_idents
+        return [handle for handle, ident in enumerate(self.key_hashes) if ident in added]
+
+    def orphaned_marks(self):
+        """Отметки V, ключей которых больше нет в исходном файле"""
+        return [key_id for key_id, status in self.checklist.extra.items() if status == "V"]
+
+    def accept_changes(self, handles=None):
+        """Подтверждает, что перевод ключей (по умолчанию - всех в очереди) актуален.
+
+        Возвращает число подтвержденных сообщений; новый хэш запишется при сохранении.
+        """
+        if handles is None:
+            accepted = len(self.stale_idents)
+            self.stale_idents = set()
+            self.stale_handles = None
+            return accepted
+        idents = {self.key_hashes[handle] for handle in handles} & self.stale_idents
+        self.stale_idents -= idents
+        self.stale_handles = None
+        return len(idents)
+
+    def remove_orphaned(self):
+        """Удаляет отметки V удаленных ключей и сохраняет прогресс, возвращает их число"""
+        orphaned = self.orphaned_marks()
+        for key_id in orphaned:
+            del self.checklist.extra[key_id]
+        if orphaned:
+            self.save()
+        return len(orphaned)
+
+    def save_sources(self):
+        """Записывает снимок хэшей; для непроверенных изменений остается старый хэш"""
+        mapping = dict(self.source_contents)
+        if self.sources is not None:
+            pending = {self.key_hashes[handle] for handle in self.stale_keys()}
+            for ident in pending:
+                mapping[ident] = self.sources.get(ident)
+        return write_sources(get_sources_path(self.progress), mapping)
+
+    def prune_marks(self):
+        """Снимает отметки V с ключей, которые и так найдены в целевом файле.
+
+        Такие отметки только раздувают файл прогресса. Возвращает число снятых отметок.
+        """
+        pruned = 0
+        for handle, flag in enumerate(self.target_flags):
+            if flag and self.checklist.get(handle) == "V":
+                self.checklist.clear(handle)
+                pruned += 1
+        if pruned:
+            self.invalidate_views()
+            self.rebuild()
+        return pruned
+
+    def set_delimiter(self, delimiter):
+        """Меняет разделитель и перезагружает файлы"""
+        checklist_entries = self.checklist.to_dict()
+        self.delimiter = delimiter
+        self.load(checklist_entries)
+
+    def toggle(self, handle):
+        """Переключает отметку ключа, возвращает новый статус"""
+        new_status = "V" if self.checklist.get(handle, "X") == "X" else "X"
+
+        # Обновляем статус и счетчики (ключ из результатов поиска может быть скрыт
+        # фильтром) и сразу пишем отметку в журнал
+        self.mark_key(handle, new_status, self.filter_context())
+        self.write_journal([(self.table.key_id(handle), new_status)])
+        return new_status
+
+    def key_status(self, handle):
+        """Статус для отображения: ключ из целевого файла считается переведенным"""
+        return "V" if self.target_flags[handle] else self.checklist.get(handle, "X")
+
+    # --- Память переводов ---
+
+    def reset_memory(self):
+        """Память переводов устарела (изменился исходный или целевой файл)"""
+        self.memory = None
+        self.suggestion_cache = {}
+
+    def suggestions(self, handle):
+        """Подсказки перевода ключа: список (похожесть, перевод, исходное значение)"""
+        cached = self.suggestion_cache.get(handle)
+        if cached is not None:
+            return cached
+        value = message_value(self.table.keys[handle])
+        if value is None:
+            result = []
+        else:
+            if self.memory is None:
+                # Записи целевого файла берутся из кэша индекса
+                target_records, _ = load_records(self.target, self.delimiter, self.use_cache, verbose=False)
+                self.memory = build_memory(self.table, self.identities, target_records)
+            result = self.memory.suggest(value)
+        self.suggestion_cache[handle] = result
+        return result
+
+    # --- Проверка сообщений ---
+
+    def validate_messages(self):
+        """Ошибки плейсхолдеров и синтаксиса сообщений (см. message_check.MessageChecker.check)"""
+        if self.issues is None:
+            # Записи обоих файлов берутся из кэша индекса
+            original_records, _ = load_records(self.original, self.delimiter, self.use_cache, verbose=False)
+            target_records, _ = load_records(self.target, self.delimiter, self.use_cache, verbose=False)
+            with metrics.stage('validate_messages'):
+                self.issues = self.message_checker.check(self.table, original_records, target_records)
+        return self.issues
+
+    @timed('search')
+    def search(self, text):
+        """Номера ключей по поисковому запросу (см. SEARCH_HELP) в порядке файла.
+
+        Индекс строится при первом поиске. При ошибке выбрасывает ValueError.
+        """
+        if self.search_index is None:
+            self.search_index = SearchIndex(self.table)
+        return self.search_index.search(text)
+
+    def select(self, text, rows=None, view=None):
+        """Возвращает номера ключей по выражению выбора (см. SELECTION_HELP).
+
+        Диапазоны номеров отсчитываются по rows - списку на экране (по умолчанию
+        по списку непереведенных ключей). Учитывает фильтр view (FilterView,
+        по умолчанию текущий); при ошибке выбрасывает ValueError.
+        """
+        if view is None:
+            view = FilterView(self)
+        if self.prefix_index is None:
+            self.prefix_index = PrefixIndex(self.table)
+        allowed = [state is not False for state in view.path_states]
+        handles = select_handles(self.table, parse_selection(text),
+                                 view.untranslated if rows is None else rows,
+                                 self.prefix_index, allowed)
+        if None in view.path_states:
+            # Для части путей фильтр проверяет сами ключи
+            ctx = self.filter_context()
+            handles = [handle for handle in handles
+                       if view.key_filter.matches(ctx, handle, view.path_states)]
+        return handles
+
+    def mark_many(self, handles, status):
+        """Устанавливает статус сразу для многих ключей, возвращает число измененных.
+
+        Все изменения пишутся в журнал одной пачкой.
+        """
+        changed = []
+        ctx = self.filter_context()
+        for handle in handles:
+            if self.checklist.get(handle, "X") == status:
+                continue
+            self.mark_key(handle, status, ctx)
+            changed.append(handle)
+
+        if changed:
+            self.write_journal([(self.table.key_id(handle), status) for handle in changed])
+        return len(changed)
+
+    def write_journal(self, entries):
+        """Пишет изменения (key_id, статус) в журнал или копит их для flush_journal"""
+        if self.pending_journal is not None:
+            self.pending_journal.extend(entries)
+        elif self.append_journal(entries):
+            self.disk_entries.update(entries)
+
+    def append_journal(self, entries):
+        """Дописывает изменения в журнал; слежение за файлами не примет эту запись за чужую"""
+        on_write = self.watcher.own_write if self.watcher is not None else None
+        return append_journal_batch(self.progress, entries, on_write)
+
+    def flush_journal(self):
+        """Пишет накопленные изменения в журнал одной пачкой, возвращает их число"""
+        entries = self.pending_journal
+        if not entries:
+            return 0
+        self.pending_journal = []
+        if not self.append_journal(entries):
+            # Не удалось записать - попробуем со следующей пачкой
+            self.pending_journal[:0] = entries
+            return 0
+        self.disk_entries.update(entries)
+        return len(entries)
+
+    def coverage_rows(self, by_directory=False, sort_mode='r'):
+        """Таблица покрытия по путям или папкам, отсортированная выбранным способом"""
+        if by_directory:
+            rows = self.coverage.directory_rows(self.table)
+        else:
+            rows = self.coverage.path_rows(self.table)
+        return sort_rows(rows, sort_mode)
+
+    def save(self):
+        """Сохраняет прогресс (сжимает журнал в снимок).
+
+        Отметки, которые другие процессы записали в файл после его загрузки,
+        не затираются, а подхватываются и в память.
+        """
+        local = self.checklist.to_dict()
+        entries = dict(local)
+        if save_checklist(self.progress, entries, base=self.disk_entries):
+            self.apply_entries(diff_entries(local, entries))
+            self.disk_entries = entries
+            self.save_sources()
+            self.stale_handles = None
+            self.last_save_time = time.time()
+            return True
         return False
 
-def should_skip_line(line):
-    """Определяет, нужно ли пропускать строку (комментарии)"""
-    return not line.strip() or line.startswith('#')
-
-def parse_keys(file_path, delimiter):
-    """Парсинг файла локализации"""
-    keys = OrderedDict()
-    key_set = set()
-
-    if not os.path.exists(file_path):
-        print(f"[X] Файл не найден: {file_path}")
-        return keys, key_set
-
-    try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            for line in f:
-                line = line.strip()
-
-                if should_skip_line(line):
-                    continue
-
-                if delimiter not in line:
-                    continue
-
-                parts = line.split(delimiter, 1)
-                if len(parts) < 2:
-                    continue
+    def autosave_due(self):
+        """Проверяет, пора ли делать автосохранение"""
+        return time.time() - self.last_save_time >= self.autosave_interval
+
+    def autosave(self):
+        """Автосохранение: все отметки уже в журнале, сжимаем его в снимок в фоне"""
+        local = self.checklist.to_dict()
+        entries = dict(local)
+        if start_compaction(self.progress, entries, base=self.disk_entries):
+            self.apply_entries(diff_entries(local, entries))
+            self.disk_entries = entries
+            self.save_sources()
+            self.last_save_time = time.time()
+            return True
+        return False
 
-                path, key = parts
-                key_id = f"{path}{delimiter}{key}"
+    # --- Изменения файлов другими процессами ---
 
-                keys[key_id] = (path, key)
-                key_set.add(key_id)
+    def apply_entries(self, changes):
+        """Применяет изменения прогресса (key_id -> статус или None) к отметкам в памяти.
 
-        print(f"[V] Загружено ключей: {len(keys)}")
-        return keys, key_set
-    except Exception as e:
-        print(f"[X] Ошибка чтения файла {file_path}: {e}")
-        return keys, key_set
-
-def get_untranslated_keys(original_keys, target_key_set, checklist, filter_mode):
-    """Возвращает только непереведенные ключи"""
-    untranslated = OrderedDict()
-    translated_count = 0
-    untranslated_count = 0
-    idx = 1
-
-    for key_id, (path, key) in original_keys.items():
-        # Применяем фильтр по режиму
-        if filter_mode == 1:  # Только datasets
-            if 'datasets' not in path:
-                continue
-        elif filter_mode == 2:  # Скрыть datasets
-            if 'datasets' in path:
+        Счетчики, покрытие и списки фильтров обновляются так же, как при ручной отметке.
+        """
+        ctx = self.filter_context()
+        find_id = self.table.find_id
+        for key_id, status in changes.items():
+            handle = find_id(key_id)
+            if handle is None or status not in ("V", "X", None):
+                if status is None:
+                    self.checklist.extra.pop(key_id, None)
+                else:
+                    self.checklist.extra[key_id] = status
                 continue
+            self.mark_key(handle, status, ctx)
+        return len(changes)
+
+    def merge_progress(self):
+        """Подхватывает отметки, которые другие процессы записали в файл прогресса.
+
+        Свои несохраненные изменения не теряются. Возвращает число примененных изменений.
+        """
+        current = load_checklist(self.progress)
+        local = self.checklist.to_dict()
+        merged = merge_entries(self.disk_entries, local, current)
+        self.disk_entries = current
+        return self.apply_entries(diff_entries(local, merged))
+
+    def start_watch(self, interval=2.0):
+        """Включает фоновое слежение за файлами локализации и прогресса"""
+        self.watcher = FileWatcher([
+            self.original, self.target, self.progress,
+            get_journal_path(self.progress), get_rotated_journal_path(self.progress)
+        ], interval)
+        self.watcher.start()
+
+    def stop_watch(self):
+        if self.watcher is not None:
+            self.watcher.stop()
+            self.watcher = None
+
+    def poll_watch(self):
+        """Применяет изменения, замеченные фоновым слежением.
+
+        Возвращает (множество изменившихся секций, число подхваченных отметок)
+        или None, если ничего не изменилось.
+        """
+        if self.watcher is None:
+            return None
+        changed = self.watcher.changes()
+        if not changed:
+            return None
+        changed_paths = set()
+        if self.original in changed or self.target in changed:
+            changed_paths = self.refresh()
+        merged = 0
+        if changed - {self.original, self.target}:
+            merged = self.merge_progress()
+        return changed_paths, merged
+
+    def read_file_stamps(self):
+        """Возвращает размер и время изменения файлов локализации"""
+        stamps = {}
+        for file_path in (self.original, self.target):
+            try:
+                stat = os.stat(file_path)
+                stamps[file_path] = (stat.st_size, stat.st_mtime_ns)
+            except OSError:
+                stamps[file_path] = None
+        return stamps
 
-        # Проверяем наличие ключа в целевой локализации
-        if key_id in target_key_set:
-            translated_count += 1
-            continue
-
-        # Учитываем отметки в чеклисте
-        if checklist.get(key_id) == "V":
-            translated_count += 1
-        else:
-            untranslated_count += 1
-            untranslated[idx] = {
-                'path': path,
-                'key': key,
-                'id': key_id,
-                'status': checklist.get(key_id, "X")
-            }
-            idx += 1
-
-    return untranslated, translated_count, untranslated_count
+    def files_changed(self):
+        """Проверяет, изменились ли файлы локализации с последней загрузки"""
+        return self.read_file_stamps() != self.file_stamps
 
 def print_progress(current, total):
     """Печатает прогресс-бар"""
@@ -122,6 +853,12 @@ def print_progress(current, total):
     print(f"\nПрогресс: [{bar}] {percent:.1f}% ({current}/{total})")
     print(f"Осталось перевести: {total - current}\n")
 
+def print_presets(session):
+    """Печатает пресеты фильтров, текущий отмечен звездочкой"""
+    for index, (name, expression) in enumerate(session.presets):
+        marker = "*" if index == session.preset_index else " "
+        print(f"{marker}{index}: {name}" + (f" ({expression})" if expression else ""))
+
 def print_file_help(script_dir):
     """Показывает инструкцию по размещению файлов"""
     print("\n" + "═"*50)
@@ -167,6 +904,18 @@ def format_key_display(path, key, status, idx, max_width=100):
     # Собираем все вместе
     return f"{color}{num_str} {status_display}{color_reset}\n{path_display}\n{key_display}"
 
+def format_suggestions(suggestions, max_width=100):
+    """Форматирует подсказки из памяти переводов (по одной строке на подсказку)"""
+    color_yellow = "\033[93m"
+    color_reset = "\033[0m"
+    lines = []
+    for score, target, _ in suggestions:
+        text = f"{score * 100:3.0f}% {target}"
+        if len(text) > max_width - 8:
+            text = text[:max_width - 9] + '…'
+        lines.append(f"{color_yellow}   ≈ {color_reset}{text}")
+    return '\n'.join(lines)
+
 def main():
     script_dir = get_script_directory()
     parser = argparse.ArgumentParser(description='Проверка локализации')
@@ -179,15 +928,92 @@ def main():
     parser.add_argument('--delimiter', default='鎰', help='Разделитель ключей')
     parser.add_argument('--autosave', type=int, default=5,
                         help='Интервал автосохранения (в минутах)')
+    parser.add_argument('--page-size', type=int, default=30,
+                        help='Количество ключей на странице')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='Не использовать кэш индекса ключей')
+    parser.add_argument('--tui', action='store_true',
+                        help='Полноэкранный режим (curses) с управлением одной клавишей')
+    parser.add_argument('--serve', metavar='[ХОСТ:]ПОРТ',
+                        help='HTTP/JSON-сервер над сеансом проверки (по умолчанию только 127.0.0.1): '
+                             'несколько клиентов отмечают ключи одновременно')
+    parser.add_argument('--suggest', action='store_true',
+                        help='Сразу показывать подсказки из памяти переводов (переключаются командой W)')
+    parser.add_argument('--watch', type=float, nargs='?', const=2.0, metavar='СЕКУНДЫ',
+                        help='Следить за файлами локализации и прогресса (опрос раз в N секунд, '
+                             'по умолчанию 2) и подхватывать чужие изменения без команды R')
+    parser.add_argument('--report', choices=['json', 'jsonl', 'csv'],
+                        help='Без интерактивного меню: вывести отчет в указанном формате и выйти')
+    parser.add_argument('--targets', nargs='+',
+                        help='Несколько целевых файлов (по одному на локаль): исходный файл разбирается '
+                             'один раз, локали проверяются параллельно, выводится общая матрица покрытия. '
+                             'Переведенными считаются только ключи, найденные в целевом файле: отметки V '
+                             'из файла прогресса относятся к одной локали и здесь не учитываются')
+    parser.add_argument('--jobs', type=int,
+                        help='Число процессов для --targets (по умолчанию - число ядер)')
+    parser.add_argument('--diff', metavar='СТАРЫЙ_ДАМП',
+                        help='Сравнить прошлый дамп исходной локализации с --original и показать только '
+                             'новые и измененные непереведенные ключи (формат вывода - --report)')
+    parser.add_argument('--git-diff', nargs='+', metavar='РЕВИЗИЯ',
+                        help='То же для двух ревизий git-репозитория с файлами .ftl '
+                             '(вторая ревизия по умолчанию HEAD)')
+    parser.add_argument('--git-repo', default='.', help='Репозиторий для --git-diff')
+    parser.add_argument('--git-root', default='Resources',
+                        help='Папка репозитория, которой соответствует корень путей дампа '
+                             '(Resources/Locale/en-US/x.ftl -> /Locale/en-US/x.ftl)')
+    parser.add_argument('--git-locale', default='en-US', help='Папка исходного языка в Locale')
+    parser.add_argument('--output', help='Файл для отчета (по умолчанию - стандартный вывод)')
+    parser.add_argument('--filter', default='0',
+                        help='Фильтр: номер или имя пресета (0 - все, 1 - только datasets, '
+                             '2 - без datasets) или выражение фильтра')
+    parser.add_argument('--presets', default=os.path.join(script_dir, 'filter_presets.json'),
+                        help='Файл сохраненных пресетов фильтров')
+    parser.add_argument('--exact-match', action='store_true',
+                        help='Считать ключ переведенным только при точном совпадении строки '
+                             '(без сопоставления сообщений Fluent)')
+    parser.add_argument('--prune-marks', action='store_true',
+                        help='Снять отметки V с ключей, найденных в целевом файле, и сохранить прогресс')
+    parser.add_argument('--stream', action='store_true',
+                        help='Для отчета: потоковое чтение файлов кусками без построения таблицы ключей '
+                             '(для очень больших дампов; без сравнения со снимком исходных текстов)')
+    parser.add_argument('--fail-on-stale', action='store_true',
+                        help='Для отчета: ключи с изменившимся исходным текстом - ошибка. Отчет '
+                             'сравнивает тексты со снимком рядом с файлом прогресса и обновляет его '
+                             '(первый запуск только создает снимок); изменившиеся ключи остаются '
+                             'в очереди, пока их не подтвердят командой A')
+    parser.add_argument('--validate', action='store_true',
+                        help='Для отчета: проверить плейсхолдеры, скобки и повторы id сообщений')
+    parser.add_argument('--fail-on-issues', action='store_true',
+                        help='Для отчета: ошибки проверки сообщений - ошибка (включает --validate)')
+    parser.add_argument('--baseline', help='Прошлый отчет в формате json: рост непереведенных ключей - ошибка')
+    parser.add_argument('--max-untranslated', type=int,
+                        help='Допустимое число непереведенных ключей для отчета')
+    parser.add_argument('--profile', nargs='?', const=os.path.join(script_dir, 'locacheck_profile.json'),
+                        metavar='ФАЙЛ', help='Замерять стадии (время, строки, ключи, байты) и при выходе '
+                                             'сохранить замеры в JSON (по умолчанию locacheck_profile.json)')
+    parser.add_argument('--profile-capture', choices=['cpu', 'memory', 'all'],
+                        help='Вместе с --profile: профиль функций cProfile (cpu), '
+                             'трассировка памяти tracemalloc (memory) или оба')
     args = parser.parse_args()
 
-    # Режимы фильтрации
-    filter_mode = 0
-    filter_modes = {
-        0: "БЕЗ ФИЛЬТРА",
-        1: "ТОЛЬКО DATASETS",
-        2: "СКРЫТЬ DATASETS"
-    }
+    if args.profile:
+        capture = args.profile_capture or ''
+        metrics.enable(cpu=capture in ('cpu', 'all'), memory=capture in ('memory', 'all'))
+        # Замеры пишутся при любом выходе, в том числе из режима отчета через sys.exit
+        atexit.register(metrics.write, args.profile)
+
+    if args.git_diff and len(args.git_diff) > 2:
+        parser.error('--git-diff принимает одну или две ревизии')
+    if args.diff or args.git_diff:
+        from revision_diff import run_diff
+        sys.exit(run_diff(args))
+
+    if args.targets:
+        from multi_locale import run_multi_report
+        sys.exit(run_multi_report(args))
+
+    if args.report:
+        sys.exit(run_report(args))
 
     # Определяем ширину терминала
     try:
@@ -209,127 +1035,264 @@ def main():
         return
 
     print("\n[~] Загрузка данных прогресса...")
-    checklist = load_checklist(args.progress)
+    checklist_entries = load_checklist(args.progress)
 
     print("[*] Загрузка файлов локализации...")
 
-    # Загружаем ключи
-    original_keys, _ = parse_keys(args.original, args.delimiter)
-    _, target_key_set = parse_keys(args.target, args.delimiter)
+    # Загружаем ключи и строим список непереведенных ключей
+    session = CheckerSession(
+        args.original,
+        args.target,
+        args.progress,
+        args.delimiter,
+        use_cache=not args.no_cache,
+        autosave_minutes=args.autosave,
+        presets_file=args.presets,
+        fluent=not args.exact_match
+    )
+    try:
+        session.set_filter(session.resolve_filter(args.filter))
+    except ValueError as e:
+        print(f"\n[X] ОШИБКА В ФИЛЬТРЕ: {e}")
+        input("Нажмите Enter для выхода...")
+        return
+    session.load(checklist_entries)
+    del checklist_entries
 
-    if not original_keys:
+    if not len(session.table):
         print("\n[X] В исходном файле локализации не найдено ключей.")
         print(f"    Убедитесь, что файл содержит разделитель: '{args.delimiter}'")
         print_file_help(script_dir)
         input("Нажмите Enter для выхода...")
         return
 
-    # Инициализация списка ключей
-    untranslated, translated_count, untranslated_count = get_untranslated_keys(
-        original_keys,
-        target_key_set,
-        checklist,
-        filter_mode
+    if args.prune_marks:
+        pruned = session.prune_marks()
+        if pruned and session.save():
+            print(f"[V] Снято лишних отметок V (ключи уже есть в целевом файле): {pruned}")
+        else:
+            print("[i] Лишних отметок V нет")
+
+    page_size = max(1, args.page_size)
+
+    if args.watch:
+        session.start_watch(max(0.2, args.watch))
+    session.show_suggestions = args.suggest
+
+    if args.serve:
+        from checker_server import run_server
+        session.verbose = False
+        try:
+            saved = run_server(session, args.serve)
+        except (ValueError, OSError) as e:
+            print(f"[X] Не удалось запустить сервер: {e}")
+            return
+        if saved:
+            print("\033[92m[S] ПРОГРЕСС СОХРАНЁН ПЕРЕД ВЫХОДОМ\033[0m")
+        return
+
+    if args.tui:
+        try:
+            from checker_tui import run_tui
+        except ImportError as e:
+            print(f"[!] Полноэкранный режим недоступен ({e}), используется обычное меню")
+            time.sleep(1)
+        else:
+            session.verbose = False
+            if run_tui(session):
+                print("\033[92m[S] ПРОГРЕСС СОХРАНЁН ПЕРЕД ВЫХОДОМ\033[0m")
+            return
+
+    run_menu(session, script_dir, terminal_width, page_size)
+
+def run_report(args):
+    """Режим без интерфейса для CI: отчет в json/jsonl/csv и код выхода"""
+    from headless_report import (
+        write_report, load_baseline, find_regressions, EXIT_OK, EXIT_REGRESSION, EXIT_ERROR
+    )
+
+    missing = [f for f in [args.original, args.target] if not os.path.exists(f)]
+    if missing:
+        for f in missing:
+            print(f"[X] ФАЙЛ НЕ НАЙДЕН: {f}", file=sys.stderr)
+        return EXIT_ERROR
+
+    try:
+        baseline = load_baseline(args.baseline) if args.baseline else None
+    except Exception as e:
+        print(f"[X] Ошибка чтения прошлого отчета {args.baseline}: {e}", file=sys.stderr)
+        return EXIT_ERROR
+
+    session = CheckerSession(
+        args.original,
+        args.target,
+        args.progress,
+        args.delimiter,
+        use_cache=not args.no_cache,
+        verbose=False,
+        presets_file=args.presets,
+        fluent=not args.exact_match
     )
-    total_keys = untranslated_count
-    last_save_time = time.time()
-    autosave_interval = args.autosave * 60  # в секундах
+    try:
+        session.set_filter(session.resolve_filter(args.filter))
+    except ValueError as e:
+        print(f"[X] Ошибка в фильтре: {e}", file=sys.stderr)
+        return EXIT_ERROR
+
+    validate = args.validate or args.fail_on_issues
+    if args.stream:
+        if validate:
+            print("[X] Проверка сообщений недоступна в потоковом режиме (--stream)", file=sys.stderr)
+            return EXIT_ERROR
+        # Без таблицы ключей: исходный файл читается кусками, память не растет с его размером
+        from stream_report import stream_report
+        checklist_entries = load_checklist(args.progress)
+
+        def write(stream):
+            return stream_report(args.original, args.target, checklist_entries, args.delimiter,
+                                 session.key_filter, args.report, stream, fluent=not args.exact_match)
+    else:
+        session.load(build_list=False)
+
+        def write(stream):
+            paths, summary = write_report(session, args.report, stream, validate)
+            # Снимок исходных текстов: новые тексты записываются, для непроверенных
+            # изменений остаются старые хэши - следующий отчет снова их найдет
+            session.save_sources()
+            return paths, summary
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8', newline='') as stream:
+            paths, summary = write(stream)
+    else:
+        paths, summary = write(sys.stdout)
+
+    problems = find_regressions(paths, summary, baseline, args.max_untranslated, args.fail_on_stale,
+                                args.fail_on_issues)
+    for problem in problems:
+        print(f"[X] {problem}", file=sys.stderr)
+    return EXIT_REGRESSION if problems else EXIT_OK
+
+def run_menu(session, script_dir, terminal_width, page_size):
+    """Построчное меню: очистка экрана и ввод команд через input()"""
+    page_offset = 0
+    search = None  # результаты поиска вместо списка непереведенных ключей
 
     while True:
         os.system('cls' if os.name == 'nt' else 'clear')
 
+        # Изменения файлов, сделанные другими процессами
+        watched = session.poll_watch()
+        if watched:
+            changed_paths, merged = watched
+            print(f"\033[92m\n[W] ФАЙЛЫ ИЗМЕНИЛИСЬ: обновлено секций {len(changed_paths)}, "
+                  f"подхвачено отметок {merged}\033[0m")
+
         # Автосохранение
-        current_time = time.time()
-        if current_time - last_save_time >= autosave_interval:
-            if save_checklist(args.progress, checklist):
-                last_save_time = current_time
+        if session.autosave_due():
+            if session.autosave():
                 print("\033[92m\n[A] АВТОСОХРАНЕНИЕ ПРОГРЕССА!\033[0m")
                 time.sleep(1)  # Краткая пауза для отображения сообщения
 
+        table = session.table
+        if search is not None and search['version'] != session.data_version:
+            # Файлы или таблица ключей изменились - повторяем поиск
+            search['rows'] = session.search(search['query'])
+            search['version'] = session.data_version
+        untranslated = search['rows'] if search is not None else session.untranslated
+
         # Отображаем статус фильтра в заголовке
         print("═" * terminal_width)
-        title = f" ПРОВЕРКА ЛОКАЛИЗАЦИИ | Файлы: {os.path.basename(args.original)}, {os.path.basename(args.target)} "
-        filter_info = f" [Фильтр: {filter_modes[filter_mode]}] "
+        title = f" ПРОВЕРКА ЛОКАЛИЗАЦИИ | Файлы: {os.path.basename(session.original)}, {os.path.basename(session.target)} "
+        filter_info = f" [Фильтр: {session.filter_label()}] "
         print(title.center(terminal_width, ' '))
         print(filter_info.center(terminal_width, ' '))
         print("═" * terminal_width)
 
-        if total_keys == 0:
+        if session.untranslated_count == 0 and search is None:
             print("\n[V] ВСЕ КЛЮЧИ ПЕРЕВЕДЕНЫ! ЛОКАЛИЗАЦИЯ ЗАВЕРШЕНА.")
-            save_checklist(args.progress, checklist)
+            session.save()
             input("\nНажмите Enter для выхода...")
             return
 
-        print(f"\n[L] НЕПЕРЕВЕДЕННЫЕ КЛЮЧИ (Всего: {len(untranslated)}):")
-        print("(Ключи отсортированы в порядке их появления в файле)")
-
-        # Определяем, сколько ключей показывать
-        keys_to_show = min(30, len(untranslated))
-        print(f"\nПервые ключи (показано {keys_to_show} из {len(untranslated)}):")
-
-        # Показываем ключи с 1 по keys_to_show
-        for i, idx in enumerate(list(untranslated.keys())[:keys_to_show], 1):
-            data = untranslated[idx]
-            status = data['status']
+        if search is not None:
+            print(f"\n[K] РЕЗУЛЬТАТЫ ПОИСКА '{search['query']}' (Найдено: {len(untranslated)}):")
+            print("(Переведённые ключи тоже показываются; K и пустой ввод - вернуться к списку)")
+        else:
+            print(f"\n[L] НЕПЕРЕВЕДЕННЫЕ КЛЮЧИ (Всего: {len(untranslated)}):")
+            print("(Ключи отсортированы в порядке их появления в файле)")
+
+        # Определяем видимое окно: рисуем только ключи текущей страницы
+        page_offset = clamp_offset(page_offset, len(untranslated))
+        page = untranslated[page_offset:page_offset + page_size]
+        first_shown = page_offset + 1
+        last_shown = page_offset + len(page)
+        page_number = page_offset // page_size + 1
+        page_count = (len(untranslated) + page_size - 1) // page_size
+        print(f"\nСтраница {page_number} из {page_count} "
+              f"(показаны ключи {first_shown}-{last_shown} из {len(untranslated)}):")
+
+        render_started = time.perf_counter()
+        for i, handle in enumerate(page, first_shown):
+            status = session.key_status(handle)
 
             # Форматируем вывод ключа
             key_display = format_key_display(
-                data['path'],
-                data['key'],
+                table.path_of(handle),
+                table.keys[handle],
                 status,
                 i,
                 max_width=terminal_width - 10
             )
 
             print(key_display)
+            if session.show_suggestions:
+                suggestions = session.suggestions(handle)
+                if suggestions:
+                    print(format_suggestions(suggestions, terminal_width - 10))
             print("-" * terminal_width)
+        metrics.add_time('render_page', time.perf_counter() - render_started)
+        metrics.count('keys_rendered', len(page))
 
         # Статистика и прогресс
-        total = translated_count + untranslated_count
-        print_progress(translated_count, total)
+        total = session.translated_count + session.untranslated_count
+        print_progress(session.translated_count, total)
+        stale_count = len(session.stale_keys())
+        if stale_count:
+            print(f"\033[93m[U] ИЗМЕНИЛСЯ ИСХОДНЫЙ ТЕКСТ ПЕРЕВЕДЁННЫХ КЛЮЧЕЙ: {stale_count}\033[0m\n")
 
         # Меню действий
         print("\033[93m[A] ДЕЙСТВИЯ:\033[0m")
-        print(f"1-{keys_to_show}. Отметить/снять отметку по номеру ключа")
-        print("F. Сменить режим фильтра")
+        print(f"{first_shown}-{last_shown}. Отметить/снять отметку по номеру ключа")
+        print("N/P. Следующая/предыдущая страница")
+        print("G. Перейти к ключу по номеру")
+        print("J. Перейти к пути")
+        print("K. Поиск по ключам и путям (подстрока, re:, ~ с опечатками)")
+        print(f"W. Подсказки из памяти переводов: {'ВКЛ' if session.show_suggestions else 'ВЫКЛ'}")
+        print("M. Пакетная отметка (диапазоны, пути, префиксы, регулярные выражения)")
+        print("T. Покрытие по путям и папкам")
+        print("U. Изменившиеся, новые и удаленные ключи")
+        print("V. Проверка плейсхолдеров, скобок и повторов id")
+        print("F. Сменить фильтр (пресет или выражение)")
         print("S. Сохранить прогресс")
         print("R. Обновить список ключей")
-        print("I. Показать информацию о файлах")
+        print("I. Показать информацию о файлах" + (" и замеры" if metrics.enabled else ""))
         print("C. Изменить разделитель")
+        if session.watcher is not None:
+            print("Enter. Обновить экран (изменения файлов подхватываются автоматически)")
         print("Q. Выход")
 
         # Подсказка по фильтрам
-        print("\n\033[93m[F] РЕЖИМЫ ФИЛЬТРАЦИИ:\033[0m")
-        print("0: Без фильтра (показать все ключи)")
-        print("1: Только ключи с 'datasets' в пути")
-        print("2: Скрыть ключи с 'datasets' в пути")
+        print("\n\033[93m[F] ПРЕСЕТЫ ФИЛЬТРОВ:\033[0m")
+        print_presets(session)
 
         choice = input("\n>>> ВЫБЕРИТЕ ДЕЙСТВИЕ: ").upper()
 
-        # Обработка выбора ключа (1-30)
+        # Обработка выбора ключа на текущей странице
         if choice.isdigit():
             idx = int(choice)
-            if 1 <= idx <= keys_to_show:
-                # Получаем реальный индекс ключа
-                actual_idx = list(untranslated.keys())[idx-1]
-                data = untranslated[actual_idx]
-                current_status = data['status']
-                new_status = "V" if current_status == "X" else "X"
-
-                # Обновляем статус в чеклисте и в данных ключа
-                checklist[data['id']] = new_status
-                data['status'] = new_status
-                untranslated[actual_idx] = data
-
-                # Обновляем счетчики
-                if new_status == "V":
-                    translated_count += 1
-                    untranslated_count -= 1
-                else:
-                    translated_count -= 1
-                    untranslated_count += 1
-
-                total_keys = untranslated_count
+            if first_shown <= idx <= last_shown:
+                new_status = session.toggle(untranslated[idx - 1])
 
                 action = "ОТМЕЧЕН КАК ПЕРЕВЕДЁННЫЙ" if new_status == "V" else "СНЯТА ОТМЕТКА ПЕРЕВОДА"
                 color = "\033[92m" if new_status == "V" else "\033[91m"
@@ -338,11 +1301,164 @@ def main():
                 print(f"\033[91m[X] КЛЮЧ С НОМЕРОМ {idx} НЕ НАЙДЕН!\033[0m")
             input("\nНажмите Enter для продолжения...")
 
+        # Листание страниц
+        elif choice == 'N':
+            if page_offset + page_size < len(untranslated):
+                page_offset += page_size
+        elif choice == 'P':
+            page_offset = max(0, page_offset - page_size)
+
+        # Переход к ключу по номеру
+        elif choice == 'G':
+            try:
+                number = int(input(f">>> ВВЕДИТЕ НОМЕР КЛЮЧА (1-{len(untranslated)}): "))
+                if 1 <= number <= len(untranslated):
+                    page_offset = number - 1
+                else:
+                    print(f"\033[91m[X] КЛЮЧ С НОМЕРОМ {number} НЕ НАЙДЕН!\033[0m")
+                    input("\nНажмите Enter для продолжения...")
+            except ValueError:
+                print("\033[91m[X] ВВЕДИТЕ ЧИСЛО!\033[0m")
+                input("\nНажмите Enter для продолжения...")
+
+        # Переход к пути
+        elif choice == 'J':
+            query = input(">>> ВВЕДИТЕ ПУТЬ ИЛИ ЕГО ЧАСТЬ: ").strip()
+            position = find_path_position(table, untranslated, query) if query else None
+            if position is not None:
+                page_offset = position
+            else:
+                print("\033[91m[X] НЕПЕРЕВЕДЕННЫХ КЛЮЧЕЙ В ТАКОМ ПУТИ НЕТ!\033[0m")
+                input("\nНажмите Enter для продолжения...")
+
+        # Поиск
+        elif choice == 'K':
+            print(f"\n[K] {SEARCH_HELP}")
+            query = input(">>> ВВЕДИТЕ ЗАПРОС: ").strip()
+            if not query:
+                search = None
+                page_offset = 0
+                continue
+            try:
+                started = time.perf_counter()
+                rows = session.search(query)
+                elapsed = (time.perf_counter() - started) * 1000
+                if rows:
+                    search = {'query': query, 'rows': rows, 'version': session.data_version}
+                    page_offset = 0
+                    print(f"\033[92m\n[K] НАЙДЕНО КЛЮЧЕЙ: {len(rows)} ({elapsed:.0f} мс)\033[0m")
+                else:
+                    print("\033[91m[X] НИЧЕГО НЕ НАЙДЕНО!\033[0m")
+            except ValueError as e:
+                print(f"\033[91m[X] {e}\033[0m")
+            input("\nНажмите Enter для продолжения...")
+
+        # Подсказки из памяти переводов
+        elif choice == 'W':
+            session.show_suggestions = not session.show_suggestions
+
+        # Пакетная отметка
+        elif choice == 'M':
+            print(f"\n[M] {SELECTION_HELP}")
+            expression = input(">>> ВВЕДИТЕ ВЫРАЖЕНИЕ: ").strip()
+            try:
+                # Номера на экране - номера в показанном списке (в режиме поиска - в результатах)
+                handles = session.select(expression, untranslated)
+                if handles:
+                    answer = input(f">>> НАЙДЕНО КЛЮЧЕЙ: {len(handles)}. "
+                                   "ОТМЕТИТЬ (V) ИЛИ СНЯТЬ ОТМЕТКУ (X)? [V]: ").strip().upper()
+                    status = "X" if answer == "X" else "V"
+                    changed = session.mark_many(handles, status)
+                    print(f"\033[92m\n[!] ИЗМЕНЕНО КЛЮЧЕЙ: {changed}\033[0m")
+                else:
+                    print("\033[91m[X] НИ ОДИН КЛЮЧ НЕ ПОДОШЕЛ!\033[0m")
+            except ValueError as e:
+                print(f"\033[91m[X] {e}\033[0m")
+            input("\nНажмите Enter для продолжения...")
+
+        # Таблица покрытия
+        elif choice == 'T':
+            print("\n[T] СОРТИРОВКА: " + ", ".join(f"{mode} - {name}" for mode, (name, _, _) in SORT_MODES.items()))
+            print("    Добавьте 'd', чтобы сгруппировать по папкам (например: rd)")
+            answer = input(">>> ВЫБЕРИТЕ СОРТИРОВКУ [r]: ").strip().lower()
+            by_directory = 'd' in answer
+            sort_mode = next((mode for mode in answer if mode in SORT_MODES), 'r')
+            rows = session.coverage_rows(by_directory, sort_mode)
+
+            print("\n" + "═" * terminal_width)
+            print(format_coverage_header(terminal_width))
+            print("═" * terminal_width)
+            for row in rows[:page_size * 2]:
+                print(format_coverage_row(row, terminal_width))
+            print("═" * terminal_width)
+            kind = "ПАПОК" if by_directory else "ПУТЕЙ"
+            print(f"[T] ПОКАЗАНО {min(len(rows), page_size * 2)} ИЗ {len(rows)} {kind}")
+            input("\nНажмите Enter для продолжения...")
+
+        # Очередь изменившихся ключей
+        elif choice == 'U':
+            stale = session.stale_keys()
+            orphaned = session.orphaned_marks()
+            print("\n" + "═" * terminal_width)
+            print("[U] ИЗМЕНЕНИЯ ИСХОДНОГО ФАЙЛА С ПРОШЛОГО СОХРАНЕНИЯ")
+            print("═" * terminal_width)
+            print(f"[!] Изменился текст переведённых ключей: {len(stale)}")
+            print(f"[+] Новых ключей: {len(session.new_keys())}")
+            print(f"[-] Удалено сообщений: {session.removed_sources}")
+            print(f"[-] Отметок V у удаленных ключей: {len(orphaned)}")
+            print("═" * terminal_width)
+
+            for i, handle in enumerate(stale[:page_size * 2], 1):
+                print(format_key_display(table.path_of(handle), table.keys[handle],
+                                         session.checklist.get(handle, "V"), i,
+                                         max_width=terminal_width - 10))
+                print("-" * terminal_width)
+            if len(stale) > page_size * 2:
+                print(f"[U] ПОКАЗАНО {page_size * 2} ИЗ {len(stale)}")
+
+            print("\nA - перевод всех ключей актуален, A 1-5 - только выбранных, "
+                  "O - удалить отметки удаленных ключей, Enter - назад")
+            answer = input(">>> ВЫБЕРИТЕ ДЕЙСТВИЕ: ").strip()
+            command, _, rest = answer.partition(' ')
+            try:
+                if command.upper() == 'A':
+                    if rest.strip():
+                        handles = select_handles(table, parse_selection(rest), stale)
+                        accepted = session.accept_changes(handles)
+                    else:
+                        accepted = session.accept_changes()
+                    print(f"\033[92m\n[V] ПОДТВЕРЖДЕНО СООБЩЕНИЙ: {accepted} (запишется при сохранении)\033[0m")
+                elif command.upper() == 'O':
+                    print(f"\033[92m\n[V] УДАЛЕНО ОТМЕТОК: {session.remove_orphaned()}\033[0m")
+            except ValueError as e:
+                print(f"\033[91m[X] {e}\033[0m")
+            input("\nНажмите Enter для продолжения...")
+
+        # Проверка сообщений
+        elif choice == 'V':
+            started = time.perf_counter()
+            issues = session.validate_messages()
+            elapsed = (time.perf_counter() - started) * 1000
+            print("\n" + "═" * terminal_width)
+            print(f"[V] ПРОВЕРКА СООБЩЕНИЙ ({elapsed:.0f} мс)")
+            print("═" * terminal_width)
+            for kind, count in count_issues(issues).items():
+                if count:
+                    print(f"[!] {ISSUE_KINDS[kind].capitalize()}: {count}")
+            if issues:
+                print("═" * terminal_width)
+                for issue in issues[:page_size * 2]:
+                    print(textwrap.shorten(format_issue(issue), terminal_width - 1, placeholder="..."))
+                if len(issues) > page_size * 2:
+                    print(f"[V] ПОКАЗАНО {page_size * 2} ИЗ {len(issues)}")
+            else:
+                print("\033[92m[V] ОШИБОК НЕ НАЙДЕНО\033[0m")
+            input("\nНажмите Enter для продолжения...")
+
         # Сохранить прогресс
         elif choice == 'S':
-            if save_checklist(args.progress, checklist):
+            if session.save():
                 print("\033[92m\n[S] ПРОГРЕСС СОХРАНЁН!\033[0m")
-                last_save_time = time.time()
             else:
                 print("\033[91m\n[!] НЕ УДАЛОСЬ СОХРАНИТЬ ПРОГРЕСС!\033[0m")
             input("Нажмите Enter для продолжения...")
@@ -350,46 +1466,34 @@ def main():
         # Обновить список ключей
         elif choice == 'R':
             print("\n[R] ОБНОВЛЕНИЕ СПИСКА КЛЮЧЕЙ...")
-            # Перезагружаем файлы
-            original_keys, _ = parse_keys(args.original, args.delimiter)
-            _, target_key_set = parse_keys(args.target, args.delimiter)
-
-            # Обновляем список непереведенных ключей
-            untranslated, translated_count, untranslated_count = get_untranslated_keys(
-                original_keys,
-                target_key_set,
-                checklist,
-                filter_mode
-            )
-            total_keys = untranslated_count
-            print(f"[V] ЗАГРУЖЕНО {len(untranslated)} КЛЮЧЕЙ")
+            changed_paths = session.refresh()
+            print(f"[V] ИЗМЕНЕНО СЕКЦИЙ: {len(changed_paths)}")
+            print(f"[V] ЗАГРУЖЕНО {len(session.untranslated)} КЛЮЧЕЙ")
             input("Нажмите Enter для продолжения...")
 
-        # Сменить режим фильтра
+        # Сменить фильтр
         elif choice == 'F':
-            print("\n[F] СМЕНА РЕЖИМА ФИЛЬТРАЦИИ:")
-            print("0: Без фильтра (показать все ключи)")
-            print("1: Только ключи с 'datasets' в пути")
-            print("2: Скрыть ключи с 'datasets' в пути")
+            print("\n[F] СМЕНА ФИЛЬТРА:")
+            print_presets(session)
+            print(f"\n[F] {FILTER_HELP}")
+            print("    Пример: datasets and not path:*/names/* and len>20")
 
+            answer = input(">>> ВВЕДИТЕ НОМЕР ПРЕСЕТА ИЛИ ВЫРАЖЕНИЕ: ").strip()
             try:
-                new_mode = int(input(">>> ВВЕДИТЕ НОМЕР РЕЖИМА (0-2): "))
-                if new_mode in [0, 1, 2]:
-                    filter_mode = new_mode
-                    print(f"\033[92m\n[!] ФИЛЬТР ИЗМЕНЕН НА: {filter_modes[filter_mode]}\033[0m")
-
-                    # Пересчитываем список с новым фильтром
-                    untranslated, translated_count, untranslated_count = get_untranslated_keys(
-                        original_keys,
-                        target_key_set,
-                        checklist,
-                        filter_mode
-                    )
-                    total_keys = untranslated_count
-                else:
-                    print("\033[91m[X] НЕВЕРНЫЙ РЕЖИМ ФИЛЬТРА!\033[0m")
-            except ValueError:
-                print("\033[91m[X] ВВЕДИТЕ ЧИСЛО ОТ 0 ДО 2!\033[0m")
+                session.set_filter(session.resolve_filter(answer))
+                page_offset = 0
+                print(f"\033[92m\n[!] ФИЛЬТР ИЗМЕНЕН НА: {session.filter_label() or 'БЕЗ ФИЛЬТРА'}\033[0m")
+
+                # Новое выражение можно сохранить как пресет
+                if session.preset_index is None:
+                    name = input(">>> ИМЯ ДЛЯ ПРЕСЕТА (Enter - не сохранять): ").strip()
+                    if name:
+                        if session.save_preset(name):
+                            print(f"\033[92m[S] ПРЕСЕТ '{name}' СОХРАНЁН\033[0m")
+                        else:
+                            print("\033[91m[!] НЕ УДАЛОСЬ СОХРАНИТЬ ПРЕСЕТ!\033[0m")
+            except ValueError as e:
+                print(f"\033[91m[X] {e}\033[0m")
 
             input("\nНажмите Enter для продолжения...")
 
@@ -397,22 +1501,12 @@ def main():
         elif choice == 'C':
             new_delimiter = input("\n>>> ВВЕДИТЕ НОВЫЙ РАЗДЕЛИТЕЛЬ: ")
             if new_delimiter:
-                args.delimiter = new_delimiter
-                print(f"\033[92m\n[!] РАЗДЕЛИТЕЛЬ ИЗМЕНЕН НА: '{args.delimiter}'\033[0m")
+                print(f"\033[92m\n[!] РАЗДЕЛИТЕЛЬ ИЗМЕНЕН НА: '{new_delimiter}'\033[0m")
 
                 # Перезагружаем файлы с новым разделителем
-                original_keys, _ = parse_keys(args.original, args.delimiter)
-                _, target_key_set = parse_keys(args.target, args.delimiter)
-
-                # Обновляем список ключей
-                untranslated, translated_count, untranslated_count = get_untranslated_keys(
-                    original_keys,
-                    target_key_set,
-                    checklist,
-                    filter_mode
-                )
-                total_keys = untranslated_count
-                print(f"[V] ЗАГРУЖЕНО {len(untranslated)} КЛЮЧЕЙ С НОВЫМ РАЗДЕЛИТЕЛЕМ")
+                session.set_delimiter(new_delimiter)
+                page_offset = 0
+                print(f"[V] ЗАГРУЖЕНО {len(session.untranslated)} КЛЮЧЕЙ С НОВЫМ РАЗДЕЛИТЕЛЕМ")
             else:
                 print("\033[91m[X] РАЗДЕЛИТЕЛЬ НЕ МОЖЕТ БЫТЬ ПУСТЫМ!\033[0m")
             input("\nНажмите Enter для продолжения...")
@@ -424,18 +1518,28 @@ def main():
             print("═" * terminal_width)
             print(f"[C] Текущий рабочий каталог: {os.getcwd()}")
             print(f"[F] Папка скрипта: {script_dir}")
-            print(f"[*] Исходная локализация: {args.original}")
-            print(f"[*] Целевая локализация: {args.target}")
-            print(f"[P] Файл прогресса: {args.progress}")
-            print(f"[D] Используемый разделитель: '{args.delimiter}'")
-            print(f"[A] Автосохранение: каждые {args.autosave} мин")
+            print(f"[*] Исходная локализация: {session.original}")
+            print(f"[*] Целевая локализация: {session.target}")
+            print(f"[P] Файл прогресса: {session.progress}")
+            print(f"[D] Используемый разделитель: '{session.delimiter}'")
+            print(f"[A] Автосохранение: каждые {session.autosave_interval // 60} мин")
             print("═" * terminal_width)
+            if metrics.enabled:
+                print("[P] ЗАМЕРЫ (--profile)")
+                print("═" * terminal_width)
+                for line in format_metrics(terminal_width):
+                    print(line)
+                print("═" * terminal_width)
             input("\nНажмите Enter для продолжения...")
 
+        # Пустой ввод - перерисовать экран с подхваченными изменениями
+        elif choice == '' and session.watcher is not None:
+            continue
+
         # Выход
         elif choice == 'Q':
             print("\nВыход из программы")
-            if save_checklist(args.progress, checklist):
+            if session.save():
                 print("\033[92m[S] ПРОГРЕСС СОХРАНЁН ПЕРЕД ВЫХОДОМ\033[0m")
             break
 
@@ -0,0 +1,215 @@
+# message_check.py
+import re
+from collections import OrderedDict
+
+from fluent_match import FileState, ENTRY_RE, line_identity, message_value, normalize_path
+
+# Виды ошибок и их описания для вывода
+ISSUE_KINDS = OrderedDict([
+    ('missing-variable', "в переводе нет переменной"),
+    ('extra-variable', "в переводе лишняя переменная"),
+    ('selector', "другие селекторы"),
+    ('term', "другие термы"),
+    ('braces', "несбалансированные скобки"),
+    ('duplicate-id', "повторяющийся id"),
+])
+
+_VARIABLE_RE = re.compile(r'\$([A-Za-z][A-Za-z0-9_-]*)')
+_TERM_RE = re.compile(r'(?<![A-Za-z0-9_$-])-([A-Za-z][A-Za-z0-9_-]*)')
+
+class MessageSignature:
+    """Что должно совпадать у исходного сообщения и перевода"""
+    __slots__ = ('variables', 'selectors', 'terms', 'balanced')
+
+    def __init__(self, variables, selectors, terms, balanced):
+        self.variables = variables
+        self.selectors = selectors
+        self.terms = terms
+        self.balanced = balanced
+
+def scan_placeables(text):
+    """Разбирает фигурные скобки значения.
+
+    Возвращает (куски текста внутри скобок без строковых литералов, сбалансированы ли скобки).
+    """
+    inner = []
+    depth = 0
+    in_string = False
+    start = 0
+    i = 0
+    length = len(text)
+    while i < length:
+        ch = text[i]
+        if in_string:
+            if ch == '\\':
+                i += 1
+            elif ch == '"':
+                in_string = False
+                start = i + 1
+        elif ch == '{':
+            if depth:
+                inner.append(text[start:i])
+            depth += 1
+            start = i + 1
+        elif ch == '}':
+            if not depth:
+                return inner, False
+            inner.append(text[start:i])
+            depth -= 1
+            start = i + 1
+        elif ch == '"' and depth:
+            inner.append(text[start:i])
+            in_string = True
+        i += 1
+    return inner, depth == 0 and not in_string
+
+def collect_messages(lines, duplicates, table=None):
+    """Собирает значения сообщений из строк (путь, ключ, идентичность).
+
+    Возвращает словарь идентичность -> [путь, номер первого ключа в table, части значения];
+    без таблицы номер ключа None.
+    Повторы id внутри одного пути дописываются в duplicates как (путь, id, номер ключа).
+    """
+    messages = OrderedDict()
+    seen_ids = set()
+    last = None
+    depth = 0
+    for path, key, identity in lines:
+        norm_path, message, attribute = identity
+        if message is None:
+            # Внутри незакрытых скобок строки могут идти без отступа (варианты и закрывающая
+            # скобка селектора) - это еще часть сообщения
+            if last is not None and depth > 0 and last[0] == path:
+                value = key.strip()
+                last[2].append(value)
+                depth += value.count('{') - value.count('}')
+            else:
+                last = None
+            continue
+        if message == '#':
+            last = None
+            continue
+        value = message_value(key)
+        if value is None:
+            value = key.strip()
+        elif attribute is None and ENTRY_RE.match(key):
+            if (path, message) in seen_ids:
+                duplicates.append((path, message, table.find(path, key) if table is not None else None))
+            seen_ids.add((path, message))
+        entry = messages.get(identity)
+        if entry is None:
+            handle = table.find(path, key) if table is not None else None
+            entry = messages[identity] = [path, handle, [value]]
+        else:
+            entry[2].append(value)
+        if entry is not last:
+            last = entry
+            depth = 0
+        depth += value.count('{') - value.count('}')
+    return messages
+
+def iter_lines(records):
+    """Строки файла вместе с идентичностью сообщения (см. fluent_match.line_identity)"""
+    states = {}
+    for path, key in records:
+        state = states.get(path)
+        if state is None:
+            state = states[path] = (FileState(), normalize_path(path))
+        yield path, key, line_identity(state[0], state[1], key)
+
+class MessageChecker:
+    """Проверка плейсхолдеров и синтаксиса сообщений Fluent.
+
+    Подпись (переменные, селекторы, термы, баланс скобок) считается один раз
+    на уникальный текст сообщения и кэшируется между проверками.
+    """
+    __slots__ = ('cache',)
+
+    def __init__(self):
+        self.cache = {}
+
+    def signature(self, text):
+        signature = self.cache.get(text)
+        if signature is None:
+            segments, balanced = scan_placeables(text)
+            inner = ' '.join(segments)
+            selectors = set()
+            for segment in segments:
+                if '->' in segment:
+                    # Селектор - переменные выражения перед стрелкой (или само выражение)
+                    expression = segment.split('->', 1)[0]
+                    selectors.update(_VARIABLE_RE.findall(expression) or [expression.strip()])
+            signature = self.cache[text] = MessageSignature(
+                frozenset(_VARIABLE_RE.findall(inner)),
+                frozenset(selectors),
+                frozenset(_TERM_RE.findall(inner)),
+                balanced
+            )
+        return signature
+
+    def check(self, table, original_records, target_records):
+        """Проверяет все сообщения за один проход по каждому файлу.
+
+        Берутся записи файлов как есть: в таблице ключей одинаковые строки
+        (например, закрывающие скобки) одного пути схлопнуты.
+        Возвращает список ошибок: словари path, id, kind, detail, handle
+        (номер ключа исходного файла или None) и side ('original' или 'target').
+        """
+        issues = []
+
+        source_duplicates = []
+        source_messages = collect_messages(iter_lines(original_records), source_duplicates, table)
+        target_duplicates = []
+        target_messages = collect_messages(iter_lines(target_records), target_duplicates)
+
+        for side, duplicates in (('original', source_duplicates), ('target', target_duplicates)):
+            for path, message, handle in duplicates:
+                issues.append(self.issue(path, message, 'duplicate-id', message, handle, side))
+
+        for identity, (path, handle, parts) in source_messages.items():
+            message_id = self.message_label(identity)
+            source = self.signature('\n'.join(parts))
+            translated = target_messages.get(identity)
+            target = self.signature('\n'.join(translated[2])) if translated is not None else None
+            if not source.balanced:
+                issues.append(self.issue(path, message_id, 'braces', '', handle, 'original'))
+            if target is not None and not target.balanced:
+                issues.append(self.issue(translated[0], message_id, 'braces', '', handle, 'target'))
+            if target is None or not (source.balanced and target.balanced):
+                # Без целых скобок сравнивать плейсхолдеры бессмысленно
+                continue
+            target_path = translated[0]
+            for kind, names in (('missing-variable', source.variables - target.variables),
+                                ('extra-variable', target.variables - source.variables),
+                                ('selector', source.selectors ^ target.selectors),
+                                ('term', source.terms ^ target.terms)):
+                if names:
+                    prefix = '-' if kind == 'term' else '$'
+                    detail = ', '.join(prefix + name for name in sorted(names))
+                    issues.append(self.issue(target_path, message_id, kind, detail, handle, 'target'))
+        return issues
+
+    @staticmethod
+    def message_label(identity):
+        _, message, attribute = identity
+        return f"{message}.{attribute}" if attribute else message
+
+    @staticmethod
+    def issue(path, message_id, kind, detail, handle, side):
+        return {'path': path, 'id': message_id, 'kind': kind, 'detail': detail,
+                'handle': handle, 'side': side}
+
+def count_issues(issues):
+    """Число ошибок каждого вида"""
+    counts = OrderedDict((kind, 0) for kind in ISSUE_KINDS)
+    for issue in issues:
+        counts[issue['kind']] += 1
+    return counts
+
+def format_issue(issue):
+    """Строка с описанием ошибки для вывода"""
+    text = ISSUE_KINDS[issue['kind']]
+    if issue['detail']:
+        text += f": {issue['detail']}"
+    side = "исходный файл" if issue['side'] == 'original' else "перевод"
+    return f"{issue['path']} | {issue['id']} | {text} ({side})"
@@ -0,0 +1,186 @@
+# multi_locale.py
+import os
+import sys
+import csv
+import json
+import pickle
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+from locale_index import load_records, parse_keys, mark_target_keys
+from fluent_match import FluentMatcher
+from key_filter import FilterContext, compile_filter, resolve_filter, load_presets
+from path_coverage import PathCoverage, coverage_entry
+from progress_store import Checklist
+
+# Общий индекс исходного файла в процессе-исполнителе (загружается один раз на процесс)
+_shared = None
+
+def locale_name(target_file):
+    """Название локали по имени файла: ru-RU.txt -> ru-RU"""
+    return os.path.splitext(os.path.basename(target_file))[0]
+
+def write_shared_index(table, matcher, delimiter, expression, use_cache):
+    """Сериализует таблицу ключей исходного файла во временный файл для исполнителей"""
+    fd, index_path = tempfile.mkstemp(prefix='locacheck-', suffix='.idx')
+    with os.fdopen(fd, 'wb') as f:
+        pickle.dump((table, matcher, delimiter, expression, use_cache), f,
+                    protocol=pickle.HIGHEST_PROTOCOL)
+    return index_path
+
+def _init_worker(index_path):
+    """Инициализация процесса: читает общий индекс"""
+    global _shared
+    with open(index_path, 'rb') as f:
+        table, matcher, delimiter, expression, use_cache = pickle.load(f)
+    _shared = (table, matcher, delimiter, compile_filter(expression), use_cache)
+
+def check_locale(target_file):
+    """Сравнивает один целевой файл с общим индексом.
+
+    Файл прогресса ведется для одной локали, поэтому ручные отметки V здесь
+    не учитываются: переведен только ключ, найденный в целевом файле.
+    Возвращает (файл, переведено по путям, не переведено по путям).
+    """
+    table, matcher, delimiter, key_filter, use_cache = _shared
+    records, _ = load_records(target_file, delimiter, use_cache, verbose=False)
+    flags = mark_target_keys(table, records, matcher=matcher)
+
+    coverage = PathCoverage(len(table.paths))
+    ctx = FilterContext(table, flags, Checklist(table))
+    for path_id, state in enumerate(key_filter.path_states(table)):
+        if state is False:
+            continue
+        for handle in key_filter.path_keys(ctx, path_id, state):
+            coverage.add(path_id, flags[handle])
+    return target_file, coverage.translated, coverage.untranslated
+
+def run_checks(table, matcher, targets, delimiter, expression='', use_cache=True, jobs=None):
+    """Проверяет все целевые файлы параллельно, по процессу на ядро.
+
+    Исходный файл разбирается один раз; исполнители получают готовый индекс.
+    Возвращает словарь файл -> PathCoverage в порядке targets.
+    """
+    index_path = write_shared_index(table, matcher, delimiter, expression, use_cache)
+    try:
+        jobs = max(1, min(jobs or os.cpu_count() or 1, len(targets)))
+        if jobs == 1:
+            _init_worker(index_path)
+            results = [check_locale(target) for target in targets]
+        else:
+            with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker,
+                                     initargs=(index_path,)) as pool:
+                results = list(pool.map(check_locale, targets))
+    finally:
+        os.remove(index_path)
+
+    matrix = {}
+    for target, translated, untranslated in results:
+        coverage = PathCoverage()
+        coverage.translated, coverage.untranslated = translated, untranslated
+        matrix[target] = coverage
+    return matrix
+
+def build_matrix_rows(table, matrix):
+    """Строки матрицы покрытия: путь, всего ключей и переведено в каждой локали"""
+    rows = []
+    coverages = list(matrix.values())
+    for path_id, path in enumerate(table.paths):
+        total = coverages[0].translated[path_id] + coverages[0].untranslated[path_id] if coverages else 0
+        if not total:
+            continue
+        rows.append({'path': path, 'total': total,
+                     'translated': [coverage.translated[path_id] for coverage in coverages]})
+    return rows
+
+def summarize(matrix):
+    """Итоги по каждой локали"""
+    summary = {}
+    for target, coverage in matrix.items():
+        entry = coverage_entry(None, sum(coverage.translated), sum(coverage.untranslated))
+        del entry['path']
+        summary[locale_name(target)] = entry
+    return summary
+
+def write_matrix(stream, fmt, locales, rows, summary, width=100):
+    """Выводит матрицу покрытия: text, json, jsonl или csv"""
+    if fmt == 'json':
+        json.dump({
+            'locales': locales,
+            'paths': [{'path': row['path'], 'total': row['total'],
+                       'translated': dict(zip(locales, row['translated']))} for row in rows],
+            'summary': summary,
+        }, stream, ensure_ascii=False)
+        stream.write('\n')
+    elif fmt == 'jsonl':
+        for row in rows:
+            stream.write(json.dumps({'type': 'path', 'path': row['path'], 'total': row['total'],
+                                     'translated': dict(zip(locales, row['translated']))},
+                                    ensure_ascii=False) + '\n')
+        for locale, entry in summary.items():
+            stream.write(json.dumps(dict(entry, type='summary', locale=locale), ensure_ascii=False) + '\n')
+    elif fmt == 'csv':
+        writer = csv.writer(stream)
+        writer.writerow(['path', 'total'] + locales)
+        for row in rows:
+            writer.writerow([row['path'], row['total']] + row['translated'])
+        writer.writerow(['summary', ''] + [summary[locale]['translated'] for locale in locales])
+    else:
+        cell = max(8, max(len(locale) for locale in locales) + 1)
+        path_width = max(10, width - 8 - cell * len(locales))
+        stream.write(f"{'Путь':<{path_width}}{'всего':>8}" + ''.join(f"{locale:>{cell}}" for locale in locales) + '\n')
+        stream.write('═' * (path_width + 8 + cell * len(locales)) + '\n')
+        for row in rows:
+            path = row['path']
+            if len(path) > path_width - 1:
+                path = '…' + path[-(path_width - 2):]
+            cells = ''.join(f"{translated / row['total'] * 100:>{cell - 1}.1f}%"
+                            for translated in row['translated'])
+            stream.write(f"{path:<{path_width}}{row['total']:>8}{cells}\n")
+        stream.write('═' * (path_width + 8 + cell * len(locales)) + '\n')
+        cells = ''.join(f"{summary[locale]['percent']:>{cell - 1}.1f}%" for locale in locales)
+        total = next(iter(summary.values()))['total'] if summary else 0
+        stream.write(f"{'ИТОГО':<{path_width}}{total:>8}{cells}\n")
+
+def run_multi_report(args):
+    """Проверка нескольких целевых локалей за один запуск, код выхода как у --report"""
+    from headless_report import EXIT_OK, EXIT_REGRESSION, EXIT_ERROR
+
+    missing = [f for f in [args.original] + args.targets if not os.path.exists(f)]
+    if missing:
+        for f in missing:
+            print(f"[X] ФАЙЛ НЕ НАЙДЕН: {f}", file=sys.stderr)
+        return EXIT_ERROR
+
+    expression = resolve_filter(load_presets(args.presets), args.filter)
+    try:
+        compile_filter(expression)
+    except ValueError as e:
+        print(f"[X] Ошибка в фильтре: {e}", file=sys.stderr)
+        return EXIT_ERROR
+
+    table, _ = parse_keys(args.original, args.delimiter, not args.no_cache, verbose=False)
+    matcher = FluentMatcher(table) if not args.exact_match else None
+    matrix = run_checks(table, matcher, args.targets, args.delimiter, expression,
+                        not args.no_cache, args.jobs)
+
+    locales = [locale_name(target) for target in args.targets]
+    rows = build_matrix_rows(table, matrix)
+    summary = summarize(matrix)
+
+    fmt = args.report or 'text'
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8', newline='') as stream:
+            write_matrix(stream, fmt, locales, rows, summary)
+    else:
+        write_matrix(sys.stdout, fmt, locales, rows, summary)
+
+    problems = []
+    if args.max_untranslated is not None:
+        for locale, entry in summary.items():
+            if entry['untranslated'] > args.max_untranslated:
+                problems.append(f"{locale}: непереведенных ключей {entry['untranslated']} "
+                                f"(допустимо не больше {args.max_untranslated})")
+    for problem in problems:
+        print(f"[X] {problem}", file=sys.stderr)
+    return EXIT_REGRESSION if problems else EXIT_OK
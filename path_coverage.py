@@ -0,0 +1,104 @@
+# path_coverage.py
+from array import array
+
+# Способы сортировки таблицы покрытия: ключ -> (название, функция ключа, по убыванию)
+SORT_MODES = {
+    'r': ("осталось перевести", lambda row: (row['untranslated'], row['path']), True),
+    'p': ("процент перевода", lambda row: (row['percent'], row['path']), False),
+    't': ("всего ключей", lambda row: (row['total'], row['path']), True),
+    'n': ("имя", lambda row: row['path'], False),
+}
+
+def coverage_entry(path, translated, untranslated):
+    """Собирает строку покрытия для одного пути"""
+    total = translated + untranslated
+    return {
+        'path': path,
+        'total': total,
+        'translated': translated,
+        'untranslated': untranslated,
+        'percent': round(translated / total * 100, 2) if total else 100.0
+    }
+
+def directory_prefixes(path):
+    """Возвращает все папки пути: /a/b/c.ftl -> /a/, /a/b/"""
+    prefixes = []
+    pos = path.find('/', 1)
+    while pos != -1:
+        prefixes.append(path[:pos + 1])
+        pos = path.find('/', pos + 1)
+    return prefixes
+
+class PathCoverage:
+    """Счетчики переведенных/непереведенных ключей по каждому пути таблицы"""
+    __slots__ = ('translated', 'untranslated')
+
+    def __init__(self, path_count=0):
+        self.translated = array('I', [0]) * path_count
+        self.untranslated = array('I', [0]) * path_count
+
+    def add(self, path_id, translated):
+        """Учитывает один ключ"""
+        if translated:
+            self.translated[path_id] += 1
+        else:
+            self.untranslated[path_id] += 1
+
+    def remove(self, path_id, translated):
+        """Убирает один ключ из счетчиков (ключ перестал проходить фильтр)"""
+        if translated:
+            self.translated[path_id] -= 1
+        else:
+            self.untranslated[path_id] -= 1
+
+    def set(self, path_id, translated, untranslated):
+        """Задает счетчики пути целиком (после пересчета секции)"""
+        self.translated[path_id] = translated
+        self.untranslated[path_id] = untranslated
+
+    def path_rows(self, table):
+        """Строки покрытия по путям (только пути, где есть ключи под фильтром)"""
+        rows = []
+        for path_id, path in enumerate(table.paths):
+            translated = self.translated[path_id]
+            untranslated = self.untranslated[path_id]
+            if translated or untranslated:
+                rows.append(coverage_entry(path, translated, untranslated))
+        return rows
+
+    def directory_rows(self, table):
+        """Строки покрытия по папкам: суммы по всем путям внутри папки"""
+        totals = {}
+        for path_id, path in enumerate(table.paths):
+            translated = self.translated[path_id]
+            untranslated = self.untranslated[path_id]
+            if not (translated or untranslated):
+                continue
+            for directory in directory_prefixes(path):
+                counts = totals.get(directory)
+                if counts is None:
+                    counts = totals[directory] = [0, 0]
+                counts[0] += translated
+                counts[1] += untranslated
+        return [coverage_entry(directory, translated, untranslated)
+                for directory, (translated, untranslated) in totals.items()]
+
+def sort_rows(rows, mode='r'):
+    """Сортирует строки покрытия выбранным способом"""
+    _, key, reverse = SORT_MODES.get(mode, SORT_MODES['r'])
+    return sorted(rows, key=key, reverse=reverse)
+
+def format_coverage_row(row, width=100):
+    """Форматирует строку таблицы покрытия"""
+    numbers = f"{row['percent']:6.1f}% {row['translated']:8d} {row['untranslated']:8d} {row['total']:8d}"
+    path_width = max(10, width - len(numbers) - 2)
+    path = row['path']
+    if len(path) > path_width:
+        path = '…' + path[-(path_width - 1):]
+    return f"{path:<{path_width}}  {numbers}"
+
+def format_coverage_header(width=100):
+    """Заголовок таблицы покрытия"""
+    numbers = f"{'%':>7} {'готово':>8} {'осталось':>8} {'всего':>8}"
+    path_width = max(10, width - len(numbers) - 2)
+    return f"{'Путь':<{path_width}}  {numbers}"
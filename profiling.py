@@ -0,0 +1,186 @@
+# profiling.py
+import io
+import sys
+import json
+import time
+import platform
+import functools
+from collections import OrderedDict
+
+# Сколько функций cProfile и мест выделения памяти tracemalloc попадает в отчет
+TOP_FUNCTIONS = 30
+TOP_ALLOCATIONS = 20
+
+class _StageTimer:
+    """Замер одной стадии: with metrics.stage('имя'): ..."""
+    __slots__ = ('metrics', 'name', 'started')
+
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+        self.started = 0.0
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.metrics.add_time(self.name, time.perf_counter() - self.started)
+
+class _NoTimer:
+    """Замер, когда сбор метрик выключен: ничего не делает"""
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+_NO_TIMER = _NoTimer()
+
+class Metrics:
+    """Таймеры стадий и счетчики (строки, ключи, байты).
+
+    По умолчанию выключены, и замеры ничего не стоят; включаются параметром
+    --profile. Дополнительно можно снять профиль cProfile и трассировку
+    памяти tracemalloc.
+    """
+    __slots__ = ('enabled', 'started', 'timers', 'counters', 'profiler', 'trace_memory')
+
+    def __init__(self):
+        self.enabled = False
+        self.started = time.time()
+        self.timers = OrderedDict()    # стадия -> [вызовов, всего секунд, максимум секунд]
+        self.counters = OrderedDict()  # счетчик -> значение
+        self.profiler = None
+        self.trace_memory = False
+
+    def enable(self, cpu=False, memory=False):
+        """Включает сбор метрик; cpu - профиль cProfile, memory - трассировка tracemalloc"""
+        self.enabled = True
+        if cpu and self.profiler is None:
+            import cProfile
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+        if memory and not self.trace_memory:
+            import tracemalloc
+            tracemalloc.start()
+            self.trace_memory = True
+
+    def stage(self, name):
+        """Контекстный менеджер замера стадии"""
+        return _StageTimer(self, name) if self.enabled else _NO_TIMER
+
+    def add_time(self, name, seconds):
+        if not self.enabled:
+            return
+        timer = self.timers.get(name)
+        if timer is None:
+            timer = self.timers[name] = [0, 0.0, 0.0]
+        timer[0] += 1
+        timer[1] += seconds
+        timer[2] = max(timer[2], seconds)
+
+    def count(self, name, amount=1):
+        if self.enabled:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def rows(self):
+        """Строки для экрана замеров: (стадия, вызовов, всего секунд, максимум) и (счетчик, значение)"""
+        stages = [(name, calls, total, longest) for name, (calls, total, longest) in self.timers.items()]
+        stages.sort(key=lambda row: row[2], reverse=True)
+        return stages, list(self.counters.items())
+
+    def cpu_profile(self):
+        """Самые дорогие функции по собственному времени из профиля cProfile"""
+        if self.profiler is None:
+            return []
+        import pstats
+        self.profiler.disable()
+        try:
+            stats = pstats.Stats(self.profiler, stream=io.StringIO()).stats
+        finally:
+            self.profiler.enable()
+        rows = []
+        for (filename, line, function), (_, calls, own, cumulative, _) in stats.items():
+            rows.append({'function': f"{filename}:{line}({function})", 'calls': calls,
+                         'own_seconds': round(own, 4), 'cumulative_seconds': round(cumulative, 4)})
+        rows.sort(key=lambda row: row['own_seconds'], reverse=True)
+        return rows[:TOP_FUNCTIONS]
+
+    def memory_profile(self):
+        """Текущая и пиковая память по tracemalloc и места, где выделено больше всего"""
+        if not self.trace_memory:
+            return None
+        import tracemalloc
+        current, peak = tracemalloc.get_traced_memory()
+        top = tracemalloc.take_snapshot().statistics('lineno')[:TOP_ALLOCATIONS]
+        return {
+            'current_mb': round(current / (1 << 20), 2),
+            'peak_mb': round(peak / (1 << 20), 2),
+            'top': [{'where': str(stat.traceback), 'size_kb': round(stat.size / 1024, 1), 'count': stat.count}
+                    for stat in top],
+        }
+
+    def to_dict(self):
+        stages, counters = self.rows()
+        report = OrderedDict([
+            ('created', time.strftime('%Y-%m-%d %H:%M:%S')),
+            ('uptime_seconds', round(time.time() - self.started, 3)),
+            ('python', platform.python_version()),
+            ('platform', platform.platform()),
+            ('argv', sys.argv[1:]),
+            ('stages', OrderedDict((name, {'calls': calls, 'seconds': round(total, 4),
+                                           'max_seconds': round(longest, 4)})
+                                   for name, calls, total, longest in stages)),
+            ('counters', OrderedDict(counters)),
+        ])
+        if self.profiler is not None:
+            report['cpu'] = self.cpu_profile()
+        memory = self.memory_profile()
+        if memory is not None:
+            report['memory'] = memory
+        return report
+
+    def write(self, file_path):
+        """Сохраняет метрики в JSON; возвращает True при успехе"""
+        try:
+            with open(file_path, 'w', encoding='utf-8') as f:
+                json.dump(self.to_dict(), f, ensure_ascii=False, indent=2)
+            return True
+        except Exception as e:
+            print(f"[!] Ошибка записи файла замеров {file_path}: {e}", file=sys.stderr)
+            return False
+
+# Метрики процесса: стадии в разных модулях пишут в один набор
+metrics = Metrics()
+
+def timed(name):
+    """Декоратор: замеряет каждый вызов функции как стадию name"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not metrics.enabled:
+                return func(*args, **kwargs)
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                metrics.add_time(name, time.perf_counter() - started)
+        return wrapper
+    return decorator
+
+def format_metrics(max_width=100):
+    """Строки экрана замеров для построчного меню и полноэкранного режима"""
+    stages, counters = metrics.rows()
+    lines = [f"{'Стадия':<32} {'Вызовов':>8} {'Всего, с':>10} {'Макс., с':>10}"]
+    for name, calls, total, longest in stages:
+        lines.append(f"{name[:32]:<32} {calls:>8} {total:>10.3f} {longest:>10.3f}")
+    if counters:
+        lines.append("")
+        lines.append(f"{'Счетчик':<32} {'Значение':>30}")
+        for name, value in counters:
+            value = f"{value:,}".replace(',', ' ')
+            lines.append(f"{name[:32]:<32} {value:>30}")
+    return [line[:max_width] for line in lines]
@@ -0,0 +1,133 @@
+# progress_db.py
+import os
+import json
+import sqlite3
+
+from source_hashes import hash64
+
+# Расширения файла прогресса, который хранится в компактном виде (SQLite), а не в JSON
+COMPACT_EXTENSIONS = ('.db', '.sqlite', '.sqlite3')
+# Разделитель, по которому key_id делится на путь и строку, если в файле он не записан
+DEFAULT_DELIMITER = '鎰'
+SCHEMA_VERSION = '1'
+
+# Коды статусов: один байт на ключ и в чеклисте в памяти, и в компактном файле (0 - отметки нет)
+STATUS_CODES = {"V": 1, "X": 2}
+STATUS_NAMES = {code: status for status, code in STATUS_CODES.items()}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT NOT NULL) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS paths (id INTEGER PRIMARY KEY, path TEXT NOT NULL UNIQUE);
+CREATE TABLE IF NOT EXISTS marks (
+    path_id INTEGER NOT NULL,
+    hash INTEGER NOT NULL,
+    status NOT NULL,
+    line TEXT NOT NULL,
+    PRIMARY KEY (path_id, hash, line)
+) WITHOUT ROWID;
+"""
+
+def is_compact_path(file_path):
+    """Хранится ли файл прогресса в компактном виде (по расширению)"""
+    return os.path.splitext(file_path)[1].lower() in COMPACT_EXTENSIONS
+
+def _signed(value):
+    """Беззнаковый 64-битный хэш в диапазон целых SQLite"""
+    return value - (1 << 64) if value >= (1 << 63) else value
+
+def encode_status(status):
+    """V и X хранятся кодом-байтом, любые другие значения - текстом JSON (без потерь)"""
+    code = STATUS_CODES.get(status) if isinstance(status, str) else None
+    return code if code is not None else json.dumps(status, ensure_ascii=False)
+
+class ProgressDatabase:
+    """Прогресс в файле SQLite.
+
+    Пути хранятся один раз в таблице paths, отметка - строка marks с ключом
+    (номер пути, хэш строки, строка) и кодом статуса. Строки сравниваются
+    в основном по хэшу, а сама строка различает строки с одинаковым хэшем
+    и восстанавливает key_id без исходного файла. Обновление одной отметки -
+    одна запись по первичному ключу, без переписывания всего файла.
+    """
+    __slots__ = ('file_path', 'connection', 'delimiter', 'path_ids', 'paths')
+
+    def __init__(self, file_path, delimiter=None):
+        self.file_path = file_path
+        self.connection = sqlite3.connect(file_path)
+        try:
+            self.connection.executescript(_SCHEMA)
+            meta = dict(self.connection.execute("SELECT name, value FROM meta"))
+            if meta.get('schema', SCHEMA_VERSION) != SCHEMA_VERSION:
+                raise ValueError(f"неизвестная версия формата: {meta['schema']}")
+            self.delimiter = meta.get('delimiter')
+            if self.delimiter is None:
+                # Новый файл: разделитель записывается один раз и дальше берется из файла
+                self.delimiter = delimiter or DEFAULT_DELIMITER
+                with self.connection:
+                    self.connection.executemany("INSERT INTO meta VALUES (?, ?)", [
+                        ('schema', SCHEMA_VERSION), ('delimiter', self.delimiter)])
+            self.paths = {0: None}
+            for path_id, path in self.connection.execute("SELECT id, path FROM paths"):
+                self.paths[path_id] = path
+            self.path_ids = {path: path_id for path_id, path in self.paths.items() if path_id}
+        except BaseException:
+            self.connection.close()
+            raise
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def path_id(self, path):
+        """Номер пути; новый путь добавляется в таблицу путей"""
+        path_id = self.path_ids.get(path)
+        if path_id is None:
+            path_id = self.connection.execute("INSERT INTO paths (path) VALUES (?)", (path,)).lastrowid
+            self.path_ids[path] = path_id
+            self.paths[path_id] = path
+        return path_id
+
+    def split(self, key_id):
+        """(номер пути, хэш строки, строка); key_id без разделителя хранится целиком с путем 0"""
+        path, separator, line = key_id.partition(self.delimiter)
+        if not separator:
+            path_id, line = 0, key_id
+        else:
+            path_id = self.path_id(path)
+        return path_id, _signed(hash64(line)), line
+
+    def read(self):
+        """Все отметки в формате файла прогресса: key_id -> статус"""
+        prefixes = {path_id: f"{path}{self.delimiter}" for path_id, path in self.paths.items() if path_id}
+        prefixes[0] = ''
+        names = STATUS_NAMES
+        rows = self.connection.execute("SELECT path_id, status, line FROM marks").fetchall()
+        return {prefixes[path_id] + line: names[status] if type(status) is int else json.loads(status)
+                for path_id, status, line in rows}
+
+    def update(self, changes):
+        """Применяет изменения (key_id, статус) одной транзакцией; статус None удаляет отметку.
+
+        Возвращает число измененных записей.
+        """
+        upserts = []
+        deletes = []
+        with self.connection:
+            for key_id, status in changes:
+                path_id, line_hash, line = self.split(key_id)
+                if status is None:
+                    deletes.append((path_id, line_hash, line))
+                else:
+                    upserts.append((path_id, line_hash, encode_status(status), line))
+            self.connection.executemany("INSERT OR REPLACE INTO marks VALUES (?, ?, ?, ?)", upserts)
+            self.connection.executemany("DELETE FROM marks WHERE path_id = ? AND hash = ? AND line = ?", deletes)
+        return len(upserts) + len(deletes)
+
+    def vacuum(self):
+        """Пересобирает файл без пустых страниц (после массовой записи)"""
+        self.connection.execute("VACUUM")
@@ -0,0 +1,502 @@
+# progress_store.py
+import os
+import json
+import time
+import shutil
+import tempfile
+import threading
+
+from profiling import metrics, timed
+from file_watch import file_stamp
+from progress_db import ProgressDatabase, is_compact_path, STATUS_CODES, STATUS_NAMES
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# Сколько предыдущих снимков прогресса хранить (file.bak1 - самый свежий)
+BACKUP_COUNT = 3
+# Сколько секунд ждать блокировку файла прогресса, занятую другим процессом
+LOCK_TIMEOUT = 30
+LOCK_RETRY_DELAY = 0.05
+
+# Блокировки внутри процесса: по одной на файл прогресса
+_process_locks = {}
+_process_locks_guard = threading.Lock()
+_compaction_thread = None
+
+def get_journal_path(file_path):
+    """Возвращает путь к журналу изменений файла прогресса"""
+    return f"{file_path}.journal"
+
+def get_rotated_journal_path(file_path):
+    """Возвращает путь к журналу, который сейчас сжимается в снимок"""
+    return f"{file_path}.journal.old"
+
+def get_lock_path(file_path):
+    """Возвращает путь к файлу блокировки прогресса"""
+    return f"{file_path}.lock"
+
+def get_backup_path(file_path, number):
+    """Возвращает путь к резервной копии снимка (1 - самая свежая)"""
+    return f"{file_path}.bak{number}"
+
+class ProgressLock:
+    """Рекомендательная блокировка файла прогресса.
+
+    Между процессами - блокировка файла <прогресс>.lock (flock, на Windows -
+    msvcrt.locking), внутри процесса - обычная блокировка потоков.
+    """
+
+    def __init__(self, file_path, timeout=LOCK_TIMEOUT):
+        self.lock_path = get_lock_path(file_path)
+        self.timeout = timeout
+        self.fd = None
+        with _process_locks_guard:
+            key = os.path.abspath(self.lock_path)
+            self.thread_lock = _process_locks.setdefault(key, threading.Lock())
+
+    def acquire(self):
+        if not self.thread_lock.acquire(timeout=self.timeout):
+            raise TimeoutError(f"Файл прогресса занят: {self.lock_path}")
+        try:
+            self.fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o666)
+            deadline = time.monotonic() + self.timeout
+            while not self._try_lock():
+                if time.monotonic() >= deadline:
+                    raise TimeoutError(f"Файл прогресса занят другим процессом: {self.lock_path}")
+                time.sleep(LOCK_RETRY_DELAY)
+        except BaseException:
+            self._close()
+            self.thread_lock.release()
+            raise
+        return self
+
+    def _try_lock(self):
+        try:
+            if fcntl is not None:
+                fcntl.flock(self.fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                os.lseek(self.fd, 0, os.SEEK_SET)
+                msvcrt.locking(self.fd, msvcrt.LK_NBLCK, 1)
+            return True
+        except OSError:
+            return False
+
+    def _close(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+    def release(self):
+        try:
+            if fcntl is not None:
+                fcntl.flock(self.fd, fcntl.LOCK_UN)
+            else:
+                os.lseek(self.fd, 0, os.SEEK_SET)
+                msvcrt.locking(self.fd, msvcrt.LK_UNLCK, 1)
+        finally:
+            self._close()
+            self.thread_lock.release()
+
+    def __enter__(self):
+        return self.acquire()
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+def replay_journal(journal_path, checklist):
+    """Применяет записи журнала к чеклисту, возвращает число примененных записей"""
+    if not os.path.exists(journal_path):
+        return 0
+
+    applied = 0
+    with open(journal_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                key_id, status = json.loads(line)
+            except (ValueError, TypeError):
+                # Оборванная или чужая запись: пропускаем только ее, следующие записи целы
+                continue
+            checklist[key_id] = status
+            applied += 1
+    return applied
+
+def read_snapshot(file_path):
+    """Читает снимок прогресса; при поврежденном или пропавшем файле - последнюю целую копию"""
+    if is_compact_path(file_path):
+        return _read_compact(file_path)
+    candidates = [file_path] + [get_backup_path(file_path, n) for n in range(1, BACKUP_COUNT + 1)]
+    for number, path in enumerate(candidates):
+        if not os.path.exists(path):
+            continue
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                checklist = json.load(f)
+            if not isinstance(checklist, dict):
+                raise ValueError("ожидался объект JSON")
+        except Exception as e:
+            print(f"[!] Ошибка загрузки файла прогресса {path}: {e}")
+            continue
+        if number:
+            print(f"[!] Прогресс восстановлен из резервной копии: {path}")
+        return checklist
+    return {}
+
+def _read_compact(file_path):
+    """Читает компактный файл прогресса (SQLite); резервные копии не нужны - запись транзакционная"""
+    if not os.path.exists(file_path):
+        return {}
+    try:
+        with ProgressDatabase(file_path) as db:
+            return db.read()
+    except Exception as e:
+        print(f"[!] Ошибка загрузки файла прогресса {file_path}: {e}")
+        return {}
+
+def _read_checklist(file_path):
+    checklist = read_snapshot(file_path)
+    try:
+        replay_journal(get_rotated_journal_path(file_path), checklist)
+        replay_journal(get_journal_path(file_path), checklist)
+    except Exception as e:
+        print(f"[!] Ошибка чтения журнала прогресса: {e}")
+    return checklist
+
+@timed('load_checklist')
+def load_checklist(file_path):
+    """Загружает прогресс из снимка и доигрывает журнал изменений.
+
+    Чтение идет под блокировкой, чтобы не застать снимок и журнал посреди сжатия.
+    """
+    try:
+        lock = ProgressLock(file_path).acquire()
+    except OSError as e:
+        # Нет прав на создание файла блокировки - читаем как есть
+        print(f"[!] Файл прогресса читается без блокировки: {e}")
+        return _read_checklist(file_path)
+    try:
+        return _read_checklist(file_path)
+    finally:
+        lock.release()
+
+def _line_break_needed(journal_path):
+    """Перевод строки, если журнал оборвался на середине записи (после сбоя), иначе ''"""
+    try:
+        with open(journal_path, 'rb') as f:
+            f.seek(0, os.SEEK_END)
+            if f.tell() == 0:
+                return ''
+            f.seek(-1, os.SEEK_END)
+            return '' if f.read(1) == b'\n' else '\n'
+    except FileNotFoundError:
+        return ''
+
+def append_journal(file_path, key_id, status):
+    """Дописывает одно изменение в журнал и сбрасывает его на диск"""
+    return append_journal_batch(file_path, [(key_id, status)])
+
+def append_journal_batch(file_path, entries, on_write=None):
+    """Дописывает пачку изменений (key_id, статус) в журнал одной записью на диск.
+
+    Компактный файл журнала не ведет: изменения сразу пишутся в него одной транзакцией.
+    on_write(путь, размер и время до записи, после записи) вызывается под блокировкой,
+    чтобы слежение за файлами могло отличить свою запись от чужой.
+    """
+    try:
+        if is_compact_path(file_path):
+            with ProgressLock(file_path):
+                before = file_stamp(file_path)
+                with ProgressDatabase(file_path) as db:
+                    metrics.count('progress_rows_written', db.update(entries))
+                if on_write is not None:
+                    on_write(file_path, before, file_stamp(file_path))
+            return True
+        data = ''.join(json.dumps([key_id, status], ensure_ascii=False) + '\n'
+                       for key_id, status in entries)
+        with ProgressLock(file_path):
+            journal_path = get_journal_path(file_path)
+            before = file_stamp(journal_path)
+            # Новые записи не должны склеиться с оборванной последней строкой
+            data = _line_break_needed(journal_path) + data
+            with open(journal_path, 'a', encoding='utf-8') as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            if on_write is not None:
+                on_write(journal_path, before, file_stamp(journal_path))
+        if metrics.enabled:
+            metrics.count('journal_bytes_written', len(data.encode('utf-8')))
+        return True
+    except Exception as e:
+        print(f"[!] Ошибка записи журнала прогресса: {e}")
+        return False
+
+def diff_entries(old, new):
+    """Изменения между двумя состояниями прогресса: key_id -> новый статус (None - отметка удалена)"""
+    changes = {key_id: status for key_id, status in new.items() if old.get(key_id) != status}
+    for key_id in old:
+        if key_id not in new:
+            changes[key_id] = None
+    return changes
+
+def merge_entries(base, local, current):
+    """Трехстороннее слияние прогресса.
+
+    base - состояние файла при загрузке, local - состояние в памяти,
+    current - то, что сейчас на диске. Берутся изменения, внесенные на диске
+    другими процессами; ключи, измененные у себя, остаются своими.
+    """
+    merged = dict(current)
+    for key_id, status in diff_entries(base, local).items():
+        if status is None:
+            merged.pop(key_id, None)
+        else:
+            merged[key_id] = status
+    return merged
+
+def _merge_from_disk(file_path, checklist, base):
+    """Подмешивает в checklist (на месте) изменения, сделанные на диске после base.
+
+    Вызывается под блокировкой файла прогресса.
+    """
+    merged = merge_entries(base, checklist, _read_checklist(file_path))
+    checklist.clear()
+    checklist.update(merged)
+
+def rotate_journal(file_path):
+    """Переименовывает текущий журнал, чтобы новые записи шли в свежий файл.
+
+    Вызывается под блокировкой файла прогресса.
+    """
+    journal_path = get_journal_path(file_path)
+    rotated_path = get_rotated_journal_path(file_path)
+    if not os.path.exists(journal_path):
+        return
+    if os.path.exists(rotated_path):
+        # Предыдущее сжатие не завершилось - объединяем журналы
+        with open(journal_path, 'r', encoding='utf-8') as src, \
+                open(rotated_path, 'a', encoding='utf-8') as dst:
+            dst.write(_line_break_needed(rotated_path) + src.read())
+            dst.flush()
+            os.fsync(dst.fileno())
+        os.remove(journal_path)
+    else:
+        os.replace(journal_path, rotated_path)
+
+def _fsync_directory(file_path):
+    """Сбрасывает на диск запись каталога (переименование файла); на Windows не нужно"""
+    if os.name == 'nt':
+        return
+    fd = os.open(os.path.dirname(os.path.abspath(file_path)), os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+def rotate_backups(file_path):
+    """Сдвигает резервные копии и копирует текущий снимок в file.bak1.
+
+    Текущий файл остается на месте, чтобы он не пропадал ни на мгновение.
+    """
+    if not os.path.exists(file_path):
+        return
+    for number in range(BACKUP_COUNT - 1, 0, -1):
+        older = get_backup_path(file_path, number)
+        if os.path.exists(older):
+            os.replace(older, get_backup_path(file_path, number + 1))
+    backup_path = get_backup_path(file_path, 1)
+    try:
+        os.link(file_path, backup_path)
+    except OSError:
+        # Файловая система без жестких ссылок (например, сетевой диск)
+        shutil.copy2(file_path, backup_path)
+
+def _write_temp_snapshot(file_path, checklist):
+    """Пишет снимок во временный файл рядом с файлом прогресса и сбрасывает его на диск.
+
+    Имя временного файла уникально, поэтому одновременные записи не портят друг друга.
+    Возвращает путь к временному файлу.
+    """
+    directory, name = os.path.split(os.path.abspath(file_path))
+    fd, tmp_path = tempfile.mkstemp(prefix=f"{name}.", suffix='.tmp', dir=directory)
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(checklist, f, ensure_ascii=False, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+            metrics.count('progress_bytes_written', f.tell())
+        if os.path.exists(file_path):
+            shutil.copymode(file_path, tmp_path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    return tmp_path
+
+def _replace_snapshot(file_path, tmp_path):
+    """Атомарно подменяет снимок записанным временным файлом и удаляет сжатый журнал.
+
+    Вызывается под блокировкой файла прогресса.
+    """
+    rotate_backups(file_path)
+    os.replace(tmp_path, file_path)
+    _fsync_directory(file_path)
+
+    rotated_path = get_rotated_journal_path(file_path)
+    if os.path.exists(rotated_path):
+        os.remove(rotated_path)
+
+def _file_state(file_path):
+    """Размер, время изменения и inode файла (None, если файла нет)"""
+    try:
+        stat = os.stat(file_path)
+    except FileNotFoundError:
+        return None
+    return stat.st_size, stat.st_mtime_ns, stat.st_ino
+
+def _snapshot_state(file_path):
+    """Состояние снимка и сжимаемого журнала: по нему видно, сохранял ли прогресс кто-то еще"""
+    return _file_state(file_path), _file_state(get_rotated_journal_path(file_path))
+
+@timed('write_snapshot')
+def write_snapshot(file_path, checklist):
+    """Записывает полный снимок прогресса и удаляет сжатый журнал.
+
+    Снимок пишется во временный файл, сбрасывается на диск и атомарно заменяет
+    старый, поэтому сбой посреди записи не портит прогресс. Вызывается под
+    блокировкой файла прогресса.
+    """
+    _replace_snapshot(file_path, _write_temp_snapshot(file_path, checklist))
+
+def _compact(file_path, checklist, state):
+    """Фоновое сжатие журнала в снимок.
+
+    Снимок пишется без блокировки, поэтому отметки тем временем спокойно дописываются
+    в новый журнал. Блокировка берется снова только для подмены файла; если за это время
+    прогресс сохранил кто-то еще (снимок или сжимаемый журнал изменились), его снимок
+    уже включает наш журнал и свежее нашего - наш просто выбрасывается.
+    """
+    try:
+        tmp_path = _write_temp_snapshot(file_path, checklist)
+        with ProgressLock(file_path):
+            if _snapshot_state(file_path) == state:
+                _replace_snapshot(file_path, tmp_path)
+                return
+        os.remove(tmp_path)
+    except Exception as e:
+        print(f"[!] Ошибка сохранения файла прогресса: {e}")
+
+def _save_compact(file_path, checklist, base=None):
+    """Сохраняет прогресс в компактный файл: пишутся только отличия от того, что уже на диске"""
+    with ProgressLock(file_path):
+        current = _read_checklist(file_path)
+        if base is not None:
+            merged = merge_entries(base, checklist, current)
+            checklist.clear()
+            checklist.update(merged)
+        with ProgressDatabase(file_path) as db:
+            metrics.count('progress_rows_written', db.update(diff_entries(current, checklist).items()))
+
+def wait_for_compaction():
+    """Дожидается завершения фонового сжатия, если оно идет"""
+    global _compaction_thread
+    if _compaction_thread is not None:
+        _compaction_thread.join()
+        _compaction_thread = None
+
+def start_compaction(file_path, checklist, base=None):
+    """Запускает сжатие журнала в снимок в фоновом потоке.
+
+    Если указан base (состояние файла при загрузке), checklist на месте
+    дополняется изменениями других процессов, см. save_checklist.
+    Блокировка держится только на время переименования журнала и слияния,
+    снимок пишется в фоновом потоке без нее.
+    """
+    global _compaction_thread
+    if is_compact_path(file_path):
+        # Журнала нет, сжимать нечего: отметки уже в файле, дописываются только отличия
+        return save_checklist(file_path, checklist, base)
+    wait_for_compaction()
+    try:
+        with ProgressLock(file_path):
+            rotate_journal(file_path)
+            if base is not None:
+                _merge_from_disk(file_path, checklist, base)
+            snapshot = dict(checklist)
+            state = _snapshot_state(file_path)
+    except Exception as e:
+        print(f"[!] Ошибка сохранения файла прогресса: {e}")
+        return False
+
+    _compaction_thread = threading.Thread(target=_compact, args=(file_path, snapshot, state))
+    _compaction_thread.start()
+    return True
+
+@timed('save_checklist')
+def save_checklist(file_path, checklist, base=None):
+    """Сохраняет прогресс в файл (сжимает журнал в снимок).
+
+    Если указан base (состояние файла при загрузке), перед записью checklist
+    на месте дополняется изменениями, которые за это время сделали другие
+    процессы (например, update_progress.py), вместо того чтобы затереть их.
+    """
+    wait_for_compaction()
+    try:
+        if is_compact_path(file_path):
+            _save_compact(file_path, checklist, base)
+            return True
+        with ProgressLock(file_path):
+            rotate_journal(file_path)
+            if base is not None:
+                # Под блокировкой никто не пишет: на диске последняя запись каждого ключа
+                _merge_from_disk(file_path, checklist, base)
+            write_snapshot(file_path, checklist)
+        return True
+    except Exception as e:
+        print(f"[!] Ошибка сохранения файла прогресса: {e}")
+        return False
+
+class Checklist:
+    """Отметки прогресса, привязанные к номерам ключей таблицы.
+
+    Статус каждого ключа занимает один байт; записи, которых нет в
+    таблице ключей, хранятся как есть и сохраняются без изменений.
+    """
+    __slots__ = ('table', 'statuses', 'extra')
+
+    def __init__(self, table, entries=None):
+        self.table = table
+        self.statuses = bytearray(len(table))
+        self.extra = {}
+        for key_id, status in (entries or {}).items():
+            handle = table.find_id(key_id)
+            code = STATUS_CODES.get(status)
+            if handle is None or code is None:
+                self.extra[key_id] = status
+            else:
+                self.statuses[handle] = code
+
+    def get(self, handle, default=None):
+        """Возвращает статус ключа по номеру"""
+        code = self.statuses[handle]
+        return STATUS_NAMES[code] if code else default
+
+    def set(self, handle, status):
+        """Устанавливает статус ключа по номеру"""
+        self.statuses[handle] = STATUS_CODES[status]
+
+    def clear(self, handle):
+        """Удаляет отметку ключа"""
+        self.statuses[handle] = 0
+
+    def to_dict(self):
+        """Возвращает чеклист в формате файла прогресса"""
+        entries = {}
+        key_id = self.table.key_id
+        for handle, code in enumerate(self.statuses):
+            if code:
+                entries[key_id(handle)] = STATUS_NAMES[code]
+        entries.update(self.extra)
+        return entries
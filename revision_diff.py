@@ -0,0 +1,259 @@
+# revision_diff.py
+import os
+import sys
+import csv
+import json
+import subprocess
+from collections import OrderedDict
+
+from locale_index import (
+    KeyTable, iter_buffer_records, load_section_digests, load_section_records,
+    mark_target_keys, get_untranslated_keys
+)
+from fluent_match import FluentMatcher, FileState, line_identity, normalize_path
+from source_hashes import hash64
+from key_filter import compile_filter, resolve_filter, load_presets
+from progress_store import load_checklist, Checklist
+from profiling import timed
+
+# Виды изменений ключа между ревизиями
+CHANGE_KINDS = OrderedDict([
+    ('new', "новый"),
+    ('changed', "изменен"),
+])
+
+def group_sections(records, paths=None):
+    """Группирует записи (путь, ключ) по путям; с paths - только эти пути"""
+    sections = OrderedDict()
+    for path, key in records:
+        if paths is not None and path not in paths:
+            continue
+        keys = sections.get(path)
+        if keys is None:
+            keys = sections[path] = []
+        keys.append(key)
+    return sections
+
+def dump_sections(old_file, new_file, delimiter, use_cache=True):
+    """Секции двух дампов, которые различаются.
+
+    Сначала сравниваются контрольные суммы секций из кэша индекса, и только
+    ключи изменившихся путей читаются из кэша и попадают в память.
+    Возвращает (старые секции, новые секции): словари путь -> список ключей.
+    """
+    old_digests = load_section_digests(old_file, delimiter, use_cache)
+    new_digests = load_section_digests(new_file, delimiter, use_cache)
+    changed = {path for path in set(old_digests) | set(new_digests)
+               if old_digests.get(path) != new_digests.get(path)}
+    if not changed:
+        return OrderedDict(), OrderedDict()
+    wanted = changed.__contains__
+    return (group_sections(load_section_records(old_file, delimiter, wanted, use_cache)),
+            group_sections(load_section_records(new_file, delimiter, wanted, use_cache)))
+
+def load_target_sections(target_file, paths, delimiter, use_cache=True):
+    """Записи целевого файла только для путей изменения (с точностью до папки языка)"""
+    norm_paths = {normalize_path(path) for path in paths}
+    return load_section_records(target_file, delimiter,
+                                lambda path: normalize_path(path) in norm_paths, use_cache)
+
+def run_git(repo, args, data=None):
+    """Выполняет команду git в репозитории и возвращает ее вывод (bytes)"""
+    result = subprocess.run(['git', '-C', repo] + args, input=data,
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if result.returncode:
+        message = result.stderr.decode('utf-8', 'replace').strip()
+        raise ValueError(f"git {args[0]}: {message}")
+    return result.stdout
+
+def read_git_blobs(repo, revision, paths):
+    """Содержимое файлов в ревизии одним вызовом git cat-file; пропавшие файлы - None"""
+    output = run_git(repo, ['cat-file', '--batch'],
+                     ''.join(f"{revision}:{path}\n" for path in paths).encode('utf-8'))
+    blobs = {}
+    pos = 0
+    for path in paths:
+        end = output.index(b'\n', pos)
+        header = output[pos:end].split()
+        pos = end + 1
+        if len(header) < 3 or header[1] != b'blob':
+            blobs[path] = None  # missing: файла нет в этой ревизии
+            continue
+        size = int(header[2])
+        blobs[path] = output[pos:pos + size]
+        pos += size + 1
+    return blobs
+
+def blob_keys(blob, dump_path, delimiter):
+    """Строки файла .ftl так, как они попали бы в дамп"""
+    text = blob.decode('utf-8-sig', 'replace')
+    buffer = ''.join(f"{dump_path}{delimiter}{line}\n" for line in text.splitlines()).encode('utf-8')
+    return [key for _, key in iter_buffer_records(buffer, delimiter)]
+
+def git_sections(repo, old_revision, new_revision, delimiter, root='Resources', locale='en-US'):
+    """Секции файлов .ftl исходного языка, изменившихся между двумя ревизиями.
+
+    Список файлов берется из git diff, читаются только они. Путь в дампе -
+    путь файла относительно root с ведущим '/' (Resources/Locale/en-US/x.ftl -> /Locale/en-US/x.ftl).
+    """
+    root = root.strip('/')
+    folder = '/'.join(part for part in (root, 'Locale', locale) if part)
+    output = run_git(repo, ['diff', '--name-only', '-z', '--no-renames', old_revision, new_revision,
+                            '--', folder])
+    paths = [path for path in output.decode('utf-8').split('\0') if path.endswith('.ftl')]
+
+    sections = []
+    for revision in (old_revision, new_revision):
+        blobs = read_git_blobs(repo, revision, paths) if paths else {}
+        revision_sections = OrderedDict()
+        for path in paths:
+            if blobs[path] is not None:
+                dump_path = '/' + (path[len(root) + 1:] if root else path)
+                revision_sections[dump_path] = blob_keys(blobs[path], dump_path, delimiter)
+        sections.append(revision_sections)
+    return sections[0], sections[1]
+
+def section_identities(path, keys):
+    """Идентичности строк секции (см. fluent_match.line_identity)"""
+    state = FileState()
+    norm_path = normalize_path(path)
+    return [line_identity(state, norm_path, key) for key in keys]
+
+@timed('key_delta')
+def key_delta(old_sections, new_sections):
+    """Разница ключей изменившихся секций через множества хэшей строк.
+
+    Новый ключ - строка, которой не было в старой секции; если ее сообщение
+    (id или атрибут) в старой секции было - ключ изменен.
+    Возвращает (записи новых секций, словарь запись -> вид изменения, число удаленных строк).
+    """
+    records = []
+    kinds = {}
+    removed = 0
+    for path, keys in new_sections.items():
+        old_keys = old_sections.get(path, ())
+        old_hashes = {hash64(key) for key in old_keys}
+        old_identities = set(section_identities(path, old_keys))
+        new_hashes = set()
+        for key, identity in zip(keys, section_identities(path, keys)):
+            records.append((path, key))
+            key_hash = hash64(key)
+            new_hashes.add(key_hash)
+            if key_hash not in old_hashes:
+                kinds[(path, key)] = 'changed' if identity in old_identities else 'new'
+        removed += len(old_hashes - new_hashes)
+    for path, keys in old_sections.items():
+        if path not in new_sections:
+            removed += len({hash64(key) for key in keys})
+    return records, kinds, removed
+
+def untranslated_delta(records, kinds, target_records, checklist_entries, delimiter,
+                       key_filter=None, fluent=True):
+    """Непереведенные ключи среди новых и измененных.
+
+    Таблица ключей строится только из изменившихся секций, поэтому сопоставление
+    с целевым файлом и прогрессом стоит пропорционально размеру изменения.
+    Возвращает (таблица, список (номер ключа, вид изменения), итоги).
+    """
+    table = KeyTable(delimiter, records)
+    paths = set(table.paths)
+    matcher = FluentMatcher(table) if fluent else None
+    flags = mark_target_keys(table, target_records, paths=paths, matcher=matcher)
+    checklist = Checklist(table, checklist_entries)
+    untranslated, _, _ = get_untranslated_keys(table, flags, checklist, key_filter)
+
+    handle_kinds = {}
+    for (path, key), kind in kinds.items():
+        handle_kinds[table.find(path, key)] = kind
+    keys = [(handle, handle_kinds[handle]) for handle in untranslated if handle in handle_kinds]
+
+    summary = OrderedDict([('paths', len(paths))])
+    for kind in CHANGE_KINDS:
+        summary[kind] = sum(1 for value in handle_kinds.values() if value == kind)
+    for kind in CHANGE_KINDS:
+        summary[f"untranslated_{kind}"] = sum(1 for _, value in keys if value == kind)
+    return table, keys, summary
+
+def write_delta(stream, fmt, table, keys, summary, width=100):
+    """Выводит непереведенные ключи изменения: text, json, jsonl или csv"""
+    entries = [{'path': table.path_of(handle), 'key': table.keys[handle], 'change': kind}
+               for handle, kind in keys]
+    if fmt == 'json':
+        json.dump({'keys': entries, 'summary': summary}, stream, ensure_ascii=False)
+        stream.write('\n')
+    elif fmt == 'jsonl':
+        for entry in entries:
+            stream.write(json.dumps(dict(entry, type='key'), ensure_ascii=False) + '\n')
+        stream.write(json.dumps(dict(summary, type='summary'), ensure_ascii=False) + '\n')
+    elif fmt == 'csv':
+        writer = csv.writer(stream)
+        writer.writerow(['record', 'path', 'key', 'change'])
+        for entry in entries:
+            writer.writerow(['key', entry['path'], entry['key'], entry['change']])
+        for name, value in summary.items():
+            writer.writerow(['summary', '', name, value])
+    else:
+        last_path = None
+        for entry in entries:
+            if entry['path'] != last_path:
+                last_path = entry['path']
+                stream.write(f"\n{last_path}\n")
+            line = f"  [{'+' if entry['change'] == 'new' else '~'}] {entry['key']}"
+            if len(line) > width:
+                line = line[:width - 1] + '…'
+            stream.write(line + '\n')
+        stream.write('\n' + '═' * min(width, 60) + '\n')
+        stream.write(f"Изменившихся путей: {summary['paths']}, удалено строк: {summary['removed']}\n")
+        for kind, title in (('new', "Новых ключей"), ('changed', "Измененных ключей")):
+            stream.write(f"{title}: {summary[kind]}, из них не переведено: {summary['untranslated_' + kind]}\n")
+
+def run_diff(args):
+    """Ключи, появившиеся или изменившиеся между двумя дампами или ревизиями git,
+    которые еще не переведены; код выхода как у --report"""
+    from headless_report import EXIT_OK, EXIT_REGRESSION, EXIT_ERROR
+
+    required = [args.target] + ([args.diff, args.original] if args.diff else [])
+    missing = [f for f in required if not os.path.exists(f)]
+    if missing:
+        for f in missing:
+            print(f"[X] ФАЙЛ НЕ НАЙДЕН: {f}", file=sys.stderr)
+        return EXIT_ERROR
+
+    try:
+        key_filter = compile_filter(resolve_filter(load_presets(args.presets), args.filter))
+    except ValueError as e:
+        print(f"[X] Ошибка в фильтре: {e}", file=sys.stderr)
+        return EXIT_ERROR
+
+    use_cache = not args.no_cache
+    try:
+        if args.diff:
+            old_sections, new_sections = dump_sections(args.diff, args.original, args.delimiter, use_cache)
+        else:
+            old_revision, new_revision = (args.git_diff + ['HEAD'])[:2]
+            old_sections, new_sections = git_sections(args.git_repo, old_revision, new_revision,
+                                                      args.delimiter, args.git_root, args.git_locale)
+    except (OSError, ValueError) as e:
+        print(f"[X] Не удалось сравнить ревизии: {e}", file=sys.stderr)
+        return EXIT_ERROR
+
+    records, kinds, removed = key_delta(old_sections, new_sections)
+    target_records = load_target_sections(args.target, new_sections, args.delimiter, use_cache)
+    table, keys, summary = untranslated_delta(records, kinds, target_records, load_checklist(args.progress),
+                                              args.delimiter, key_filter, not args.exact_match)
+    summary['paths'] = len(set(old_sections) | set(new_sections))
+    summary['removed'] = removed
+
+    fmt = args.report or 'text'
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8', newline='') as stream:
+            write_delta(stream, fmt, table, keys, summary)
+    else:
+        write_delta(sys.stdout, fmt, table, keys, summary)
+
+    untranslated = len(keys)
+    if args.max_untranslated is not None and untranslated > args.max_untranslated:
+        print(f"[X] Непереведенных новых и измененных ключей: {untranslated} "
+              f"(допустимо не больше {args.max_untranslated})", file=sys.stderr)
+        return EXIT_REGRESSION
+    return EXIT_OK
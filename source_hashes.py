@@ -0,0 +1,115 @@
+# source_hashes.py
+import os
+import struct
+import hashlib
+from array import array
+from bisect import bisect_left
+
+# Формат файла снимка исходных текстов: заголовок, затем два массива по 8 байт на сообщение
+SOURCES_MAGIC = b'LCSRC1\n'
+
+def get_sources_path(progress_file):
+    """Возвращает путь к снимку хэшей исходных текстов рядом с файлом прогресса"""
+    return f"{progress_file}.sources"
+
+def hash64(*parts):
+    """64-битный хэш строк (blake2b)"""
+    hasher = hashlib.blake2b(digest_size=8)
+    for part in parts:
+        hasher.update(part.encode('utf-8'))
+        hasher.update(b'\0')
+    return int.from_bytes(hasher.digest(), 'little')
+
+def compute_source_hashes(table, identities):
+    """Считает хэши исходного текста по сообщениям.
+
+    identities - идентичности ключей (см. fluent_match.line_identity).
+    Возвращает (массив хэшей идентичности по номерам ключей,
+    словарь хэш идентичности -> хэш текста всех строк сообщения или атрибута).
+    """
+    key_hashes = array('Q')
+    hashers = {}
+    known = {}
+    for handle, identity in enumerate(identities):
+        ident = known.get(identity)
+        if ident is None:
+            path, message, attribute = identity
+            ident = known[identity] = hash64(path, message or '', attribute or '')
+        key_hashes.append(ident)
+        hasher = hashers.get(ident)
+        if hasher is None:
+            hasher = hashers[ident] = hashlib.blake2b(digest_size=8)
+        hasher.update(table.keys[handle].strip().encode('utf-8'))
+        hasher.update(b'\n')
+    contents = {ident: int.from_bytes(hasher.digest(), 'little') for ident, hasher in hashers.items()}
+    return key_hashes, contents
+
+class SourceSnapshot:
+    """Хэши исходных текстов с прошлого сохранения: отсортированные массивы для бинарного поиска"""
+    __slots__ = ('idents', 'contents')
+
+    def __init__(self, mapping=None):
+        self.idents = array('Q', sorted(mapping or ()))
+        self.contents = array('Q', (mapping[ident] for ident in self.idents))
+
+    def __len__(self):
+        return len(self.idents)
+
+    def get(self, ident):
+        pos = bisect_left(self.idents, ident)
+        if pos < len(self.idents) and self.idents[pos] == ident:
+            return self.contents[pos]
+        return None
+
+def load_sources(file_path):
+    """Загружает снимок хэшей; None, если файла нет или он поврежден"""
+    if not os.path.exists(file_path):
+        return None
+    try:
+        with open(file_path, 'rb') as f:
+            if f.read(len(SOURCES_MAGIC)) != SOURCES_MAGIC:
+                return None
+            count, = struct.unpack('<Q', f.read(8))
+            snapshot = SourceSnapshot()
+            snapshot.idents.fromfile(f, count)
+            snapshot.contents.fromfile(f, count)
+        return snapshot
+    except Exception as e:
+        print(f"[!] Ошибка чтения снимка исходных текстов: {e}")
+        return None
+
+def write_sources(file_path, mapping):
+    """Записывает снимок хэшей (словарь хэш идентичности -> хэш текста)"""
+    snapshot = SourceSnapshot(mapping)
+    try:
+        tmp_path = f"{file_path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(SOURCES_MAGIC)
+            f.write(struct.pack('<Q', len(snapshot)))
+            snapshot.idents.tofile(f)
+            snapshot.contents.tofile(f)
+        os.replace(tmp_path, file_path)
+        return True
+    except Exception as e:
+        print(f"[!] Ошибка записи снимка исходных текстов: {e}")
+        return False
+
+def diff_sources(key_hashes, contents, previous):
+    """Сравнивает текущие хэши с прошлым снимком.
+
+    Возвращает (множество хэшей изменившихся сообщений, множество хэшей новых сообщений,
+    число удаленных сообщений). Без прошлого снимка ничего не считается изменившимся.
+    """
+    changed = set()
+    added = set()
+    if previous is None:
+        return changed, added, 0
+
+    for ident, content in contents.items():
+        old = previous.get(ident)
+        if old is None:
+            added.add(ident)
+        elif old != content:
+            changed.add(ident)
+    removed = len(previous) - (len(contents) - len(added))
+    return changed, added, removed
@@ -0,0 +1,200 @@
+# stream_report.py
+import heapq
+from array import array
+from bisect import bisect_left
+
+from locale_index import iter_file_records
+from source_hashes import hash64
+from fluent_match import FileState, line_identity, normalize_path
+from key_filter import FilterContext
+from path_coverage import PathCoverage, coverage_entry
+from headless_report import ReportWriter
+
+# Сколько хэшей сортируется за раз: больше в памяти как объекты Python не бывает
+SORT_CHUNK = 1 << 16
+
+def identity_hash(identity):
+    """64-битный хэш идентичности строки (см. fluent_match.line_identity)"""
+    path, message, attribute = identity
+    return hash64(path, message or '', attribute or '')
+
+def sort_unique(values):
+    """Сортирует массив хэшей и убирает повторы без списка всех элементов в памяти.
+
+    Массив сортируется кусками по SORT_CHUNK на месте, затем куски сливаются в новый массив.
+    """
+    for start in range(0, len(values), SORT_CHUNK):
+        values[start:start + SORT_CHUNK] = array(values.typecode, sorted(values[start:start + SORT_CHUNK]))
+    result = array(values.typecode)
+    view = memoryview(values)
+    try:
+        runs = [view[start:start + SORT_CHUNK] for start in range(0, len(values), SORT_CHUNK)]
+        last = None
+        for value in heapq.merge(*runs):
+            if value != last:
+                result.append(value)
+                last = value
+    finally:
+        runs = None
+        view.release()
+    return result
+
+class HashIndex:
+    """Компактное множество: отсортированный массив 64-битных хэшей blake2b (8 байт на элемент)"""
+    __slots__ = ('hashes',)
+
+    def __init__(self, hashes):
+        self.hashes = sort_unique(hashes)
+
+    def __len__(self):
+        return len(self.hashes)
+
+    def __contains__(self, value):
+        pos = bisect_left(self.hashes, value)
+        return pos < len(self.hashes) and self.hashes[pos] == value
+
+def build_target_index(target_file, delimiter, fluent=True):
+    """Один потоковый проход по целевому файлу.
+
+    Возвращает (индекс точных строк, индекс идентичностей сообщений или None).
+    Хэши пишутся прямо в массивы, без промежуточных множеств.
+    """
+    exact = array('Q')
+    identities = array('Q') if fluent else None
+    states = {}
+    for path, key in iter_file_records(target_file, delimiter):
+        exact.append(hash64(path, key))
+        if fluent:
+            state = states.get(path)
+            if state is None:
+                state = states[path] = (FileState(), normalize_path(path))
+            identities.append(identity_hash(line_identity(state[0], state[1], key)))
+    return HashIndex(exact), HashIndex(identities) if fluent else None
+
+def find_split_paths(original_file, delimiter):
+    """Пути, строки которых встречаются в файле несколькими кусками (первый проход).
+
+    В памяти - только множества путей.
+    """
+    finished = set()
+    split = set()
+    current_path = None
+    for path, _ in iter_file_records(original_file, delimiter):
+        if path != current_path:
+            finished.add(current_path)
+            if path in finished:
+                split.add(path)
+            current_path = path
+    return split
+
+class _RecordView:
+    """Представляет одну текущую запись потока как таблицу ключей для фильтра (номер 0)"""
+    __slots__ = ('keys', 'path', 'status')
+
+    def __init__(self):
+        self.keys = ['']
+        self.path = ''
+        self.status = None
+
+    def path_of(self, handle):
+        return self.path
+
+    def get(self, handle, default=None):
+        return self.status or default
+
+class _PathTable:
+    """Минимальная таблица для PathCoverage: только список путей"""
+    __slots__ = ('paths',)
+
+    def __init__(self, paths):
+        self.paths = paths
+
+def stream_report(original_file, target_file, checklist, delimiter, key_filter, fmt, stream,
+                  fluent=True):
+    """Пишет отчет, не строя таблицу ключей исходного файла.
+
+    Исходный файл читается кусками, каждый ключ сразу проверяется по компактному
+    индексу целевого файла, непереведенные ключи выводятся по мере прохода.
+    В памяти остаются только индекс целевого файла и счетчики по путям.
+    Предварительный проход находит пути, которые встречаются в файле несколькими
+    кусками: повторы их строк отбрасываются по всему файлу, как в таблице ключей.
+    Возвращает (покрытие по путям, итоги).
+    """
+    exact_index, identity_index = build_target_index(target_file, delimiter, fluent)
+    split_paths = find_split_paths(original_file, delimiter)
+    writer = ReportWriter(stream, fmt)
+
+    view = _RecordView()
+    target_flag = bytearray(1)
+    ctx = FilterContext(view, target_flag, view)
+
+    # Повторы строки внутри пути отбрасываются, как в таблице ключей. Помним строки
+    # текущего куска пути, а для путей из нескольких кусков - все их строки
+    current_path = None
+    seen = set()
+    split_seen = {path: set() for path in split_paths}
+
+    path_ids = {}
+    paths = []
+    path_states = []
+    file_states = []
+    counts = []
+
+    for path, key in iter_file_records(original_file, delimiter):
+        if path is not current_path:
+            current_path = path
+            seen = split_seen.get(path)
+            if seen is None:
+                seen = set()
+        if key in seen:
+            continue
+        seen.add(key)
+
+        path_id = path_ids.get(path)
+        if path_id is None:
+            path_id = path_ids[path] = len(paths)
+            paths.append(path)
+            path_states.append(key_filter.root.path_state(path))
+            file_states.append((FileState(), normalize_path(path)))
+            counts.append([0, 0])
+
+        # Идентичность считается для всех строк, чтобы не потерять контекст сообщения
+        identity = line_identity(file_states[path_id][0], file_states[path_id][1], key) if fluent else None
+
+        state = path_states[path_id]
+        if state is False:
+            continue
+
+        in_target = (hash64(path, key) in exact_index
+                     or (fluent and identity_hash(identity) in identity_index))
+        status = checklist.get(f"{path}{delimiter}{key}")
+        if state is None:
+            view.keys[0] = key
+            view.path = path
+            view.status = status
+            target_flag[0] = in_target
+            if not key_filter.root.match(ctx, 0):
+                continue
+
+        if in_target or status == "V":
+            counts[path_id][0] += 1
+        else:
+            counts[path_id][1] += 1
+            writer.key(path, key)
+
+    table = _PathTable(paths)
+    coverage = PathCoverage(len(paths))
+    for path_id, (translated, untranslated) in enumerate(counts):
+        coverage.set(path_id, translated, untranslated)
+
+    rows = coverage.path_rows(table)
+    summary = coverage_entry(None, sum(row['translated'] for row in rows),
+                             sum(row['untranslated'] for row in rows))
+    del summary['path']
+    summary['paths'] = len(rows)
+
+    # Сравнение со снимком исходных текстов требует таблицы ключей - в потоковом режиме его нет
+    changes = {'stale': [], 'new': [], 'orphaned': []}
+    summary['stale'] = summary['new'] = summary['orphaned'] = summary['removed'] = 0
+    writer.finish(rows, coverage.directory_rows(table), summary, changes)
+    return rows, summary
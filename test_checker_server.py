@@ -0,0 +1,140 @@
+# test_checker_server.py
+import json
+import asyncio
+import unittest
+
+from checker_server import CheckerServer, ApiError
+from test_checker_session import SessionTestCase
+
+class ServerTestCase(SessionTestCase):
+    """Сервер над сеансом без запуска цикла событий"""
+
+    def setUp(self):
+        super().setUp()
+        self.session = self.open_session()
+        self.server = CheckerServer(self.session, port=0)
+
+    def tearDown(self):
+        self.server.executor.shutdown(wait=True)
+        super().tearDown()
+
+    def api(self, method, target, body=None):
+        data = json.dumps(body).encode('utf-8') if body is not None else b''
+        return self.server.dispatch(method, target, data)[1]
+
+    def api_error(self, method, target, body=None):
+        with self.assertRaises(ApiError) as raised:
+            self.api(method, target, body)
+        return raised.exception.status
+
+class ApiTest(ServerTestCase):
+
+    def keys(self, page):
+        return [entry['key'] for entry in page['keys']]
+
+    def test_list(self):
+        page = self.api('GET', '/api/untranslated?limit=2')
+        self.assertEqual(page['total'], 4)
+        self.assertEqual(self.keys(page), ["a-two = Two { $count }", "a-three = Three"])
+        page = self.api('GET', '/api/untranslated?offset=3')
+        self.assertEqual(self.keys(page), ["b-two = Bee two"])
+        self.assertEqual(self.api_error('GET', '/api/untranslated?offset=x'), 400)
+        self.assertEqual(self.api_error('GET', '/api/untranslated?filter=(a'), 400)
+
+    def test_toggle_and_status(self):
+        status = self.api('GET', '/api/status')
+        self.assertEqual((status['translated'], status['untranslated']), (1, 4))
+        handle = self.api('GET', '/api/untranslated')['keys'][0]['handle']
+        self.assertEqual(self.api('POST', '/api/toggle', {'handle': handle})['status'], "V")
+        status = self.api('GET', '/api/status')
+        self.assertEqual((status['translated'], status['untranslated']), (2, 3))
+        self.assertEqual(status['pending_journal'], 1)
+        key_id = self.session.table.key_id(handle)
+        self.assertEqual(self.api('POST', '/api/toggle', {'id': key_id})['status'], "X")
+        self.assertEqual(self.api_error('POST', '/api/toggle', {'handle': 100}), 404)
+        self.assertEqual(self.api_error('POST', '/api/toggle', {}), 400)
+
+    def test_mark(self):
+        result = self.api('POST', '/api/mark', {'select': 'path:/Locale/en-US/b.ftl'})
+        self.assertEqual(result, {'selected': 2, 'changed': 2})
+        self.assertEqual(self.api('GET', '/api/status')['untranslated'], 2)
+        # Номера без списка, по которому они считаются, не принимаются
+        self.assertEqual(self.api_error('POST', '/api/mark', {'select': '1-2'}), 400)
+        result = self.api('POST', '/api/mark', {'select': '2', 'filter': 'path:*/a.ftl', 'status': 'V'})
+        self.assertEqual(result, {'selected': 1, 'changed': 1})
+        self.assertEqual(self.session.key_status(self.session.table.find('/Locale/en-US/a.ftl', 'a-three = Three')),
+                         "V")
+        self.assertEqual(self.api_error('POST', '/api/mark', {'select': 'x', 'status': 'V'}), 400)
+        self.assertEqual(self.api_error('POST', '/api/mark', {'status': 'maybe', 'handles': []}), 400)
+
+    def test_filtered_list_follows_marks(self):
+        page = self.api('GET', '/api/untranslated?filter=path:*/b.ftl')
+        self.assertEqual(self.keys(page), ["b-one = Bee", "b-two = Bee two"])
+        handle = page['keys'][0]['handle']
+        self.api('POST', '/api/toggle', {'handle': handle})
+        page = self.api('GET', '/api/untranslated?filter=path:*/b.ftl')
+        self.assertEqual(page['keys'][0]['status'], "V")
+        self.api('POST', '/api/toggle', {'handle': handle})
+        self.api('POST', '/api/mark', {'handles': [page['keys'][1]['handle']]})
+        self.api('POST', '/api/mark', {'handles': [page['keys'][1]['handle']], 'status': 'X'})
+        page = self.api('GET', '/api/untranslated?filter=path:*/b.ftl')
+        self.assertEqual(self.keys(page), ["b-one = Bee", "b-two = Bee two"])
+        self.assertEqual(self.api('GET', '/api/untranslated?filter=status:V')['total'], 0)
+
+class HttpTest(ServerTestCase):
+    """Два клиента через настоящие соединения"""
+
+    async def request(self, connection, method, target, body=None, close=False):
+        reader, writer = connection
+        data = json.dumps(body).encode('utf-8') if body is not None else b''
+        headers = f"Content-Length: {len(data)}\r\n" + ("Connection: close\r\n" if close else "")
+        writer.write(f"{method} {target} HTTP/1.1\r\n{headers}\r\n".encode('latin-1') + data)
+        status = int((await reader.readline()).split()[1])
+        length = 0
+        while True:
+            line = await reader.readline()
+            if line == b'\r\n':
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            if name.lower() == 'content-length':
+                length = int(value)
+        return status, json.loads((await reader.readexactly(length)).decode('utf-8'))
+
+    async def scenario(self, port):
+        first = await asyncio.open_connection('127.0.0.1', port)
+        second = await asyncio.open_connection('127.0.0.1', port)
+        status, page = await self.request(first, 'GET', '/api/untranslated?filter=path:*/b.ftl')
+        self.assertEqual((status, page['total'], page['filter']), (200, 2, 'path:*/b.ftl'))
+        # Фильтр первого клиента не меняет список второго
+        status, page = await self.request(second, 'GET', '/api/untranslated')
+        self.assertEqual((status, page['total'], page['filter']), (200, 4, self.session.filter_label()))
+        status, result = await self.request(second, 'POST', '/api/mark', {'select': '1', 'filter': ''})
+        self.assertEqual(result, {'selected': 1, 'changed': 1})
+        status, page = await self.request(first, 'GET', '/api/untranslated?filter=path:*/b.ftl')
+        self.assertEqual([entry['status'] for entry in page['keys']], ["X", "X"])
+        status, _ = await self.request(first, 'POST', '/api/save', close=True)
+        self.assertEqual(status, 200)
+        status, _ = await self.request(second, 'GET', '/api/status', close=True)
+        self.assertEqual(status, 200)
+        for reader, writer in (first, second):
+            # Сервер закрывает соединение после ответа с Connection: close
+            self.assertEqual(await reader.read(), b'')
+            writer.close()
+
+    def test_two_clients(self):
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        try:
+            server = loop.run_until_complete(asyncio.start_server(self.server.handle_client, '127.0.0.1', 0))
+            port = server.sockets[0].getsockname()[1]
+            loop.run_until_complete(self.scenario(port))
+            server.close()
+            loop.run_until_complete(server.wait_closed())
+        finally:
+            asyncio.set_event_loop(None)
+            loop.close()
+        self.assertEqual(self.session.key_filter.expression, '')
+        self.assertEqual(self.session.pending_journal, [])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,185 @@
+# test_checker_session.py
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+import subprocess
+
+from locale_index import get_untranslated_keys
+from localization_checker import CheckerSession
+from path_coverage import PathCoverage
+from key_filter import compile_filter
+from file_watch import FileWatcher
+from progress_store import append_journal_batch, get_journal_path
+
+DELIMITER = '鎰'
+
+ORIGINAL = [
+    "/Locale/en-US/a.ftl鎰a-one = One",
+    "/Locale/en-US/a.ftl鎰a-two = Two { $count }",
+    "/Locale/en-US/a.ftl鎰a-three = Three",
+    "/Locale/en-US/b.ftl鎰b-one = Bee",
+    "/Locale/en-US/b.ftl鎰b-two = Bee two",
+]
+TARGET = [
+    "/Locale/ru-RU/a.ftl鎰a-one = Один",
+]
+
+class SessionTestCase(unittest.TestCase):
+    """Сеанс проверки над маленькими файлами во временной папке"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp(prefix='locacheck-test-')
+        self.original = self.write('original.txt', ORIGINAL)
+        self.target = self.write('target.txt', TARGET)
+        self.progress = os.path.join(self.directory, 'progress.json')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def write(self, name, lines):
+        file_path = os.path.join(self.directory, name)
+        with open(file_path, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(lines) + '\n')
+        return file_path
+
+    def open_session(self, expression=''):
+        session = CheckerSession(self.original, self.target, self.progress, DELIMITER,
+                                 verbose=False, presets_file=None)
+        session.set_filter(expression)
+        session.load()
+        return session
+
+    def assert_counters_consistent(self, session):
+        """Счетчики и покрытие сеанса совпадают с полным пересчетом"""
+        coverage = PathCoverage(len(session.table.paths))
+        untranslated, translated_count, untranslated_count = get_untranslated_keys(
+            session.table, session.target_flags, session.checklist, session.key_filter, coverage)
+        self.assertEqual((session.translated_count, session.untranslated_count),
+                         (translated_count, untranslated_count))
+        self.assertEqual(list(session.coverage.translated), list(coverage.translated))
+        self.assertEqual(list(session.coverage.untranslated), list(coverage.untranslated))
+        # В списке сеанса остаются и отмеченные на экране ключи, но все непереведенные в нем есть
+        self.assertTrue(set(untranslated) <= set(session.untranslated))
+
+class StatusFilterTest(SessionTestCase):
+
+    def test_toggle_twice_under_status_filter(self):
+        for expression in ('status:untranslated', 'status:translated', 'status:V', 'status:X'):
+            with self.subTest(expression=expression):
+                session = self.open_session(expression)
+                handle = session.table.find('/Locale/en-US/a.ftl', 'a-three = Three')
+                session.toggle(handle)
+                self.assert_counters_consistent(session)
+                session.toggle(handle)
+                self.assert_counters_consistent(session)
+
+    def test_mark_many_under_status_filter(self):
+        session = self.open_session('status:untranslated')
+        handles = list(session.untranslated)
+        session.mark_many(handles, "V")
+        self.assert_counters_consistent(session)
+        self.assertEqual(session.untranslated_count, 0)
+        session.mark_many(handles, "X")
+        self.assert_counters_consistent(session)
+
+    def test_filter_reports_status_dependence(self):
+        self.assertTrue(compile_filter('a.ftl and not status:V').depends_on_status)
+        self.assertFalse(compile_filter('status:target or len>5').depends_on_status)
+
+    def test_switching_views_after_marks(self):
+        session = self.open_session('status:untranslated')
+        handles = list(session.untranslated)
+        session.toggle(handles[0])
+        for expression in ('', 'status:untranslated', 'b.ftl', 'status:V', '', 'b.ftl'):
+            session.set_filter(expression)
+            self.assert_counters_consistent(session)
+            session.toggle(handles[-1])
+            self.assert_counters_consistent(session)
+
+class StaleKeysTest(SessionTestCase):
+
+    def change_original(self):
+        lines = [line.replace('One', 'One!').replace('Bee two', 'Bee two!') for line in ORIGINAL]
+        self.write('original.txt', lines)
+
+    def test_stale_cache_follows_marks_and_accept(self):
+        self.assertTrue(self.open_session().save())
+        self.change_original()
+
+        session = self.open_session()
+        translated = session.table.find('/Locale/en-US/a.ftl', 'a-one = One!')
+        handle = session.table.find('/Locale/en-US/b.ftl', 'b-two = Bee two!')
+        self.assertEqual(session.stale_keys(), [translated])
+        session.toggle(handle)
+        self.assertEqual(session.stale_keys(), [translated, handle])
+        session.toggle(handle)
+        self.assertEqual(session.stale_keys(), [translated])
+        self.assertEqual(session.accept_changes([translated]), 1)
+        self.assertEqual(session.stale_keys(), [])
+
+    def run_report(self):
+        """Код выхода localization_checker.py --report --fail-on-stale"""
+        script = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'localization_checker.py')
+        return subprocess.call([sys.executable, script, '--original', self.original,
+                                '--target', self.target, '--progress', self.progress,
+                                '--presets', os.path.join(self.directory, 'presets.json'),
+                                '--report', 'json', '--output', os.devnull, '--fail-on-stale'],
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    def test_report_writes_sources_snapshot(self):
+        # Первый отчет только создает снимок, следующие находят изменения, пока их не подтвердят
+        self.assertEqual(self.run_report(), 0)
+        self.change_original()
+        self.assertEqual(self.run_report(), 1)
+        self.assertEqual(self.run_report(), 1)
+
+class WatchTest(SessionTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.session = self.open_session()
+        # Поток слежения не запускается: опрос вызывается из теста
+        self.session.watcher = FileWatcher([self.original, self.target, self.progress,
+                                            get_journal_path(self.progress)])
+
+    def test_own_journal_writes_are_ignored(self):
+        session = self.session
+        session.toggle(session.untranslated[0])
+        session.watcher.poll()
+        self.assertIsNone(session.poll_watch())
+
+    def test_own_write_seen_by_poll_is_ignored(self):
+        session = self.session
+        key_id = session.table.key_id(session.untranslated[0])
+
+        def on_write(path, before, after):
+            session.watcher.poll()  # опрос успел между записью и отметкой
+            session.watcher.own_write(path, before, after)
+        append_journal_batch(self.progress, [(key_id, "V")], on_write)
+        self.assertIsNone(session.poll_watch())
+
+    def test_foreign_writes_are_merged(self):
+        session = self.session
+        session.toggle(session.untranslated[0])
+        handle = session.untranslated[-1]
+        append_journal_batch(self.progress, [(session.table.key_id(handle), "V")])
+        session.toggle(session.untranslated[1])
+        session.watcher.poll()
+        self.assertEqual(session.poll_watch(), (set(), 1))
+        self.assertEqual(session.checklist.get(handle), "V")
+
+class SelectionTest(SessionTestCase):
+
+    def test_ranges_follow_displayed_rows(self):
+        session = self.open_session()
+        rows = session.search('Bee')
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(session.select('1-2', rows), rows)
+        self.assertEqual(session.select('1-2'), list(session.untranslated[:2]))
+        with self.assertRaises(ValueError):
+            session.select('3', rows)
+
+if __name__ == '__main__':
+    unittest.main()
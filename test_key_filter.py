@@ -0,0 +1,84 @@
+# test_key_filter.py
+import unittest
+
+from locale_index import KeyTable
+from progress_store import Checklist
+from key_filter import FilterContext, compile_filter
+
+DELIMITER = '鎰'
+
+RECORDS = [
+    ("/Locale/en-US/datasets/names/first.ftl", "names-first-1 = Alice"),
+    ("/Locale/en-US/datasets/names/first.ftl", "names-first-2 = Bob"),
+    ("/Locale/en-US/datasets/figurines.ftl", "figurine-name = A very long figurine description"),
+    ("/Locale/en-US/commands.ftl", "cmd-help = Help"),
+    ("/Locale/en-US/commands.ftl", "cmd-list = List all commands"),
+]
+
+class FilterTest(unittest.TestCase):
+
+    def setUp(self):
+        self.table = KeyTable(DELIMITER, RECORDS)
+        self.flags = bytearray(len(self.table))
+        self.flags[3] = 1  # cmd-help есть в целевом файле
+        self.checklist = Checklist(self.table, {
+            self.table.key_id(0): "V",
+            self.table.key_id(4): "X",
+        })
+        self.ctx = FilterContext(self.table, self.flags, self.checklist)
+
+    def select(self, expression):
+        """Номера ключей, прошедших фильтр: и через проверку ключа, и через path_keys"""
+        key_filter = compile_filter(expression)
+        matched = [handle for handle in range(len(self.table)) if key_filter.matches(self.ctx, handle)]
+        by_path = []
+        for path_id, state in enumerate(key_filter.path_states(self.table)):
+            by_path.extend(key_filter.path_keys(self.ctx, path_id, state))
+        self.assertEqual(sorted(by_path), matched)
+        return matched
+
+    def test_conditions(self):
+        self.assertEqual(self.select(''), [0, 1, 2, 3, 4])
+        self.assertEqual(self.select('datasets'), [0, 1, 2])
+        self.assertEqual(self.select('path:*/names/*'), [0, 1])
+        self.assertEqual(self.select('key:^cmd-'), [3, 4])
+        self.assertEqual(self.select('key:"List all"'), [4])
+        self.assertEqual(self.select('len>25'), [2, 4])
+        self.assertEqual(self.select('minlen:25'), [2, 4])
+        self.assertEqual(self.select('maxlen:15'), [3])
+        self.assertEqual(self.select('len=15'), [3])
+
+    def test_status(self):
+        self.assertEqual(self.select('status:V'), [0])
+        # Ключ без отметки считается X, как и на экране
+        self.assertEqual(self.select('status:X'), [1, 2, 3, 4])
+        self.assertEqual(self.select('status:target'), [3])
+        self.assertEqual(self.select('status:translated'), [0, 3])
+        self.assertEqual(self.select('status:untranslated'), [1, 2, 4])
+        self.assertEqual(self.select('status:UNTRANSLATED'), [1, 2, 4])
+
+    def test_precedence(self):
+        # not сильнее and, and сильнее or
+        self.assertEqual(self.select('commands or datasets and not path:*/names/*'), [2, 3, 4])
+        self.assertEqual(self.select('(commands or datasets) and not path:*/names/*'), [2, 3, 4])
+        self.assertEqual(self.select('(commands or datasets) and not len>25'), [0, 1, 3])
+        self.assertEqual(self.select('commands or datasets and not len>25'), [0, 1, 3, 4])
+        self.assertEqual(self.select('not not commands'), [3, 4])
+        # Условия подряд без оператора объединяются через and
+        self.assertEqual(self.select('datasets names'), [0, 1])
+
+    def test_path_states(self):
+        key_filter = compile_filter('datasets and len>10')
+        self.assertEqual(key_filter.path_states(self.table), [None, None, False])
+        key_filter = compile_filter('commands or len>10')
+        self.assertEqual(key_filter.path_states(self.table), [None, None, True])
+
+    def test_errors(self):
+        for expression in ('(datasets', 'datasets)', 'datasets and', 'not', 'key:(',
+                           'status:maybe', 'path:', 'minlen:many', '"unclosed'):
+            with self.subTest(expression=expression):
+                with self.assertRaises(ValueError):
+                    compile_filter(expression)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,47 @@
+# test_locale_index.py
+import os
+import pickle
+import shutil
+import tempfile
+import unittest
+
+from locale_index import load_key_index, get_cache_path, read_cache_header, read_cache_records
+
+DELIMITER = '鎰'
+
+class CacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp(prefix='locacheck-test-')
+        self.file_path = os.path.join(self.directory, 'original.txt')
+        with open(self.file_path, 'w', encoding='utf-8') as f:
+            f.write("# комментарий\n"
+                    "/Locale/en-US/a.ftl鎰a-one = Один { $count }\n"
+                    "/Locale/en-US/b.ftl鎰b-one = Bee\n"
+                    "/Locale/en-US/a.ftl鎰a-two = Два 鎰 два\n")
+        self.cache_path = get_cache_path(self.file_path, DELIMITER)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_cache_round_trip(self):
+        records, sections = load_key_index(self.file_path, DELIMITER)
+        self.assertEqual(read_cache_records(self.cache_path), (records, sections))
+        self.assertEqual(read_cache_header(self.cache_path)['size'], os.path.getsize(self.file_path))
+        self.assertEqual(load_key_index(self.file_path, DELIMITER), (records, sections))
+        self.assertEqual(records[2], ('/Locale/en-US/a.ftl', 'a-two = Два 鎰 два'))
+
+    def test_foreign_cache_is_ignored(self):
+        records, sections = load_key_index(self.file_path, DELIMITER)
+        # Кэш не читается через pickle: чужой или поврежденный файл просто пересобирается
+        with open(self.cache_path, 'wb') as f:
+            pickle.dump({'version': 2}, f)
+        self.assertIsNone(read_cache_header(self.cache_path))
+        self.assertIsNone(read_cache_records(self.cache_path))
+        self.assertEqual(load_key_index(self.file_path, DELIMITER), (records, sections))
+        with open(self.cache_path, 'r+b') as f:
+            f.truncate(os.path.getsize(self.cache_path) - 3)
+        self.assertIsNone(read_cache_records(self.cache_path))
+
+if __name__ == '__main__':
+    unittest.main()
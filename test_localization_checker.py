@@ -0,0 +1,92 @@
+# test_localization_checker.py
+import unittest
+
+from locale_index import KeyTable, compute_section_digests, get_untranslated_keys, mark_target_keys
+from localization_checker import find_changed_sections, patch_untranslated_keys
+from progress_store import Checklist
+from key_filter import compile_filter
+from fluent_match import FluentMatcher
+from path_coverage import PathCoverage
+
+DELIMITER = '鎰'
+
+ORIGINAL = [
+    "/Locale/en-US/a.ftl鎰a-one = One",
+    "/Locale/en-US/a.ftl鎰a-two = Two { $count }",
+    "/Locale/en-US/datasets/b.ftl鎰b-one = Bee",
+    "/Locale/en-US/datasets/b.ftl鎰b-two = Bee two",
+    "/Locale/en-US/c.ftl鎰c-one = Sea",
+]
+TARGET = [
+    "/Locale/en-US/a.ftl鎰a-one = One",
+    "/Locale/en-US/c.ftl鎰c-one = Sea",
+]
+
+def load(lines):
+    """Записи (путь, ключ) и контрольные суммы секций, как их дает load_key_index"""
+    records = [tuple(line.split(DELIMITER, 1)) for line in lines]
+    return records, compute_section_digests(records)
+
+class PatchTest(unittest.TestCase):
+
+    def assert_patch_matches_rebuild(self, target, entries, old_target=TARGET, fluent=False):
+        records, sections = load(ORIGINAL)
+        old_target, old_target_sections = load(old_target)
+        new_target, new_target_sections = load(target)
+        table = KeyTable(DELIMITER, records)
+        checklist = Checklist(table, entries)
+        matcher = FluentMatcher(table) if fluent else None
+        changed_paths = find_changed_sections(sections, sections, old_target_sections, new_target_sections)
+        if matcher is not None:
+            changed_paths = matcher.original_paths(changed_paths)
+
+        for expression in ('', 'datasets', 'not datasets', 'key:two or status:V'):
+            with self.subTest(expression=expression):
+                key_filter = compile_filter(expression)
+                target_flags = mark_target_keys(table, old_target, matcher=matcher)
+                coverage = PathCoverage(len(table.paths))
+                path_states = key_filter.path_states(table)
+                untranslated, translated_count, untranslated_count = get_untranslated_keys(
+                    table, target_flags, checklist, key_filter, coverage, path_states)
+                untranslated, translated_delta, untranslated_delta = patch_untranslated_keys(
+                    untranslated, table, target_flags, new_target, checklist, key_filter, path_states,
+                    changed_paths, coverage, matcher)
+                expected_flags = mark_target_keys(table, new_target, matcher=matcher)
+                expected_coverage = PathCoverage(len(table.paths))
+                expected, expected_translated, expected_untranslated = get_untranslated_keys(
+                    table, expected_flags, checklist, key_filter, expected_coverage)
+                self.assertEqual(target_flags, expected_flags)
+                self.assertEqual(coverage.path_rows(table), expected_coverage.path_rows(table))
+                self.assertEqual(untranslated, expected)
+                self.assertEqual((translated_count + translated_delta, untranslated_count + untranslated_delta),
+                                 (expected_translated, expected_untranslated))
+
+    def test_target_section_edited(self):
+        entries = {f"/Locale/en-US/a.ftl{DELIMITER}a-two = Two {{ $count }}": "V"}
+        self.assert_patch_matches_rebuild([
+            "/Locale/en-US/datasets/b.ftl鎰b-two = Bee two",
+            "/Locale/en-US/c.ftl鎰c-one = Sea",
+        ], entries)
+
+    def test_target_section_added_before_others(self):
+        # Ключи первой секции появились последними: порядок списка должен остаться порядком файла
+        self.assert_patch_matches_rebuild([
+            "/Locale/en-US/datasets/b.ftl鎰b-one = Bee",
+            "/Locale/en-US/c.ftl鎰c-one = Sea changed",
+        ], {f"/Locale/en-US/c.ftl{DELIMITER}c-one = Sea changed": "V"})
+
+    def test_target_in_other_locale_edited(self):
+        # Перевод лежит в ru-RU: секции сопоставляются с путями исходного файла
+        self.assert_patch_matches_rebuild([
+            "/Locale/ru-RU/a.ftl鎰a-two = Два { $count }",
+            "/Locale/ru-RU/datasets/b.ftl鎰b-one = Пчела",
+        ], {}, old_target=[
+            "/Locale/ru-RU/a.ftl鎰a-one = Один",
+            "/Locale/ru-RU/c.ftl鎰c-one = Море",
+        ], fluent=True)
+
+    def test_target_section_removed(self):
+        self.assert_patch_matches_rebuild(TARGET[:1], {})
+
+if __name__ == '__main__':
+    unittest.main()
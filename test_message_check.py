@@ -0,0 +1,87 @@
+# test_message_check.py
+import unittest
+
+from locale_index import KeyTable
+from message_check import MessageChecker, scan_placeables, count_issues
+
+DELIMITER = '鎰'
+SOURCE = '/Locale/en-US/a.ftl'
+TARGET = '/Locale/ru-RU/a.ftl'
+
+def check(original, target):
+    """Ошибки проверки как список (id, вид, подробности, сторона)"""
+    original_records = [(SOURCE, line) for line in original]
+    target_records = [(TARGET, line) for line in target]
+    table = KeyTable(DELIMITER, original_records)
+    issues = MessageChecker().check(table, original_records, target_records)
+    return [(issue['id'], issue['kind'], issue['detail'], issue['side']) for issue in issues]
+
+class ScanTest(unittest.TestCase):
+
+    def test_scan_placeables(self):
+        self.assertEqual(scan_placeables("Hi { $name }!"), ([" $name "], True))
+        # Скобки в строковых литералах не считаются
+        self.assertEqual(scan_placeables('{ "{" } and { $a }'), ([" ", " ", " $a "], True))
+        self.assertEqual(scan_placeables("{ $a"), ([], False))
+        self.assertEqual(scan_placeables("$a }"), ([], False))
+        self.assertEqual(scan_placeables('{ "open }'), ([" "], False))
+
+class PlaceholderTest(unittest.TestCase):
+
+    def test_matching_message(self):
+        self.assertEqual(check(["hello = Hi { $name }, { -brand }"],
+                               ["hello = Привет, { $name } из { -brand }"]), [])
+
+    def test_variables(self):
+        self.assertEqual(check(["hello = Hi { $name } x{ $count }"],
+                               ["hello = Привет { $user } x{ $count }"]), [
+            ('hello', 'missing-variable', '$name', 'target'),
+            ('hello', 'extra-variable', '$user', 'target'),
+        ])
+
+    def test_terms_and_attributes(self):
+        self.assertEqual(check(["ship = Ship", "    .title = { -brand } ship"],
+                               ["ship = Корабль", "    .title = Корабль"]), [
+            ('ship.title', 'term', '-brand', 'target'),
+        ])
+
+    def test_selector(self):
+        original = ["items = { $count ->", "    [one] One item", "   *[other] { $count } items", "}"]
+        self.assertEqual(check(original, ["items = { $count ->", "    [one] Один", "   *[other] { $count } штук", "}"]), [])
+        self.assertEqual(check(original, ["items = { $total ->", "   *[other] { $count } штук", "}"]), [
+            ('items', 'extra-variable', '$total', 'target'),
+            ('items', 'selector', '$count, $total', 'target'),
+        ])
+
+    def test_message_without_translation(self):
+        self.assertEqual(check(["hello = Hi { $name }"], []), [])
+
+class SyntaxTest(unittest.TestCase):
+
+    def test_braces(self):
+        # Без целых скобок плейсхолдеры не сравниваются
+        self.assertEqual(check(["hello = Hi { $name }"], ["hello = Привет { $user"]), [
+            ('hello', 'braces', '', 'target'),
+        ])
+        self.assertEqual(check(["hello = Hi { $name"], ["hello = Привет { $name }"]), [
+            ('hello', 'braces', '', 'original'),
+        ])
+        self.assertEqual(check(["hello = Hi { $name"], []), [('hello', 'braces', '', 'original')])
+
+    def test_duplicate_ids(self):
+        issues = check(["hello = Hi", "bye = Bye", "hello = Hi again", "    .title = Title"],
+                       ["bye = Пока", "bye = Пока еще"])
+        self.assertEqual(issues, [
+            ('hello', 'duplicate-id', 'hello', 'original'),
+            ('bye', 'duplicate-id', 'bye', 'target'),
+        ])
+        self.assertEqual(count_issues([{'kind': kind} for _, kind, _, _ in issues])['duplicate-id'], 2)
+
+    def test_duplicate_handle(self):
+        original_records = [(SOURCE, "hello = Hi"), (SOURCE, "hello = Hi again")]
+        table = KeyTable(DELIMITER, original_records)
+        issue, = MessageChecker().check(table, original_records, [])
+        self.assertEqual(issue['handle'], table.find(SOURCE, "hello = Hi again"))
+
+if __name__ == '__main__':
+    unittest.main()
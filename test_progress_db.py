@@ -0,0 +1,85 @@
+# test_progress_db.py
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import progress_db
+import convert_progress
+from progress_db import ProgressDatabase
+from progress_store import load_checklist, save_checklist, append_journal_batch
+
+ENTRIES = {
+    "/Locale/en-US/a.ftl鎰a-one = One": "V",
+    "/Locale/en-US/a.ftl鎰    .title = Заголовок": "X",
+    "/Locale/en-US/b.ftl鎰b-one = Bee 鎰 two": "V",
+    "ключ без пути": "V",
+    "/Locale/en-US/b.ftl鎰b-two = Bee": {"status": "?", "note": "чужое значение"},
+}
+
+class ProgressDatabaseTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp(prefix='locacheck-test-')
+        self.json_path = os.path.join(self.directory, 'progress.json')
+        self.db_path = os.path.join(self.directory, 'progress.db')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def convert(self, source, destination):
+        with mock.patch.object(sys, 'argv', ['convert_progress.py', source, destination]), \
+                mock.patch('builtins.print'):
+            return convert_progress.main()
+
+    def test_round_trip(self):
+        self.assertTrue(save_checklist(self.json_path, dict(ENTRIES)))
+        append_journal_batch(self.json_path, [("/Locale/en-US/c.ftl鎰c-one = Sea", "V")])
+        expected = dict(ENTRIES, **{"/Locale/en-US/c.ftl鎰c-one = Sea": "V"})
+
+        self.assertEqual(self.convert(self.json_path, self.db_path), 0)
+        self.assertEqual(load_checklist(self.db_path), expected)
+        with ProgressDatabase(self.db_path) as db:
+            # Пути хранятся один раз
+            self.assertEqual(sorted(path for path in db.paths.values() if path),
+                             ["/Locale/en-US/a.ftl", "/Locale/en-US/b.ftl", "/Locale/en-US/c.ftl"])
+
+        exported = os.path.join(self.directory, 'exported.json')
+        self.assertEqual(self.convert(self.db_path, exported), 0)
+        self.assertEqual(load_checklist(exported), expected)
+        # Существующий файл не перезаписывается
+        self.assertEqual(self.convert(self.json_path, self.db_path), 1)
+
+    def test_save_writes_changes(self):
+        self.assertTrue(save_checklist(self.db_path, dict(ENTRIES)))
+        entries = dict(ENTRIES)
+        del entries["ключ без пути"]
+        entries["/Locale/en-US/a.ftl鎰a-one = One"] = "X"
+        self.assertTrue(save_checklist(self.db_path, dict(entries)))
+        self.assertEqual(load_checklist(self.db_path), entries)
+        append_journal_batch(self.db_path, [("/Locale/en-US/a.ftl鎰a-one = One", None)])
+        del entries["/Locale/en-US/a.ftl鎰a-one = One"]
+        self.assertEqual(load_checklist(self.db_path), entries)
+
+    def test_hash_collisions_on_same_path(self):
+        # Все строки получают один хэш: отметки не должны затирать друг друга
+        with mock.patch.object(progress_db, 'hash64', lambda *parts: 42):
+            self.assertTrue(save_checklist(self.json_path, dict(ENTRIES)))
+            self.assertEqual(self.convert(self.json_path, self.db_path), 0)
+            self.assertEqual(load_checklist(self.db_path), ENTRIES)
+
+            append_journal_batch(self.db_path, [("/Locale/en-US/a.ftl鎰a-one = One", None),
+                                                ("/Locale/en-US/a.ftl鎰    .title = Заголовок", "V")])
+            expected = dict(ENTRIES)
+            del expected["/Locale/en-US/a.ftl鎰a-one = One"]
+            expected["/Locale/en-US/a.ftl鎰    .title = Заголовок"] = "V"
+            self.assertEqual(load_checklist(self.db_path), expected)
+
+            exported = os.path.join(self.directory, 'exported.json')
+            self.assertEqual(self.convert(self.db_path, exported), 0)
+            self.assertEqual(load_checklist(exported), expected)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,100 @@
+# test_progress_store.py
+import os
+import sys
+import shutil
+import tempfile
+import threading
+import unittest
+import subprocess
+
+import progress_store
+from progress_store import (
+    load_checklist, save_checklist, start_compaction, wait_for_compaction, append_journal_batch,
+    rotate_journal, get_journal_path, get_rotated_journal_path, ProgressLock
+)
+
+class JournalTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp(prefix='locacheck-test-')
+        self.progress = os.path.join(self.directory, 'progress.json')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_torn_rotated_journal_keeps_later_marks(self):
+        # Сжатие прервалось, а последняя запись старого журнала оборвана
+        with open(get_rotated_journal_path(self.progress), 'w', encoding='utf-8') as f:
+            f.write('["a", "V"]\n["b", "V')
+        append_journal_batch(self.progress, [("c", "V"), ("a", "X")])
+        rotate_journal(self.progress)
+        append_journal_batch(self.progress, [("d", "V")])
+        self.assertEqual(load_checklist(self.progress), {"a": "X", "c": "V", "d": "V"})
+
+    def test_torn_line_in_the_middle_is_skipped(self):
+        with open(get_journal_path(self.progress), 'w', encoding='utf-8') as f:
+            f.write('["a", "V"]\n["b", "V\n["c", "V"]\n')
+        self.assertEqual(load_checklist(self.progress), {"a": "V", "c": "V"})
+
+    def test_wrong_shape_lines_are_skipped(self):
+        with open(get_journal_path(self.progress), 'w', encoding='utf-8') as f:
+            f.write('["a", "V"]\n42\n["b"]\n["c", "V", "X"]\nnull\n["d", "V"]\n')
+        self.assertEqual(load_checklist(self.progress), {"a": "V", "d": "V"})
+
+class CompactionTest(unittest.TestCase):
+    """Фоновое сжатие пишет снимок без блокировки файла прогресса"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp(prefix='locacheck-test-')
+        self.progress = os.path.join(self.directory, 'progress.json')
+        self.write_temp = progress_store._write_temp_snapshot
+        self.started = threading.Event()
+        self.resume = threading.Event()
+
+    def tearDown(self):
+        self.resume.set()
+        wait_for_compaction()
+        progress_store._write_temp_snapshot = self.write_temp
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def pause_snapshot(self):
+        """Останавливает фоновую запись снимка, пока тест не вызовет resume.set()"""
+        def write_temp(file_path, checklist):
+            self.started.set()
+            self.resume.wait(5)
+            return self.write_temp(file_path, checklist)
+        progress_store._write_temp_snapshot = write_temp
+
+    def test_journal_is_not_blocked_while_snapshot_is_written(self):
+        self.assertTrue(save_checklist(self.progress, {"a": "V"}))
+        append_journal_batch(self.progress, [("b", "V")])
+        self.pause_snapshot()
+        self.assertTrue(start_compaction(self.progress, {"a": "V", "b": "V"}))
+        self.assertTrue(self.started.wait(5))
+
+        ProgressLock(self.progress, timeout=0.5).acquire().release()
+        self.assertTrue(append_journal_batch(self.progress, [("c", "V")]))
+        self.resume.set()
+        wait_for_compaction()
+        self.assertEqual(load_checklist(self.progress), {"a": "V", "b": "V", "c": "V"})
+        self.assertEqual([name for name in os.listdir(self.directory) if name.endswith('.tmp')], [])
+
+    def test_concurrent_save_wins_over_stale_snapshot(self):
+        self.assertTrue(save_checklist(self.progress, {"a": "V"}))
+        append_journal_batch(self.progress, [("b", "V")])
+        self.pause_snapshot()
+        self.assertTrue(start_compaction(self.progress, {"a": "V", "b": "V"}))
+        self.assertTrue(self.started.wait(5))
+
+        # Другой процесс сохраняет прогресс, пока фоновый снимок еще пишется
+        code = ("import sys; from progress_store import save_checklist; "
+                "sys.exit(not save_checklist(sys.argv[1], {'a': 'X', 'b': 'V'}, base={'a': 'V', 'b': 'V'}))")
+        self.assertEqual(subprocess.call([sys.executable, '-c', code, self.progress],
+                                         cwd=os.path.dirname(os.path.abspath(__file__))), 0)
+        self.resume.set()
+        wait_for_compaction()
+        self.assertEqual(load_checklist(self.progress), {"a": "X", "b": "V"})
+        self.assertEqual([name for name in os.listdir(self.directory) if name.endswith('.tmp')], [])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,127 @@
+# test_revision_diff.py
+import os
+import shutil
+import tempfile
+import unittest
+from collections import OrderedDict
+
+from locale_index import load_key_index, load_section_records
+from revision_diff import dump_sections, key_delta, untranslated_delta, load_target_sections
+
+DELIMITER = '鎰'
+
+OLD = OrderedDict([
+    ('/Locale/en-US/a.ftl', ["a-one = One", "a-two = Two", "    .title = Title"]),
+    ('/Locale/en-US/gone.ftl', ["gone = Gone", "gone = Gone"]),
+])
+NEW = OrderedDict([
+    ('/Locale/en-US/a.ftl', ["a-one = One", "a-two = Two!", "    .title = Title", "a-three = Three"]),
+    ('/Locale/en-US/b.ftl', ["b-one = Bee"]),
+])
+
+def write_dump(file_path, sections):
+    with open(file_path, 'w', encoding='utf-8') as f:
+        for path, keys in sections.items():
+            for key in keys:
+                f.write(f"{path}{DELIMITER}{key}\n")
+
+class KeyDeltaTest(unittest.TestCase):
+
+    def test_kinds(self):
+        records, kinds, removed = key_delta(OLD, NEW)
+        self.assertEqual(records, [(path, key) for path, keys in NEW.items() for key in keys])
+        self.assertEqual(kinds, {
+            ('/Locale/en-US/a.ftl', "a-two = Two!"): 'changed',
+            ('/Locale/en-US/a.ftl', "a-three = Three"): 'new',
+            ('/Locale/en-US/b.ftl', "b-one = Bee"): 'new',
+        })
+        # "a-two = Two" из a.ftl и одна уникальная строка пропавшего gone.ftl
+        self.assertEqual(removed, 2)
+
+    def test_attribute_of_changed_message(self):
+        old = {'/Locale/en-US/a.ftl': ["a-one = One", "    .title = Old"]}
+        new = {'/Locale/en-US/a.ftl': ["a-one = One", "    .title = New", "    .tooltip = Tip"]}
+        _, kinds, removed = key_delta(old, new)
+        self.assertEqual(kinds, {
+            ('/Locale/en-US/a.ftl', "    .title = New"): 'changed',
+            ('/Locale/en-US/a.ftl', "    .tooltip = Tip"): 'new',
+        })
+        self.assertEqual(removed, 1)
+
+    def test_no_change(self):
+        self.assertEqual(key_delta(OLD, OLD), ([(path, key) for path, keys in OLD.items() for key in keys], {}, 0))
+
+class UntranslatedDeltaTest(unittest.TestCase):
+
+    def setUp(self):
+        self.records, self.kinds, _ = key_delta(OLD, NEW)
+        self.target = [
+            ('/Locale/ru-RU/a.ftl', "a-three = Три"),
+            ('/Locale/en-US/b.ftl', "b-one = Bee"),
+        ]
+
+    def delta(self, fluent=True, checklist=None):
+        table, keys, summary = untranslated_delta(self.records, self.kinds, self.target,
+                                                  checklist or {}, DELIMITER, fluent=fluent)
+        return [(table.path_of(handle), table.keys[handle], kind) for handle, kind in keys], summary
+
+    def test_fluent(self):
+        keys, summary = self.delta()
+        self.assertEqual(keys, [('/Locale/en-US/a.ftl', "a-two = Two!", 'changed')])
+        self.assertEqual(summary, OrderedDict([('paths', 2), ('new', 2), ('changed', 1),
+                                               ('untranslated_new', 0), ('untranslated_changed', 1)]))
+
+    def test_exact(self):
+        # Без сопоставления Fluent a-three из ru-RU не считается переводом
+        keys, summary = self.delta(fluent=False)
+        self.assertEqual([key for _, key, _ in keys], ["a-two = Two!", "a-three = Three"])
+        self.assertEqual(summary['untranslated_new'], 1)
+
+    def test_checklist(self):
+        keys, _ = self.delta(checklist={f"/Locale/en-US/a.ftl{DELIMITER}a-two = Two!": "V"})
+        self.assertEqual(keys, [])
+
+class DumpSectionsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp(prefix='locacheck-test-')
+        self.old_file = os.path.join(self.directory, 'old.txt')
+        self.new_file = os.path.join(self.directory, 'new.txt')
+        write_dump(self.old_file, OLD)
+        write_dump(self.new_file, NEW)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_only_changed_sections(self):
+        unchanged = OrderedDict([('/Locale/en-US/same.ftl', ["same = Same"])])
+        write_dump(self.old_file, OrderedDict(list(OLD.items()) + list(unchanged.items())))
+        write_dump(self.new_file, OrderedDict(list(unchanged.items()) + list(NEW.items())))
+        for use_cache in (False, True, True):
+            with self.subTest(use_cache=use_cache):
+                old_sections, new_sections = dump_sections(self.old_file, self.new_file, DELIMITER, use_cache)
+                self.assertEqual(old_sections, OLD)
+                self.assertEqual(new_sections, NEW)
+
+    def test_identical_dumps(self):
+        self.assertEqual(dump_sections(self.old_file, self.old_file, DELIMITER), (OrderedDict(), OrderedDict()))
+
+    def test_section_records(self):
+        records, _ = load_key_index(self.new_file, DELIMITER)
+        wanted = {'/Locale/en-US/b.ftl'}.__contains__
+        expected = [record for record in records if wanted(record[0])]
+        # Без кэша, при построении кэша и из готового кэша - одинаково
+        for use_cache in (False, True, True):
+            with self.subTest(use_cache=use_cache):
+                self.assertEqual(load_section_records(self.new_file, DELIMITER, wanted, use_cache), expected)
+
+    def test_target_sections(self):
+        write_dump(self.old_file, OrderedDict([
+            ('/Locale/ru-RU/a.ftl', ["a-one = Один"]),
+            ('/Locale/ru-RU/other.ftl', ["other = Другое"]),
+        ]))
+        self.assertEqual(load_target_sections(self.old_file, NEW, DELIMITER),
+                         [('/Locale/ru-RU/a.ftl', "a-one = Один")])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+# test_stream_report.py
+import io
+import os
+import json
+import shutil
+import tempfile
+import unittest
+from array import array
+
+import stream_report
+from stream_report import HashIndex, stream_report as run_stream_report
+from localization_checker import CheckerSession
+from headless_report import write_report
+from key_filter import compile_filter
+from source_hashes import hash64
+
+DELIMITER = '鎰'
+
+# Путь a.ftl встречается двумя кусками и с повторами строк
+ORIGINAL = [
+    "/Locale/en-US/a.ftl鎰a-one = One",
+    "/Locale/en-US/a.ftl鎰a-two = Two",
+    "/Locale/en-US/a.ftl鎰    .title = Two title",
+    "/Locale/en-US/b.ftl鎰b-one = Bee",
+    "/Locale/en-US/b.ftl鎰b-one = Bee",
+    "/Locale/en-US/a.ftl鎰a-one = One",
+    "/Locale/en-US/a.ftl鎰a-three = Three",
+    "/Locale/en-US/c/d.ftl鎰d-one = Dee",
+]
+TARGET = [
+    "/Locale/ru-RU/a.ftl鎰a-one = Один",
+    "/Locale/ru-RU/a.ftl鎰a-two = Два",
+    "/Locale/en-US/c/d.ftl鎰d-one = Dee",
+]
+
+class StreamReportTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp(prefix='locacheck-test-')
+        self.original = self.write('original.txt', ORIGINAL)
+        self.target = self.write('target.txt', TARGET)
+        self.progress = os.path.join(self.directory, 'progress.json')
+        with open(self.progress, 'w', encoding='utf-8') as f:
+            json.dump({"/Locale/en-US/b.ftl鎰b-one = Bee": "V"}, f)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def write(self, name, lines):
+        file_path = os.path.join(self.directory, name)
+        with open(file_path, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(lines) + '\n')
+        return file_path
+
+    def reports(self, expression='', fluent=True):
+        """(отчет обычного режима, отчет потокового режима) в формате json"""
+        session = CheckerSession(self.original, self.target, self.progress, DELIMITER,
+                                 verbose=False, presets_file=None, fluent=fluent)
+        session.set_filter(expression)
+        session.load(build_list=False)
+        full = io.StringIO()
+        write_report(session, 'json', full)
+        streamed = io.StringIO()
+        run_stream_report(self.original, self.target, session.checklist.to_dict(), DELIMITER,
+                          compile_filter(expression), 'json', streamed, fluent)
+        return json.loads(full.getvalue()), json.loads(streamed.getvalue())
+
+    def test_matches_full_report(self):
+        for expression in ('', 'a.ftl', 'status:untranslated', 'not len>14'):
+            for fluent in (True, False):
+                with self.subTest(expression=expression, fluent=fluent):
+                    full, streamed = self.reports(expression, fluent)
+                    # Поток выводит ключи в порядке файла, обычный отчет - по путям
+                    self.assertEqual(sorted(map(tuple, map(dict.values, streamed['untranslated']))),
+                                     sorted(map(tuple, map(dict.values, full['untranslated']))))
+                    self.assertEqual(streamed['paths'], full['paths'])
+                    self.assertEqual(streamed['directories'], full['directories'])
+                    for name in ('translated', 'untranslated', 'paths'):
+                        self.assertEqual(streamed['summary'][name], full['summary'][name])
+
+    def test_split_paths(self):
+        self.assertEqual(stream_report.find_split_paths(self.original, DELIMITER), {"/Locale/en-US/a.ftl"})
+
+    def test_hash_index(self):
+        chunk = stream_report.SORT_CHUNK
+        stream_report.SORT_CHUNK = 3
+        try:
+            values = [hash64(str(i % 7)) for i in range(20)]
+            index = HashIndex(array('Q', values))
+        finally:
+            stream_report.SORT_CHUNK = chunk
+        self.assertEqual(list(index.hashes), sorted(set(values)))
+        self.assertIn(hash64('3'), index)
+        self.assertNotIn(hash64('8'), index)
+
+if __name__ == '__main__':
+    unittest.main()
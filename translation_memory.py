@@ -0,0 +1,152 @@
+# translation_memory.py
+import re
+import zlib
+
+from fluent_match import FileState, line_identity, message_value, normalize_path
+
+# Подпись MinHash: одна хэш-функция, пространство хэшей делится на корзины
+SIGNATURE_BINS = 16
+BIN_SHIFT = 28          # старшие 4 бита 32-битного хэша - номер корзины
+BIN_MASK = (1 << BIN_SHIFT) - 1
+# LSH: подпись режется на полосы; совпадение любой полосы делает запись кандидатом
+BAND_ROWS = 2
+# Ниже этой похожести (коэффициент Жаккара по триграммам) подсказки не показываются
+MIN_SIMILARITY = 0.5
+MAX_SUGGESTIONS = 3
+
+_SPACES_RE = re.compile(r'\s+')
+
+def normalize_value(value):
+    """Приводит значение к виду для сравнения: нижний регистр, одиночные пробелы"""
+    return _SPACES_RE.sub(' ', value.strip().lower())
+
+def shingles(text):
+    """Множество триграмм нормализованного значения (с пробелами по краям)"""
+    text = f" {text} "
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+def signature(grams):
+    """Подпись MinHash одной перестановкой: минимум хэша в каждой корзине.
+
+    Пустые корзины (у коротких строк) заполняются из ближайшей непустой справа
+    со сдвигом, чтобы у похожих строк они совпадали так же, как заполненные.
+    """
+    sig = [-1] * SIGNATURE_BINS
+    for gram in grams:
+        h = zlib.crc32(gram.encode('utf-8'))
+        slot = h >> BIN_SHIFT
+        value = h & BIN_MASK
+        if sig[slot] < 0 or value < sig[slot]:
+            sig[slot] = value
+    if -1 in sig and len(set(sig)) > 1:
+        filled = list(sig)
+        for slot in range(SIGNATURE_BINS):
+            distance = 1
+            while filled[slot] < 0:
+                source = sig[(slot + distance) % SIGNATURE_BINS]
+                if source >= 0:
+                    filled[slot] = source + distance * (BIN_MASK + 1)
+                distance += 1
+        sig = filled
+    return sig
+
+def bands(sig):
+    """Ключи полос LSH"""
+    for start in range(0, SIGNATURE_BINS, BAND_ROWS):
+        yield (start,) + tuple(sig[start:start + BAND_ROWS])
+
+def jaccard(a, b):
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+class TranslationMemory:
+    """Память переводов: пары исходное значение -> перевод из уже переведенных сообщений.
+
+    Точные совпадения ищутся по словарю нормализованных значений, похожие -
+    по полосам LSH подписей MinHash с проверкой коэффициентом Жаккара.
+    """
+    __slots__ = ('sources', 'targets', 'exact', 'buckets')
+
+    def __init__(self):
+        self.sources = []    # номер записи -> нормализованное исходное значение
+        self.targets = []    # номер записи -> {перевод: сколько раз встретился}
+        self.exact = {}      # нормализованное исходное значение -> номер записи
+        self.buckets = {}    # ключ полосы -> номера записей
+
+    def __len__(self):
+        return len(self.sources)
+
+    def add(self, source, target):
+        """Добавляет пару значений (исходное, перевод)"""
+        source = normalize_value(source)
+        entry = self.exact.get(source)
+        if entry is None:
+            entry = self.exact[source] = len(self.sources)
+            self.sources.append(source)
+            self.targets.append({})
+            for band in bands(signature(shingles(source))):
+                self.buckets.setdefault(band, []).append(entry)
+        translations = self.targets[entry]
+        translations[target] = translations.get(target, 0) + 1
+
+    def _ranked(self, entry, score):
+        translations = self.targets[entry]
+        return [(score, target, self.sources[entry])
+                for target in sorted(translations, key=translations.get, reverse=True)]
+
+    def suggest(self, value, limit=MAX_SUGGESTIONS):
+        """Подсказки для исходного значения: список (похожесть, перевод, исходное значение)"""
+        source = normalize_value(value)
+        suggestions = []
+        entry = self.exact.get(source)
+        if entry is not None:
+            suggestions.extend(self._ranked(entry, 1.0))
+            if len(suggestions) >= limit:
+                return suggestions[:limit]
+
+        grams = shingles(source)
+        candidates = set()
+        for band in bands(signature(grams)):
+            candidates.update(self.buckets.get(band, ()))
+        candidates.discard(entry)
+
+        scored = []
+        for candidate in candidates:
+            score = jaccard(grams, shingles(self.sources[candidate]))
+            if score >= MIN_SIMILARITY:
+                scored.append((score, candidate))
+        scored.sort(key=lambda item: (-item[0], item[1]))
+        for score, candidate in scored:
+            suggestions.extend(self._ranked(candidate, score))
+            if len(suggestions) >= limit:
+                break
+        return suggestions[:limit]
+
+def build_memory(table, identities, target_records):
+    """Собирает память переводов.
+
+    Исходное значение берется из ключа таблицы, перевод - из строки целевого
+    файла с той же идентичностью сообщения (см. fluent_match.line_identity).
+    Одинаковые значения (непереведенные копии) в память не попадают.
+    """
+    source_values = {}
+    for handle, identity in enumerate(identities):
+        value = message_value(table.keys[handle])
+        if value is not None:
+            source_values.setdefault(identity, value)
+
+    memory = TranslationMemory()
+    states = {}
+    for path, key in target_records:
+        state = states.get(path)
+        if state is None:
+            state = states[path] = (FileState(), normalize_path(path))
+        identity = line_identity(state[0], state[1], key)
+        source = source_values.get(identity)
+        if source is None:
+            continue
+        target = message_value(key)
+        if target is not None and target != source:
+            memory.add(source, target)
+    return memory
@@ -1,111 +1,127 @@
 # update_progress.py
 import os
-import json
 import sys
-
-def load_checklist(file_path):
-    """Загружает файл прогресса"""
-    if not os.path.exists(file_path):
-        print(f"[i] Файл прогресса не существует, будет создан новый: {file_path}")
-        return {}
-    try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    except Exception as e:
-        print(f"[!] Ошибка загрузки файла прогресса: {e}")
-        return {}
-
-def save_checklist(file_path, checklist):
-    """Сохраняет файл прогресса"""
-    try:
-        with open(file_path, 'w', encoding='utf-8') as f:
-            json.dump(checklist, f, ensure_ascii=False, indent=2)
-        return True
-    except Exception as e:
-        print(f"[!] Ошибка сохранения файла прогресса: {e}")
-        return False
-
-def should_skip_line(line):
-    """Пропускает пустые строки и комментарии"""
-    return not line.strip() or line.strip().startswith('#')
+import argparse
+
+from locale_index import load_key_records, KeyTable
+from progress_store import load_checklist, save_checklist
+from key_selection import PrefixIndex, parse_selection, select_handles
+
+# Пути, которые добавляются в прогресс, если при запуске не указано ничего другого
+DEFAULT_PATHS = [
+    "/Locale/en-US/toolshed-commands.ftl",
+    "/Locale/en-US/commands.ftl",
+    "/Locale/en-US/physics/grid_merging.ftl",
+    "/Locale/en-US/userinterface.ftl",
+    "/Locale/en-US/view-variables.ftl",
+    "/Locale/en-US/entity-category.ftl",
+    "/Locale/en-US/midi-commands.ftl",
+    "/Locale/en-US/discordRPC.ftl",
+    "/Locale/en-US/debug-builtin-connection-screen.ftl",
+    "/Locale/en-US/custom-controls.ftl",
+    "/Locale/en-US/uploadfolder.ftl",
+    "/Locale/en-US/tab-container.ftl",
+    "/Locale/en-US/replays.ftl",
+    "/Locale/en-US/input.ftl",
+    "/Locale/en-US/dev-window.ftl",
+    "/Locale/en-US/defaultwindow.ftl",
+    "/Locale/en-US/controls.ftl",
+    "/Locale/en-US/client-state-commands.ftl",
+    "/Locale/en-US/_engine_lib.ftl"
+
+    # Добавьте сюда другие пути по необходимости
+]
+
+# Здесь нет списка непереведенных ключей, поэтому номера из интерактивной команды M не поддерживаются
+SELECT_HELP = ("Выражение --select: элементы через пробел - path:<путь .ftl>, prefix:<начало пути>, "
+               "re:<регулярное выражение по ключу>")
 
 def parse_original_keys(file_path, delimiter):
-    """Парсит ключи из файла локализации с сохранением оригинального формата"""
-    keys = {}
+    """Парсит ключи из файла локализации в таблицу ключей"""
+    table = KeyTable(delimiter)
     if not os.path.exists(file_path):
         print(f"[X] Файл не найден: {file_path}")
-        return keys
+        return table
 
     try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            for line in f:
-                # Пропускаем пустые строки и комментарии
-                if should_skip_line(line):
-                    continue
-
-                # Ищем разделитель в строке
-                if delimiter not in line:
-                    continue
-
-                # Разделяем на 2 части по первому вхождению разделителя
-                parts = line.split(delimiter, 1)
-                if len(parts) < 2:
-                    continue
-
-                # Сохраняем оригинальный формат без изменений
-                path_part = parts[0].rstrip('\n')
-                key_part = parts[1].rstrip('\n')
-                key_id = f"{path_part}{delimiter}{key_part}"
-
-                keys[key_id] = True
-
-        print(f"[v] Загружено ключей из {os.path.basename(file_path)}: {len(keys)}")
-        return keys
+        # Ключи строятся так же, как в localization_checker.py,
+        # чтобы отметки совпадали с тем, что видит основной скрипт
+        table.extend(load_key_records(file_path, delimiter))
+
+        print(f"[v] Загружено ключей из {os.path.basename(file_path)}: {len(table)}")
+        return table
     except Exception as e:
         print(f"[X] Ошибка чтения файла {file_path}: {e}")
-        return keys
+        return table
+
+def build_selection_terms(args):
+    """Собирает условия выбора ключей из аргументов командной строки"""
+    terms = []
+    for path in args.path:
+        terms.append(('path', path))
+    for prefix in args.prefix:
+        terms.append(('prefix', prefix))
+    if args.select:
+        selected = parse_selection(args.select)
+        if any(kind == 'range' for kind, _ in selected):
+            raise ValueError("номера ключей в --select не поддерживаются (списка непереведенных "
+                             "ключей здесь нет); выбирайте ключи через path:, prefix: или re:")
+        terms.extend(selected)
+    for pattern in args.regex:
+        terms.extend(parse_selection(f"re:{pattern}"))
+
+    if not terms:
+        terms = [('path', path) for path in DEFAULT_PATHS]
+    return terms
 
 def main():
-    print("\n=== ОБНОВЛЕНИЕ ПРОГРЕССА ПЕРЕВОДА ===")
     script_dir = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(description='Пакетное обновление прогресса перевода',
+                                     epilog=SELECT_HELP)
+    parser.add_argument('--original', default=os.path.join(script_dir, 'original.txt'),
+                        help='Файл исходной локализации')
+    parser.add_argument('--progress', default=os.path.join(script_dir, 'translation_progress.json'),
+                        help='Файл прогресса')
+    parser.add_argument('--delimiter', default='鎰', help='Разделитель ключей')
+    parser.add_argument('--path', action='append', default=[],
+                        help='Путь .ftl целиком (можно указать несколько раз)')
+    parser.add_argument('--prefix', action='append', default=[],
+                        help='Начало пути, например /Locale/en-US/datasets/ (можно несколько раз)')
+    parser.add_argument('--regex', action='append', default=[],
+                        help='Регулярное выражение по тексту ключа (можно несколько раз)')
+    parser.add_argument('--select', default='',
+                        help='Выражение выбора как в команде M, но без номеров (см. ниже)')
+    parser.add_argument('--status', choices=['V', 'X'], default='V',
+                        help='Какой статус поставить выбранным ключам')
+    parser.add_argument('--quiet', action='store_true',
+                        help='Не выводить каждый измененный ключ')
+    parser.add_argument('--no-pause', action='store_true',
+                        help='Не ждать нажатия Enter перед выходом')
+    args = parser.parse_args()
+
+    print("\n=== ОБНОВЛЕНИЕ ПРОГРЕССА ПЕРЕВОДА ===")
     print(f"[i] Папка скрипта: {script_dir}")
 
-    delimiter = '鎰'
-
-    # Пути к файлам
-    original_file = os.path.join(script_dir, 'original.txt')
-    progress_file = os.path.join(script_dir, 'translation_progress.json')
-
-    # Список путей, которые нужно добавить в прогресс
-    target_paths = {
-        "/Locale/en-US/toolshed-commands.ftl",
-        "/Locale/en-US/commands.ftl",
-        "/Locale/en-US/physics/grid_merging.ftl",
-        "/Locale/en-US/userinterface.ftl",
-        "/Locale/en-US/view-variables.ftl",
-        "/Locale/en-US/entity-category.ftl",
-        "/Locale/en-US/midi-commands.ftl",
-        "/Locale/en-US/discordRPC.ftl",
-        "/Locale/en-US/debug-builtin-connection-screen.ftl",
-        "/Locale/en-US/custom-controls.ftl",
-        "/Locale/en-US/uploadfolder.ftl",
-        "/Locale/en-US/tab-container.ftl",
-        "/Locale/en-US/replays.ftl",
-        "/Locale/en-US/input.ftl",
-        "/Locale/en-US/dev-window.ftl",
-        "/Locale/en-US/defaultwindow.ftl",
-        "/Locale/en-US/controls.ftl",
-        "/Locale/en-US/client-state-commands.ftl",
-        "/Locale/en-US/_engine_lib.ftl"
-
-        # Добавьте сюда другие пути по необходимости
-    }
+    delimiter = args.delimiter
+    original_file = args.original
+    progress_file = args.progress
+
+    def pause():
+        if not args.no_pause:
+            input("\nНажмите Enter для выхода...")
+
+    try:
+        terms = build_selection_terms(args)
+    except ValueError as e:
+        print(f"\n[X] ОШИБКА: {e}")
+        pause()
+        return
 
     # Проверка существования файлов
     if not os.path.exists(original_file):
         print(f"\n[X] ОШИБКА: Файл не найден: {original_file}")
         print("Убедитесь, что файл original.txt находится в папке скрипта")
-        input("\nНажмите Enter для выхода...")
+        pause()
         return
 
     print(f"[i] Файл исходной локализации: {original_file}")
@@ -113,45 +129,57 @@ def main():
 
     # Загрузка данных
     print("\n[i] Загрузка данных...")
+    if not os.path.exists(progress_file):
+        print(f"[i] Файл прогресса не существует, будет создан новый: {progress_file}")
     checklist = load_checklist(progress_file)
-    original_keys = parse_original_keys(original_file, delimiter)
+    # Состояние файла при загрузке: правки, сделанные после него другими процессами, сохранятся
+    base = dict(checklist)
+    table = parse_original_keys(original_file, delimiter)
+
+    # Выбор ключей: пути ищутся по индексу, префиксы - бинарным поиском по отсортированным путям
+    try:
+        handles = select_handles(table, terms, prefix_index=PrefixIndex(table))
+    except ValueError as e:
+        print(f"\n[X] ОШИБКА: {e}")
+        pause()
+        return
 
     # Добавление ключей из указанных путей
     added_count = 0
     updated_count = 0
-    print("\n[i] Добавление ключей в прогресс...")
-
-    for key_id in original_keys:
-        # Проверяем, начинается ли путь ключа с одного из целевых путей
-        for path in target_paths:
-            if key_id.startswith(path + delimiter):
-                # Если ключ уже есть в чеклисте
-                if key_id in checklist:
-                    # Обновляем статус только если он не "V"
-                    if checklist[key_id] != "V":
-                        checklist[key_id] = "V"
-                        updated_count += 1
-                        print(f"  [↻] Обновлен ключ: {key_id}")
-                else:
-                    # Добавляем новый ключ с пометкой "V"
-                    checklist[key_id] = "V"
-                    added_count += 1
-                    print(f"  [+] Добавлен ключ: {key_id}")
-                break
+    status = args.status
+    print(f"\n[i] Выбрано ключей: {len(handles)}. Установка статуса {status}...")
+
+    for handle in handles:
+        key_id = table.key_id(handle)
+        # Если ключ уже есть в чеклисте
+        if key_id in checklist:
+            # Обновляем статус только если он отличается
+            if checklist[key_id] != status:
+                checklist[key_id] = status
+                updated_count += 1
+                if not args.quiet:
+                    print(f"  [↻] Обновлен ключ: {key_id}")
+        else:
+            # Добавляем новый ключ с нужной пометкой
+            checklist[key_id] = status
+            added_count += 1
+            if not args.quiet:
+                print(f"  [+] Добавлен ключ: {key_id}")
 
     # Сохранение результатов
     total_changes = added_count + updated_count
     if total_changes > 0:
-        if save_checklist(progress_file, checklist):
+        if save_checklist(progress_file, checklist, base=base):
             print(f"\n[v] УСПЕХ: Добавлено ключей: {added_count}, Обновлено: {updated_count}")
             print(f"[v] Файл прогресса обновлен: {progress_file}")
         else:
             print("\n[x] ОШИБКА: Не удалось сохранить файл прогресса")
     else:
-        print("\n[i] Нет изменений - все ключи уже помечены как переведенные")
+        print(f"\n[i] Нет изменений - все выбранные ключи уже имеют статус {status}")
 
     # Пауза перед закрытием
-    input("\nНажмите Enter для выхода...")
+    pause()
 
 if __name__ == "__main__":
     main()